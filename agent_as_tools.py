@@ -1,5 +1,8 @@
 from agents import Agent, Runner
+from instrumentation import span
+from typing import AsyncIterator, Dict, Iterable, List, Optional
 import asyncio
+import time
 
 spanish_agent = Agent(
     name="Spanish agent",
@@ -29,9 +32,120 @@ orchestrator_agent = Agent(
     ],
 )
 
+# Sub-agents by target language, for batch translation without the orchestrator round-trip
+TRANSLATION_AGENTS = {
+    "spanish": spanish_agent,
+    "french": french_agent,
+}
+MAX_CONCURRENT_TRANSLATIONS = 8
+TRANSLATIONS_PER_SECOND = 5.0
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        """Space out calls to at most ``rate`` per second; 0 disables the limit."""
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        wait = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+async def _translate(agent: Agent, text: str, limiter: RateLimiter, retries: int):
+    for attempt in range(retries + 1):
+        await limiter.acquire()
+        try:
+            with span("agent.run", agent=agent.name):
+                result = await Runner.run(agent, text)
+            return result.final_output, None
+        except Exception as exc:
+            if attempt == retries:
+                return None, str(exc)
+            await asyncio.sleep(2 ** attempt)
+
+async def translate_batch(texts: Iterable[str], languages: Iterable[str],
+                          max_concurrency: int = MAX_CONCURRENT_TRANSLATIONS,
+                          rate: float = TRANSLATIONS_PER_SECOND, retries: int = 2) -> AsyncIterator[Dict]:
+    """Translate many texts into several languages, yielding translations as they complete.
+
+    The per-language agents are called directly, identical texts are translated
+    once, and every (text, language) pair runs concurrently under
+    ``max_concurrency`` and a shared rate limit.
+
+    Args:
+        texts (Iterable[str]): Texts to translate
+        languages (Iterable[str]): Target languages, keys of ``TRANSLATION_AGENTS``
+        max_concurrency (int): Translations in flight at once
+        rate (float): Translations started per second at most, 0 for no limit
+        retries (int): Retries of a failed translation, with exponential backoff
+
+    Yields:
+        Dict: {"text", "language", "translation", "error", "indexes"}, where
+            "indexes" are the positions of the text in ``texts`` and "error" is
+            set instead of "translation" when every attempt failed
+    """
+    languages = list(dict.fromkeys(languages))
+    unknown = [language for language in languages if language not in TRANSLATION_AGENTS]
+    if unknown:
+        raise ValueError(f"No translation agent for {unknown}; known languages: {sorted(TRANSLATION_AGENTS)}")
+
+    positions: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        positions.setdefault(text, []).append(i)
+    jobs = asyncio.Queue()
+    for text in positions:
+        for language in languages:
+            jobs.put_nowait((text, language))
+    total = jobs.qsize()
+    results = asyncio.Queue()
+    limiter = RateLimiter(rate)
+
+    async def worker():
+        while not jobs.empty():
+            text, language = jobs.get_nowait()
+            translation, error = await _translate(TRANSLATION_AGENTS[language], text, limiter, retries)
+            await results.put({
+                'text': text, 'language': language, 'translation': translation,
+                'error': error, 'indexes': positions[text],
+            })
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(max_concurrency, total))]
+    try:
+        for _ in range(total):
+            yield await results.get()
+    finally:
+        # A consumer that stops early cancels the translations still running
+        for task in workers:
+            task.cancel()
+
+async def translate_all(texts: List[str], languages: Iterable[str], **kwargs) -> Dict[str, List[Optional[str]]]:
+    """Collect ``translate_batch`` into one list per language, aligned with ``texts``.
+
+    Args:
+        texts (List[str]): Texts to translate
+        languages (Iterable[str]): Target languages
+        **kwargs: ``translate_batch`` options
+
+    Returns:
+        Dict[str, List[Optional[str]]]: Translations by language, None where translation failed
+    """
+    languages = list(dict.fromkeys(languages))
+    translations = {language: [None] * len(texts) for language in languages}
+    async for item in translate_batch(texts, languages, **kwargs):
+        for i in item['indexes']:
+            translations[item['language']][i] = item['translation']
+    return translations
+
 async def main():
-    result = await Runner.run(orchestrator_agent, input="Say 'Hello, how are you?' in Spanish.")
+    with span("agent.run", agent=orchestrator_agent.name):
+        result = await Runner.run(orchestrator_agent, input="Say 'Hello, how are you?' in Spanish.")
     print(result.final_output)
 
+    catalogue = ["Add to cart", "Checkout", "Your order has shipped", "Add to cart"]
+    async for item in translate_batch(catalogue, ["spanish", "french"]):
+        print(f"[{item['language']}] {item['text']} -> {item['translation'] or item['error']}")
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,17 +1,23 @@
-import requests
 from bs4 import BeautifulSoup
-from pypdf import PdfReader
-from openai import OpenAI
 from pydantic import BaseModel
-from agents import Agent, function_tool, Runner
+from agents import Agent, function_tool
+from http_fetch import get_fetcher, FetchCancelled, PDF_MAX_AGE
+from pdf_text import get_extractor
+from llm_cache import cached_chat_completion
+from relevance_filter import RelevanceFilter
+from result_sinks import ResultSink, format_paper_markdown, RELEVANT, NOT_RELEVANT, FILTERED
+from instrumentation import span, traced
+import heapq
+import itertools
 import json
+import queue
 import re
+import threading
 
 # Tool: Fetch PDF links from a URL
 def fetch_pdf_links_fn(url: str) -> list[str]:
     print(f"[TOOL] fetch_pdf_links_fn called with url={url}")
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = BeautifulSoup(get_fetcher().fetch_text(url), 'html.parser')
     pdf_links = []
 
     # Helper: Convert arXiv abstract/abs link to PDF link
@@ -57,21 +63,18 @@ def fetch_pdf_links_fn(url: str) -> list[str]:
                 pdf_links.append(urljoin(url, href))
     return pdf_links
 
+def download_pdf_fn(pdf_url: str, stop: threading.Event = None) -> bytes:
+    # Pooled session and content-addressed cache; a set stop event abandons the download
+    return get_fetcher().fetch(pdf_url, max_age=PDF_MAX_AGE, stop=stop)
+
+def pdf_bytes_to_text_fn(data: bytes, max_chars: int = None) -> str:
+    # Pages are extracted in a process pool, sanitized to valid UTF-8 and cached by PDF hash
+    return get_extractor().extract(data, max_chars=max_chars)
+
 # Tool: Download and extract text from a PDF
 def extract_pdf_text_fn(pdf_url: str) -> str:
     print(f"[TOOL] extract_pdf_text_fn called with pdf_url={pdf_url}")
-    response = requests.get(pdf_url)
-    with open('temp.pdf', 'wb') as f:
-        f.write(response.content)
-    reader = PdfReader('temp.pdf')
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    # Remove surrogate code points
-    text = ''.join(ch for ch in text if not (0xD800 <= ord(ch) <= 0xDFFF))
-    # Sanitize text to valid UTF-8
-    text = text.encode("utf-8", errors="replace").decode("utf-8")
-    return text
+    return pdf_bytes_to_text_fn(download_pdf_fn(pdf_url))
 
 # Pydantic model for paper info
 class PaperInfo(BaseModel):
@@ -83,10 +86,12 @@ class PaperInfo(BaseModel):
     technique_type: str  # 'Prompt Engineering Technique', 'Language Model Technique', or 'Other'
     technique_description: str
 
+# analyze_paper_fn only reads this much of a paper
+ANALYZE_MAX_CHARS = 12000
+
 # Tool: Analyze paper for prompt engineering relevance and extract info
 def analyze_paper_fn(text: str) -> dict:
     print(f"[TOOL] analyze_paper_fn called (text length={len(text)})")
-    client = OpenAI()
     system_prompt = (
         "You are an expert in prompt engineering and language model research. "
         "Given the following paper text, extract the following fields as JSON: "
@@ -100,24 +105,25 @@ def analyze_paper_fn(text: str) -> dict:
         "If the paper is not about prompt engineering or language model techniques, return null. "
         "Output as JSON: {title, summary, year, month, authors, technique_type, technique_description} or null."
     )
-    response = client.chat.completions.create(
+    # Deterministic (temperature=0), so repeated papers are answered from the response cache
+    content = cached_chat_completion(
         model="gpt-3.5-turbo",
         messages=[
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": text[:12000]},  # Truncate to fit token limit
+            {"role": "user", "content": text[:ANALYZE_MAX_CHARS]},  # Truncate to fit token limit
         ],
         temperature=0,
         max_tokens=512
     )
     try:
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     except Exception:
         return None
 
 # Register tools
-fetch_pdf_links = function_tool(fetch_pdf_links_fn)
-extract_pdf_text = function_tool(extract_pdf_text_fn)
-analyze_paper = function_tool(analyze_paper_fn)
+fetch_pdf_links = function_tool(traced("tool.fetch_pdf_links")(fetch_pdf_links_fn))
+extract_pdf_text = function_tool(traced("tool.extract_pdf_text")(extract_pdf_text_fn))
+analyze_paper = function_tool(traced("tool.analyze_paper")(analyze_paper_fn))
 
 # Agent definition
 agent = Agent(
@@ -132,32 +138,153 @@ def save_results_to_markdown_fn(papers: list, filename: str = "papers_output.md"
     for idx, paper in enumerate(papers, 1):
         if not paper:
             continue
-        md_lines.append(f"## {idx}. {paper.get('title', 'Untitled')}")
-        md_lines.append(f"- **Authors:** {', '.join(paper.get('authors', []))}")
-        md_lines.append(f"- **Year:** {paper.get('year', '')}")
-        md_lines.append(f"- **Month:** {paper.get('month', '')}")
-        md_lines.append(f"- **Technique Type:** {paper.get('technique_type', '')}")
-        md_lines.append(f"- **Technique Description:** {paper.get('technique_description', '')}")
-        md_lines.append(f"- **Summary:** {paper.get('summary', '')}\n")
+        md_lines.extend(format_paper_markdown(idx, paper))
     with open(filename, "w", encoding="utf-8") as f:
         f.write("\n".join(md_lines))
     return f"Results saved to {filename}"
 
-save_results_to_markdown = function_tool(save_results_to_markdown_fn)
+save_results_to_markdown = function_tool(traced("tool.save_results_to_markdown")(save_results_to_markdown_fn))
+
+# Pipeline plumbing: each stage has its own worker pool, and stages are joined by
+# bounded queues so a fast stage blocks instead of piling up work for a slow one
+_STAGE_DONE = object()
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+class _RelevanceQueue(queue.PriorityQueue):
+    # Highest-scoring papers come out first; end-of-stage markers sort after every paper
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._order = itertools.count()
+
+    def _put(self, item):
+        key = (float("inf"), 0) if item is _STAGE_DONE else (-item[2][0], item[0])
+        heapq.heappush(self.queue, (key, next(self._order), item))
+
+    def _get(self):
+        return heapq.heappop(self.queue)[2]
 
-def orchestrate(url: str):
+def _start_stage(name: str, work, inbox: queue.Queue, outbox: queue.Queue, workers: int,
+                 downstream_workers: int, stop: threading.Event) -> None:
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while not stop.is_set():
+                try:
+                    item = inbox.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _STAGE_DONE:
+                    break
+                index, pdf_url, payload = item
+                try:
+                    with span(f"stage.{name}", pdf_url=pdf_url):
+                        result = work(pdf_url, payload)
+                except FetchCancelled:
+                    break
+                except Exception as exc:
+                    print(f"[{name}] failed for {pdf_url}: {exc}")
+                    continue
+                if result is not None and not _put(outbox, (index, pdf_url, result), stop):
+                    break
+        finally:
+            # The last worker out tells every downstream worker that no more items are coming
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(downstream_workers):
+                    _put(outbox, _STAGE_DONE, stop)
+
+    for i in range(workers):
+        threading.Thread(target=worker, name=f"{name}-{i}", daemon=True).start()
+
+def orchestrate(url: str, max_papers: int = 10, download_workers: int = 8, extract_workers: int = 4,
+                analyze_workers: int = 8, queue_size: int = 8, relevance_filter: RelevanceFilter = None,
+                sink_dir: str = None, resume: bool = False):
+    # PDFs are downloaded, extracted and analyzed concurrently, with at most queue_size
+    # items waiting between stages. Once max_papers relevant papers are found, queued
+    # work is dropped and running downloads are abandoned; LLM calls already in flight
+    # finish in the background and their results are discarded.
+    # With a relevance_filter, papers are scored locally before any LLM call: those below
+    # its threshold are dropped and the rest are analyzed best-scoring first. Without one,
+    # every paper is analyzed in link order.
+    # With a sink_dir, every outcome is appended to papers_output.jsonl/.md there as it
+    # happens; resume=True skips the URLs an earlier run analyzed, and its relevant papers
+    # count towards max_papers. Filtered URLs are scored again on resume.
+    sink = ResultSink(sink_dir, resume) if sink_dir else None
+    previous = sink.papers() if sink else []
     pdf_links = fetch_pdf_links_fn(url)
-    results = []
-    for pdf_url in pdf_links:
+    if sink and resume:
+        analyzed_urls = sink.analyzed_urls()
+        pdf_links = [pdf_url for pdf_url in pdf_links if pdf_url not in analyzed_urls]
+        print(f"Resuming: {len(analyzed_urls)} PDFs already analyzed, {len(pdf_links)} left")
+        if len(previous) >= max_papers:
+            sink.close()
+            return previous[:max_papers]
+    stop = threading.Event()
+    links = queue.Queue()
+    for index, pdf_url in enumerate(pdf_links):
+        links.put((index, pdf_url, None))
+    for _ in range(download_workers):
+        links.put(_STAGE_DONE)
+    downloaded = queue.Queue(maxsize=queue_size)
+    candidates = _RelevanceQueue(maxsize=queue_size)
+    analyzed = queue.Queue()
+
+    def download(pdf_url, _):
         print(f"Processing: {pdf_url}")
-        text = extract_pdf_text_fn(pdf_url)
-        info = analyze_paper_fn(text)
-        if info:
-            results.append(info)
-        if len(results) >= 10:
+        return download_pdf_fn(pdf_url, stop)
+
+    def extract(pdf_url, data):
+        text = pdf_bytes_to_text_fn(data, max_chars=ANALYZE_MAX_CHARS)
+        if relevance_filter is None:
+            return 0.0, text
+        score = relevance_filter.score(text)
+        if not relevance_filter.accepts(score):
+            print(f"Skipping {pdf_url}: relevance {score:.2f} below {relevance_filter.threshold}")
+            if sink:
+                sink.record(pdf_url, FILTERED)
+            return None
+        return score, text
+
+    def analyze(pdf_url, candidate):
+        _, text = candidate
+        info = analyze_paper_fn(text) or None
+        if info is None and sink and not stop.is_set():
+            sink.record(pdf_url, NOT_RELEVANT)
+        return info
+
+    _start_stage("download", download, links, downloaded, download_workers, extract_workers, stop)
+    _start_stage("extract", extract, downloaded, candidates, extract_workers, analyze_workers, stop)
+    _start_stage("analyze", analyze, candidates, analyzed, analyze_workers, 1, stop)
+
+    found = []
+    while len(previous) + len(found) < max_papers:
+        item = analyzed.get()
+        if item is _STAGE_DONE:
             break
-    # Save results to markdown
-    save_results_to_markdown_fn(results)
+        found.append(item)
+        if sink:
+            sink.record(item[1], RELEVANT, item[2])
+    stop.set()
+
+    # The first max_papers to finish analysis, reported in link order after earlier runs' papers
+    results = previous + [info for _, _, info in sorted(found, key=lambda item: item[0])]
+    if sink:
+        sink.close()
+    else:
+        # Save results to markdown
+        save_results_to_markdown_fn(results)
     return results
 
 if __name__ == "__main__":
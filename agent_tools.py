@@ -8,10 +8,13 @@ def bill_customer_fn(customer_id: str) -> str:
     return f"Customer {customer_id} has been billed $99.99."
 
 from agents import function_tool
+from tool_cache import cacheable, side_effecting
 
-get_invoice_details = function_tool(get_invoice_details_fn)
-refund_customer = function_tool(refund_customer_fn)
-bill_customer = function_tool(bill_customer_fn)
+# Invoice lookups are read-only; refunds and bills must not run twice when an agent retries,
+# which they are protected against inside a tool_cache.idempotency_scope() opened for the agent run
+get_invoice_details = function_tool(cacheable(ttl=60)(get_invoice_details_fn))
+refund_customer = function_tool(side_effecting()(refund_customer_fn))
+bill_customer = function_tool(side_effecting()(bill_customer_fn))
 
 if __name__ == "__main__":
     print(get_invoice_details_fn("12345"))
@@ -2,8 +2,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from agents import Agent, Runner, function_tool
+from instrumentation import span
+from tool_cache import cacheable
 
 @function_tool
+@cacheable(ttl=600)
 def get_weather(city: str) -> str:
     """Return a haiku about the weather in a city."""
     if city.lower() == "paris":
@@ -21,5 +24,6 @@ haiku_agent = Agent(
 )
 
 if __name__ == "__main__":
-    result = Runner.run_sync(haiku_agent, "Write a haiku about Paris.")
+    with span("agent.run_sync", agent=haiku_agent.name):
+        result = Runner.run_sync(haiku_agent, "Write a haiku about Paris.")
     print(result.final_output)
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""Shared HTTP fetch layer for the PDF tools.
+
+Every thread gets its own keep-alive ``requests.Session`` with a connection
+pool and automatic retries. Response bodies are stored in a content-addressed
+on-disk cache (``objects/<sha256>``), with a small ref file per URL recording
+the digest, the response charset and the ETag/Last-Modified validators. A cached URL younger than
+``max_age`` is served without touching the network; an older one is
+revalidated with a conditional GET, which costs a 304 and no body when
+nothing changed.
+
+Self-check against a local HTTP server:
+    python http_fetch.py
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentation import span
+
+DEFAULT_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache"))
+# Published PDFs practically never change, listings do
+PDF_MAX_AGE = 7 * 24 * 3600
+PAGE_MAX_AGE = 600
+
+
+class FetchCancelled(Exception):
+    pass
+
+
+def _charset(content_type: Optional[str]) -> Optional[str]:
+    # The charset parameter of a Content-Type header, e.g. "text/html; charset=ISO-8859-1"
+    for param in (content_type or "").split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset" and value.strip():
+            return value.strip().strip('"\'')
+    return None
+
+
+def make_session(retries: int = 3, backoff: float = 0.5, pool_size: int = 16) -> requests.Session:
+    """Create a keep-alive session that retries transient failures.
+
+    Args:
+        retries (int): Retries for connection errors and 429/5xx responses
+        backoff (float): Exponential backoff factor between retries, in seconds
+        pool_size (int): Connections kept open per host
+
+    Returns:
+        requests.Session: The configured session
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "openai-sdk-agent-experiments/1.0"
+    return session
+
+
+class HttpFetcher:
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, max_age: float = PAGE_MAX_AGE,
+                 timeout: float = 60, session_factory: Callable[[], requests.Session] = make_session):
+        """Fetch URLs through pooled sessions and the content-addressed cache.
+
+        Args:
+            cache_dir (Optional[str]): Cache directory, caching is disabled if None
+            max_age (float): Seconds a cached response is used without revalidation
+            timeout (float): Connect and read timeout per request, in seconds
+            session_factory (Callable[[], requests.Session]): Creates each thread's session
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            (self.cache_dir / "objects").mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / "refs").mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age
+        self.timeout = timeout
+        self.session_factory = session_factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {'fresh_hits': 0, 'revalidated': 0, 'downloads': 0, 'bytes_downloaded': 0}
+
+    @property
+    def session(self) -> requests.Session:
+        """This thread's session; sessions are not shared between threads."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.session_factory()
+        return session
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def _ref_path(self, url: str) -> Path:
+        return self.cache_dir / "refs" / (hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _object_path(self, digest: str) -> Path:
+        return self.cache_dir / "objects" / digest[:2] / digest
+
+    def _read_ref(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._ref_path(url), 'r') as f:
+                ref = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A ref whose object was deleted is as good as no ref
+        return ref if self._object_path(ref['sha256']).exists() else None
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _store(self, url: str, data: bytes, response: requests.Response) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            self._write_atomic(path, data)
+        self._write_ref(url, {
+            'url': url,
+            'sha256': digest,
+            'etag': response.headers.get("ETag"),
+            'last_modified': response.headers.get("Last-Modified"),
+            'content_type': response.headers.get("Content-Type"),
+            'charset': _charset(response.headers.get("Content-Type")),
+            'fetched_at': time.time(),
+        })
+
+    def _write_ref(self, url: str, ref: Dict[str, Any]) -> None:
+        self._write_atomic(self._ref_path(url), json.dumps(ref).encode("utf-8"))
+
+    def fetch(self, url: str, max_age: Optional[float] = None, stop: Optional[threading.Event] = None) -> bytes:
+        """Fetch a URL's body, from the cache when it is fresh or still valid.
+
+        Args:
+            url (str): URL to fetch
+            max_age (Optional[float]): Seconds a cached copy is used without
+                revalidation, defaults to the fetcher's ``max_age``
+            stop (Optional[threading.Event]): Abandon the download once this is set
+
+        Returns:
+            bytes: Response body
+
+        Raises:
+            FetchCancelled: If ``stop`` was set during the download
+            requests.HTTPError: If the server answered with an error status
+        """
+        return self._fetch_traced(url, max_age, stop)[0]
+
+    def _fetch_traced(self, url: str, max_age: Optional[float],
+                      stop: Optional[threading.Event]) -> Tuple[bytes, Optional[str]]:
+        with span("http.fetch", url=url) as stage:
+            data, outcome, charset = self._fetch(url, max_age, stop)
+            stage.set(outcome=outcome, bytes=len(data))
+        return data, charset
+
+    def _fetch(self, url: str, max_age: Optional[float],
+               stop: Optional[threading.Event]) -> Tuple[bytes, str, Optional[str]]:
+        max_age = self.max_age if max_age is None else max_age
+        ref = self._read_ref(url) if self.cache_dir is not None else None
+        # Refs written before the charset was recorded still have the Content-Type
+        ref_charset = (ref.get('charset') or _charset(ref.get('content_type'))) if ref is not None else None
+        if ref is not None and time.time() - ref['fetched_at'] < max_age:
+            self._count('fresh_hits')
+            return self._object_path(ref['sha256']).read_bytes(), "fresh", ref_charset
+
+        headers = {}
+        if ref is not None:
+            if ref.get('etag'):
+                headers["If-None-Match"] = ref['etag']
+            if ref.get('last_modified'):
+                headers["If-Modified-Since"] = ref['last_modified']
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304 and ref is not None:
+                self._count('revalidated')
+                self._write_ref(url, {**ref, 'fetched_at': time.time()})
+                return self._object_path(ref['sha256']).read_bytes(), "revalidated", ref_charset
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if stop is not None and stop.is_set():
+                    raise FetchCancelled(url)
+                chunks.append(chunk)
+            data = b"".join(chunks)
+            self._count('downloads')
+            self._count('bytes_downloaded', len(data))
+            if self.cache_dir is not None:
+                self._store(url, data, response)
+            charset = _charset(response.headers.get("Content-Type"))
+        return data, "download", charset
+
+    def fetch_text(self, url: str, max_age: Optional[float] = None) -> str:
+        """Fetch a URL and decode it with its Content-Type charset, replacing invalid bytes.
+
+        Responses without a charset, or with one Python does not know, are
+        decoded as UTF-8.
+
+        Args:
+            url (str): URL to fetch
+            max_age (Optional[float]): See ``fetch``
+
+        Returns:
+            str: Decoded response body
+        """
+        data, charset = self._fetch_traced(url, max_age, None)
+        try:
+            return data.decode(charset or "utf-8", errors="replace")
+        except LookupError:
+            return data.decode("utf-8", errors="replace")
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of fresh cache hits, 304 revalidations, downloads and downloaded bytes."""
+        with self._lock:
+            return dict(self.counters)
+
+
+_fetcher: Optional[HttpFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> HttpFetcher:
+    """The process-wide fetcher used by the PDF tools, created on first use."""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = HttpFetcher()
+    return _fetcher
+
+
+def set_fetcher(fetcher: HttpFetcher) -> None:
+    """Replace the process-wide fetcher, e.g. with a different cache or session factory."""
+    global _fetcher
+    _fetcher = fetcher
+
+
+def _self_check() -> None:
+    # Serve a fixed PDF-like body with an ETag from a local server and exercise the cache
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    body = b"%PDF-1.4 stand-in body"
+    etag = '"v1"'
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/paper.pdf"
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            fetcher = HttpFetcher(cache_dir)
+            assert fetcher.fetch(url) == body
+            assert fetcher.fetch(url) == body
+            assert fetcher.fetch(url, max_age=0) == body
+            assert fetcher.stats() == {'fresh_hits': 1, 'revalidated': 1, 'downloads': 1, 'bytes_downloaded': len(body)}
+            assert requests_seen == [None, etag]
+            # A new fetcher over the same cache reuses the stored object
+            assert HttpFetcher(cache_dir).fetch(url) == body
+            assert len(requests_seen) == 2
+    finally:
+        server.shutdown()
+    print("✅ http_fetch self-check passed")
+
+
+if __name__ == "__main__":
+    _self_check()
@@ -0,0 +1,279 @@
+"""Lightweight span tracing and latency histograms.
+
+Named spans wrap the expensive stages (HTTP fetches, PDF parsing, LLM calls,
+agent runs, embedding and FAISS search) and aggregate in-process into
+log-bucketed histograms, read back as p50/p95/p99 with ``summary()``. Spans
+can also be exported one JSON line each, and stages named in ``profile`` are
+run under cProfile, with their stats collected into ``<profile_dir>/<stage>.prof``.
+
+Tracing is off by default, and then ``span`` returns a shared no-op context
+manager and ``traced`` functions call straight through. Turn it on in code
+with ``enable()``, or for any script through the environment:
+
+    AGENT_TRACE=1 AGENT_TRACE_FILE=trace.jsonl AGENT_PROFILE=pdf.parse python agent_pdf_extractor_vibe.py
+
+With AGENT_TRACE set, the latency report is printed to stderr at exit.
+"""
+import atexit
+import cProfile
+import functools
+import inspect
+import itertools
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+_enabled = False
+_trace_file = None
+_profile_stages = frozenset()
+_profile_dir: Optional[Path] = None
+_profiles: Dict[str, pstats.Stats] = {}
+_lock = threading.Lock()
+_span_ids = itertools.count(1)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+class Histogram:
+    # Buckets grow by 5%, so percentiles are within 5% of the true value at any scale
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, seconds: float) -> None:
+        bucket = math.ceil(math.log(max(seconds, 1e-7) * 1e7, self.GROWTH))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile, in seconds."""
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.GROWTH ** bucket / 1e7, self.max)
+        return self.max
+
+
+_histograms: Dict[str, Histogram] = {}
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "span_id", "parent_id", "started_at", "_start", "_token", "_profiler")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        """Attach attributes known only once the stage has run, e.g. a cache outcome."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.span_id = next(_span_ids)
+        self.parent_id = _current_span.get()
+        self._token = _current_span.set(self.span_id)
+        self._profiler = None
+        if self.name in _profile_stages:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self._profiler = profiler
+            except ValueError:
+                # Another stage is already being profiled
+                pass
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+        _current_span.reset(self._token)
+        _record(self, duration, exc_type)
+        return False
+
+
+def _record(span_: Span, duration: float, exc_type) -> None:
+    with _lock:
+        histogram = _histograms.get(span_.name)
+        if histogram is None:
+            histogram = _histograms[span_.name] = Histogram()
+        histogram.add(duration)
+        if _trace_file is not None:
+            event = {
+                'name': span_.name,
+                'span_id': span_.span_id,
+                'parent_id': span_.parent_id,
+                'thread': threading.current_thread().name,
+                'start': span_.started_at,
+                'duration_ms': duration * 1000,
+                'attrs': span_.attrs,
+            }
+            if exc_type is not None:
+                event['error'] = exc_type.__name__
+            _trace_file.write(json.dumps(event, default=str) + "\n")
+        if span_._profiler is not None and _profile_dir is not None:
+            stats = _profiles.get(span_.name)
+            if stats is None:
+                stats = _profiles[span_.name] = pstats.Stats(span_._profiler)
+            else:
+                stats.add(span_._profiler)
+            stats.dump_stats(str(_profile_dir / f"{span_.name}.prof"))
+
+
+def span(name: str, **attrs):
+    """Time a stage.
+
+    Args:
+        name (str): Stage name, e.g. "http.fetch"; spans of the same name share a histogram
+        **attrs: Attributes exported with the span
+
+    Returns:
+        A context manager; a shared no-op one while tracing is disabled
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator that runs every call of a function, sync or async, in a span.
+
+    Args:
+        name (Optional[str]): Stage name, defaults to the function's qualified name
+
+    Returns:
+        Callable: The decorator
+    """
+    def decorator(fn: Callable) -> Callable:
+        stage = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                with Span(stage, {}):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not _enabled:
+                    return fn(*args, **kwargs)
+                with Span(stage, {}):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(trace_path: Optional[str] = None, profile: Iterable[str] = (),
+           profile_dir: str = ".profiles", report_at_exit: bool = False) -> None:
+    """Turn tracing on.
+
+    Args:
+        trace_path (Optional[str]): JSONL file every finished span is appended to
+        profile (Iterable[str]): Stage names to run under cProfile
+        profile_dir (str): Directory of the collected ``<stage>.prof`` files
+        report_at_exit (bool): Print the latency report to stderr when the process exits
+    """
+    global _enabled, _trace_file, _profile_stages, _profile_dir
+    with _lock:
+        if _trace_file is not None:
+            _trace_file.close()
+        _trace_file = open(trace_path, 'a', encoding="utf-8", buffering=1) if trace_path else None
+        _profile_stages = frozenset(profile)
+        _profile_dir = Path(profile_dir) if _profile_stages else None
+        if _profile_dir is not None:
+            _profile_dir.mkdir(parents=True, exist_ok=True)
+        _enabled = True
+    if report_at_exit:
+        atexit.register(lambda: print(report(), file=sys.stderr))
+
+
+def disable() -> None:
+    """Turn tracing off and close the trace file; the histograms are kept."""
+    global _enabled, _trace_file, _profile_stages
+    with _lock:
+        _enabled = False
+        _profile_stages = frozenset()
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Forget all recorded latencies and profiles."""
+    with _lock:
+        _histograms.clear()
+        _profiles.clear()
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """Count, mean, p50/p95/p99 and max latency in milliseconds of every stage."""
+    with _lock:
+        return {
+            name: {
+                'count': histogram.count,
+                'mean_ms': histogram.total / histogram.count * 1000,
+                'p50_ms': histogram.percentile(50) * 1000,
+                'p95_ms': histogram.percentile(95) * 1000,
+                'p99_ms': histogram.percentile(99) * 1000,
+                'max_ms': histogram.max * 1000,
+            }
+            for name, histogram in sorted(_histograms.items())
+        }
+
+
+def report() -> str:
+    """The ``summary`` as a table."""
+    lines = [f"{'stage':<24} {'count':>7} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}"]
+    for name, row in summary().items():
+        lines.append(
+            f"{name:<24} {row['count']:>7} " + " ".join(
+                f"{row[key]:>8.2f}ms" for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+            )
+        )
+    return "\n".join(lines)
+
+
+if os.environ.get("AGENT_TRACE", "").lower() in ("1", "true", "yes"):
+    enable(
+        trace_path=os.environ.get("AGENT_TRACE_FILE") or None,
+        profile=[stage for stage in os.environ.get("AGENT_PROFILE", "").split(",") if stage],
+        profile_dir=os.environ.get("AGENT_PROFILE_DIR", ".profiles"),
+        report_at_exit=True,
+    )
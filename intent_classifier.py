@@ -0,0 +1,233 @@
+"""Local fast path for intent and entity extraction in the support orchestrator.
+
+Most support messages say plainly what they want ("refund customer 12345",
+"show me invoice 98765"), and a gpt-3.5 round-trip to label them costs far
+more than the answer is worth. ``classify_message`` labels them locally with
+a keyword-weighted linear scorer for the intents and compiled regexes for IDs
+and amounts, in microseconds, and reports whether it is confident. IDs are
+only taken from numbers next to an ID keyword ("customer 12345", "invoice
+#98765") or a "#"; a bare number may as well be a phone number, an order
+number or a year. Messages with borderline intent scores, negations, bare
+numbers or numbers it cannot attribute are left to the LLM.
+
+Benchmark against a labelled message set:
+    python intent_classifier.py --labels intent_messages.jsonl [--with-llm]
+"""
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+INTENTS = ("refund", "invoice", "billing")
+
+# Weight of each keyword towards an intent; an intent is detected once its weights reach ACCEPT_SCORE
+INTENT_WEIGHTS = {
+    "refund": {
+        "refund": 3.0, "refunds": 3.0, "refunded": 3.0, "refunding": 3.0, "money back": 3.0,
+        "reimburse": 2.5, "reimbursement": 2.5, "chargeback": 2.5, "return": 1.0, "overcharged": 1.5,
+    },
+    "invoice": {
+        "invoice": 3.0, "invoices": 3.0, "receipt": 2.0, "statement": 1.5, "invoice details": 1.0,
+    },
+    # Past tense ("we billed them") describes an earlier charge rather than asking for one
+    "billing": {
+        "bill": 3.0, "billing": 3.0, "charge": 2.0, "payment": 1.5, "pay": 1.5, "subscription": 1.0,
+    },
+}
+ACCEPT_SCORE = 2.5
+AMBIGUOUS_SCORE = 1.0
+
+KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(sorted(
+        (re.escape(term) for weights in INTENT_WEIGHTS.values() for term in weights), key=len, reverse=True
+    )) + r")\b"
+)
+TERM_INTENTS = {term: [(intent, weights[term]) for intent, weights in INTENT_WEIGHTS.items() if term in weights]
+                for weights in INTENT_WEIGHTS.values() for term in weights}
+
+INVOICE_ID_RE = re.compile(r"\binvoice\s*(?:#|no\.?|number|id)?\s*:?\s*#?(\d{3,})\b")
+CUSTOMER_ID_RE = re.compile(r"\b(?:customer|cust|account|acct|client)\s*(?:#|no\.?|number|id)?\s*:?\s*#?(\d{3,})\b")
+AMOUNT_RE = re.compile(r"\$\s?(\d+(?:,\d{3})*(?:\.\d{1,2})?)|\b(\d+(?:\.\d{1,2})?)\s?(?:usd|dollars)\b")
+NUMBER_RE = re.compile(r"#?\b(\d{3,})\b")
+# Wording that can flip or redirect an intent, which keyword scores cannot follow
+HEDGE_RE = re.compile(r"\b(not|don't|dont|doesn't|didn't|never|instead|without|unless|rather)\b")
+
+ID_FIELDS = {"refund": "customer_id", "invoice": "invoice_id", "billing": "customer_id"}
+
+
+def _spans_overlap(span: Tuple[int, int], spans: List[Tuple[int, int]]) -> bool:
+    return any(start < span[1] and span[0] < end for start, end in spans)
+
+
+def classify_message(message: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """Label a support message with intents and entities without calling the LLM.
+
+    Args:
+        message (str): User message
+
+    Returns:
+        Tuple[List[Dict[str, Any]], bool]: Intents in the ``extract_intents_entities``
+            format, in order of first mention, and whether the labels are confident
+            enough to skip the LLM
+    """
+    text = message.lower()
+    scores = dict.fromkeys(INTENTS, 0.0)
+    first_mention: Dict[str, int] = {}
+    anchors: List[Tuple[int, str]] = []
+    for match in KEYWORD_RE.finditer(text):
+        for intent, weight in TERM_INTENTS[match.group(1)]:
+            scores[intent] += weight
+            first_mention.setdefault(intent, match.start())
+            if weight >= 2.0:
+                anchors.append((match.start(), intent))
+
+    detected = sorted((intent for intent in INTENTS if scores[intent] >= ACCEPT_SCORE), key=first_mention.get)
+    confident = bool(detected) and not HEDGE_RE.search(text) and not any(
+        AMBIGUOUS_SCORE <= score < ACCEPT_SCORE for score in scores.values()
+    )
+
+    entities = {intent: {} for intent in detected}
+
+    def owner_of(position: int, candidates: Tuple[str, ...]) -> Optional[str]:
+        # The nearest intent keyword before the number, or else the first one after it
+        before = [intent for start, intent in anchors if start < position and intent in candidates]
+        after = [intent for start, intent in anchors if start > position and intent in candidates]
+        return before[-1] if before else (after[0] if after else None)
+
+    def assign(intent: Optional[str], field: str, value: str) -> bool:
+        if intent not in entities or entities[intent].get(field, value) != value:
+            return False
+        entities[intent][field] = value
+        return True
+
+    claimed: List[Tuple[int, int]] = []
+    customer_ids = []
+    for match in INVOICE_ID_RE.finditer(text):
+        claimed.append(match.span(1))
+        confident &= assign("invoice", "invoice_id", match.group(1))
+    for match in CUSTOMER_ID_RE.finditer(text):
+        claimed.append(match.span(1))
+        customer_ids.append(match.group(1))
+        confident &= assign(owner_of(match.start(), ("refund", "billing")), "customer_id", match.group(1))
+    for match in AMOUNT_RE.finditer(text):
+        claimed.append(match.span())
+        amount = (match.group(1) or match.group(2)).replace(",", "")
+        confident &= assign(owner_of(match.start(), ("refund", "billing")), "amount", amount)
+
+    for match in NUMBER_RE.finditer(text):
+        if _spans_overlap(match.span(1), claimed):
+            continue
+        if not match.group(0).startswith("#"):
+            confident = False
+            continue
+        owner = owner_of(match.start(), tuple(entities))
+        confident &= assign(owner, ID_FIELDS.get(owner, ""), match.group(1))
+
+    # "Bill and refund customer 123" names one customer for both intents
+    if len(set(customer_ids)) == 1:
+        for intent in ("refund", "billing"):
+            if intent in entities:
+                entities[intent].setdefault("customer_id", customer_ids[0])
+
+    return [{'intent': intent, 'entities': entities[intent]} for intent in detected], confident
+
+
+def tiered_extract(message: str, llm_extract: Callable[[str], List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Label a message locally, escalating to the LLM only when not confident.
+
+    Args:
+        message (str): User message
+        llm_extract (Callable[[str], List[Dict[str, Any]]]): LLM extractor such as
+            ``multi_agent_system.extract_intents_entities``
+
+    Returns:
+        Tuple[List[Dict[str, Any]], bool]: Intents and whether the LLM was called
+    """
+    intents, confident = classify_message(message)
+    if confident:
+        return intents, False
+    return llm_extract(message), True
+
+
+def _normalized(intents: List[Dict[str, Any]]) -> List[Tuple[str, Tuple[Tuple[str, str], ...]]]:
+    return sorted(
+        (item['intent'], tuple(sorted((key, str(value)) for key, value in item.get('entities', {}).items())))
+        for item in intents
+    )
+
+
+def benchmark(samples: List[Dict[str, Any]],
+              llm_extract: Optional[Callable[[str], List[Dict[str, Any]]]] = None,
+              repeats: int = 100) -> Dict[str, Any]:
+    """Measure the local tier on labelled messages.
+
+    Args:
+        samples (List[Dict[str, Any]]): Labelled messages, {"message": ..., "intents": [...]}
+        llm_extract (Optional[Callable[[str], List[Dict[str, Any]]]]): LLM extractor for
+            escalated messages; without it accuracy covers locally handled messages only
+        repeats (int): Timing repetitions per message for the local latency percentiles
+
+    Returns:
+        Dict[str, Any]: LLM-call rate, accuracies and latency percentiles
+    """
+    local_latencies = []
+    for sample in samples:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            classify_message(sample['message'])
+            local_latencies.append(time.perf_counter() - start)
+
+    escalated = local_correct = tiered_correct = 0
+    tiered_latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        intents, confident = classify_message(sample['message'])
+        if not confident:
+            escalated += 1
+            if llm_extract is not None:
+                intents = llm_extract(sample['message'])
+        tiered_latencies.append(time.perf_counter() - start)
+        correct = _normalized(intents) == _normalized(sample['intents'])
+        local_correct += confident and correct
+        tiered_correct += correct
+
+    handled_locally = len(samples) - escalated
+    report = {
+        'messages': len(samples),
+        'llm_call_rate': escalated / len(samples) if samples else 0.0,
+        'local_accuracy': local_correct / handled_locally if handled_locally else 0.0,
+        'local_p50_ms': float(np.percentile(local_latencies, 50) * 1000) if samples else 0.0,
+        'local_p99_ms': float(np.percentile(local_latencies, 99) * 1000) if samples else 0.0,
+    }
+    if llm_extract is not None:
+        report.update({
+            'tiered_accuracy': tiered_correct / len(samples) if samples else 0.0,
+            'tiered_p50_ms': float(np.percentile(tiered_latencies, 50) * 1000) if samples else 0.0,
+            'tiered_p99_ms': float(np.percentile(tiered_latencies, 99) * 1000) if samples else 0.0,
+        })
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the local intent classifier tier")
+    parser.add_argument("--labels", default="intent_messages.jsonl")
+    parser.add_argument("--with-llm", action="store_true", help="Escalate to the LLM and report end-to-end accuracy")
+    parser.add_argument("--repeats", type=int, default=100)
+    args = parser.parse_args()
+
+    with open(args.labels, 'r', encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    llm_extract = None
+    if args.with_llm:
+        from multi_agent_system import extract_intents_entities
+        llm_extract = extract_intents_entities
+    report = benchmark(samples, llm_extract, args.repeats)
+    for name, value in report.items():
+        print(f"{name:>16}: {value:.4f}" if isinstance(value, float) else f"{name:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Persistent cache for deterministic chat completions.
+
+Calls made with ``temperature=0`` return the same answer for the same input,
+so their responses are stored in a local SQLite database keyed by the model,
+the system prompt, a hash of the user content and the request parameters.
+Entries expire after ``ttl`` seconds, and the least recently used entries are
+evicted once the cache holds more than ``max_entries``.
+
+The OpenAI client is created on first use and can be replaced with
+``set_llm_client``, e.g. with a fake client for offline tests.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from instrumentation import span
+
+DEFAULT_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite"))
+
+
+class LLMCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = 30 * 24 * 3600,
+                 max_entries: int = 50_000, prune_interval: int = 100):
+        """Open (or create) the response cache.
+
+        Args:
+            path (str): SQLite database file, or ":memory:"
+            ttl (float): Seconds after which an entry expires
+            max_entries (int): Entries kept before the least recently used are evicted
+            prune_interval (int): Writes between eviction passes
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+        # One connection shared by all threads, serialized by the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+        self.prune()
+
+    @staticmethod
+    def key(model: str, system_prompt: str, user_content: str, params: Dict[str, Any]) -> str:
+        """Cache key of a request.
+
+        Args:
+            model (str): Model name
+            system_prompt (str): System prompt
+            user_content (str): User content, hashed
+            params (Dict[str, Any]): Sampling parameters such as temperature and max_tokens
+
+        Returns:
+            str: Hex SHA-256 key
+        """
+        payload = json.dumps({
+            'model': model,
+            'system': system_prompt,
+            'user': hashlib.sha256(user_content.encode("utf-8")).hexdigest(),
+            'params': params,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a cached response.
+
+        Args:
+            key (str): Key from ``key``
+
+        Returns:
+            Optional[str]: The cached response content, or None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.counters['evictions'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.counters['hits'] += 1
+            return row[0]
+
+    def put(self, key: str, model: str, content: str) -> None:
+        """Store a response.
+
+        Args:
+            key (str): Key from ``key``
+            model (str): Model that produced the response
+            content (str): Response content
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self._db.commit()
+            self._writes += 1
+            prune = self._writes % self.prune_interval == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop expired entries, then the least recently used ones over ``max_entries``.
+
+        Returns:
+            int: Number of entries evicted
+        """
+        with self._lock:
+            evicted = self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+            count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                evicted += self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+            self._db.commit()
+            self.counters['evictions'] += evicted
+            return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counts, hit rate and current number of entries."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = entries
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_client = None
+_cache: Optional[LLMCache] = None
+_lock = threading.Lock()
+
+
+def get_llm_client():
+    """The OpenAI client used for cached completions, created on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI()
+    return _client
+
+
+def set_llm_client(client) -> None:
+    """Replace the OpenAI client, e.g. with a fake client for offline tests."""
+    global _client
+    _client = client
+
+
+def get_llm_cache() -> LLMCache:
+    """The process-wide response cache, opened on first use."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
+
+
+def set_llm_cache(cache: Optional[LLMCache]) -> None:
+    """Replace the process-wide response cache."""
+    global _cache
+    _cache = cache
+
+
+def cached_chat_completion(model: str, messages: List[Dict[str, str]], client=None,
+                           cache: Optional[LLMCache] = None, **params) -> str:
+    """Run a chat completion, answering repeated deterministic requests from the cache.
+
+    Only requests with ``temperature=0`` are cached; anything else always
+    reaches the API.
+
+    Args:
+        model (str): Model name
+        messages (List[Dict[str, str]]): Chat messages
+        client: OpenAI client, defaults to ``get_llm_client()``
+        cache (Optional[LLMCache]): Response cache, defaults to ``get_llm_cache()``
+        **params: Further ``chat.completions.create`` parameters
+
+    Returns:
+        str: Content of the first choice
+    """
+    cache = cache or get_llm_cache()
+    key = None
+    if params.get('temperature') == 0:
+        system_prompt = "\n".join(m['content'] for m in messages if m['role'] == "system")
+        user_content = json.dumps([m for m in messages if m['role'] != "system"], sort_keys=True)
+        key = cache.key(model, system_prompt, user_content, params)
+        content = cache.get(key)
+        if content is not None:
+            return content
+
+    with span("llm.completion", model=model):
+        response = (client or get_llm_client()).chat.completions.create(model=model, messages=messages, **params)
+    content = response.choices[0].message.content
+    if key is not None and content is not None:
+        cache.put(key, model, content)
+    return content
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import openai
 from dotenv import load_dotenv
@@ -6,6 +7,10 @@ load_dotenv()
 client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 from agents import Agent, Runner
+from instrumentation import span
+from intent_classifier import classify_message
+from llm_cache import cached_chat_completion
+from tool_cache import idempotency_scope
 from meeting_rescheduler.agent_tools import get_invoice_details, refund_customer, bill_customer
 
 # Specialized agents
@@ -38,7 +43,7 @@ orchestrator_agent = Agent(
     handoffs=[invoice_agent, billing_agent, refund_agent]
 )
 
-def extract_intents_entities(user_message: str):
+def extract_intents_entities(user_message: str, llm_client=None):
     prompt = f'''
 You are an intent and entity extraction assistant for a customer support multi-agent system.
 Given the following user message, extract all intents (refund, invoice, billing) and their relevant entities (like customer_id, invoice_id, amount).
@@ -52,70 +57,119 @@ Example output:
   {{"intent": "invoice", "entities": {{"invoice_id": "55555"}}}}
 ]
 '''
-    response = client.chat.completions.create(
+    # Deterministic (temperature=0), so repeated messages are answered from the response cache
+    content = cached_chat_completion(
         model="gpt-3.5-turbo",
         messages=[{"role": "system", "content": prompt}],
+        client=llm_client or client,
         temperature=0,
         max_tokens=300
     )
     import json
-    return json.loads(response.choices[0].message.content)
-
-def multi_intent_orchestrator_llm(user_message: str):
-    intents = extract_intents_entities(user_message)
-    responses = []
+    return json.loads(content)
+
+# Sub-agents for independent intents run concurrently, at most this many at once
+MAX_CONCURRENT_AGENTS = 3
+# Seconds before a sub-agent's answer is given up on
+AGENT_TIMEOUT = 60.0
+
+async def _run_agent(agent: Agent, prompt: str, semaphore: asyncio.Semaphore, timeout: float) -> str:
+    async with semaphore:
+        try:
+            # Each run gets its own idempotency keys: retries within it replay, later runs execute
+            with span("agent.run", agent=agent.name), idempotency_scope():
+                result = await asyncio.wait_for(Runner.run(agent, prompt), timeout)
+            return result.final_output
+        except asyncio.TimeoutError:
+            return f"{agent.name} did not answer within {timeout:g}s."
+        except Exception as exc:
+            # One failing sub-agent must not discard the others' answers
+            return f"{agent.name} failed: {exc}"
+
+async def _dispatch(plan: list, max_concurrency: int, timeout: float) -> list:
+    # plan holds (agent, prompt) jobs and ready-made messages; answers keep the plan's order
+    semaphore = asyncio.Semaphore(max_concurrency)
+    jobs = [
+        _run_agent(step[0], step[1], semaphore, timeout)
+        for step in plan if isinstance(step, tuple)
+    ]
+    answers = iter(await asyncio.gather(*jobs))
+    return [next(answers) if isinstance(step, tuple) else step for step in plan]
+
+async def multi_intent_orchestrator_llm_async(user_message: str, max_concurrency: int = MAX_CONCURRENT_AGENTS,
+                                              timeout: float = AGENT_TIMEOUT, llm_client=None,
+                                              local_classifier: bool = True):
+    # Plainly worded messages are labelled locally; only ambiguous ones cost an LLM call
+    with span("intent.classify"):
+        intents, confident = classify_message(user_message) if local_classifier else ([], False)
+    if not confident:
+        intents = await asyncio.to_thread(extract_intents_entities, user_message, llm_client)
+    plan = []
     for item in intents:
         intent = item["intent"]
         entities = item.get("entities", {})
         if intent == "refund":
             customer_id = entities.get("customer_id", "")
             if customer_id:
-                responses.append(Runner.run_sync(refund_agent, f"Refund customer {customer_id}").final_output)
+                plan.append((refund_agent, f"Refund customer {customer_id}"))
             else:
-                responses.append("Refund intent detected, but no customer ID found.")
+                plan.append("Refund intent detected, but no customer ID found.")
         elif intent == "invoice":
             invoice_id = entities.get("invoice_id", "")
             if invoice_id:
-                responses.append(Runner.run_sync(invoice_agent, f"Get the invoice details for invoice {invoice_id}").final_output)
+                plan.append((invoice_agent, f"Get the invoice details for invoice {invoice_id}"))
             else:
-                responses.append("Invoice intent detected, but no invoice ID found.")
+                plan.append("Invoice intent detected, but no invoice ID found.")
         elif intent == "billing":
             customer_id = entities.get("customer_id", "")
             if customer_id:
-                responses.append(Runner.run_sync(billing_agent, f"Bill customer {customer_id}").final_output)
+                plan.append((billing_agent, f"Bill customer {customer_id}"))
             else:
-                responses.append("Billing intent detected, but no customer ID found.")
+                plan.append("Billing intent detected, but no customer ID found.")
+    responses = await _dispatch(plan, max_concurrency, timeout)
     if not responses:
         responses.append("Sorry, I couldn't identify any actionable request.")
     return "\n\n".join(responses)
 
-def multi_intent_orchestrator(user_message: str):
-    responses = []
+def multi_intent_orchestrator_llm(user_message: str):
+    return asyncio.run(multi_intent_orchestrator_llm_async(user_message))
+
+async def multi_intent_orchestrator_async(user_message: str, max_concurrency: int = MAX_CONCURRENT_AGENTS,
+                                          timeout: float = AGENT_TIMEOUT):
+    plan = []
     if "refund" in user_message.lower():
-        responses.append(Runner.run_sync(refund_agent, user_message).final_output)
+        plan.append((refund_agent, user_message))
     if "invoice" in user_message.lower():
-        responses.append(Runner.run_sync(invoice_agent, user_message).final_output)
+        plan.append((invoice_agent, user_message))
     if "bill" in user_message.lower():
-        responses.append(Runner.run_sync(billing_agent, user_message).final_output)
+        plan.append((billing_agent, user_message))
+    responses = await _dispatch(plan, max_concurrency, timeout)
     if not responses:
         responses.append("Sorry, I couldn't identify any actionable request.")
     return "\n\n".join(responses)
 
+def multi_intent_orchestrator(user_message: str):
+    return asyncio.run(multi_intent_orchestrator_async(user_message))
+
 if __name__ == "__main__":
     print("Refund example:")
-    result = Runner.run_sync(orchestrator_agent, "I need to refund customer 12345")
+    with span("agent.run_sync", agent=orchestrator_agent.name), idempotency_scope():
+        result = Runner.run_sync(orchestrator_agent, "I need to refund customer 12345")
     print(result.final_output)
 
     print("\nInvoice example:")
-    result = Runner.run_sync(orchestrator_agent, "Get the invoice details for invoice 98765")
+    with span("agent.run_sync", agent=orchestrator_agent.name), idempotency_scope():
+        result = Runner.run_sync(orchestrator_agent, "Get the invoice details for invoice 98765")
     print(result.final_output)
 
     print("\nBilling example:")
-    result = Runner.run_sync(orchestrator_agent, "Bill customer 54321")
+    with span("agent.run_sync", agent=orchestrator_agent.name), idempotency_scope():
+        result = Runner.run_sync(orchestrator_agent, "Bill customer 54321")
     print(result.final_output)
 
     print("\nHandoff example:")
-    result = Runner.run_sync(orchestrator_agent, "I need a refund and also want to see my invoice for 55555")
+    with span("agent.run_sync", agent=orchestrator_agent.name), idempotency_scope():
+        result = Runner.run_sync(orchestrator_agent, "I need a refund and also want to see my invoice for 55555")
     print(result.final_output)
 
     print("\nMulti-intent handoff example:")
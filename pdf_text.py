@@ -0,0 +1,238 @@
+"""Page-parallel PDF text extraction with an on-disk text cache.
+
+pypdf is pure Python and holds the GIL, so long papers are split into page
+ranges that are extracted in a process pool. The page texts are joined once
+and sanitized in bulk, and the result is cached under the SHA-256 of the PDF
+bytes so the same PDF is never parsed twice.
+
+Callers that only read the start of a paper can pass ``max_pages`` or
+``max_chars``; page ranges are then submitted in order, only as many as the
+text collected so far suggests are still needed, and none once the limit is
+reached.
+"""
+import hashlib
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+from instrumentation import span
+
+DEFAULT_CACHE_DIR = os.environ.get("PDF_TEXT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pdf_text_cache"))
+
+
+def sanitize(text: str) -> str:
+    """Drop surrogate code points and anything else that is not valid UTF-8.
+
+    Args:
+        text (str): Extracted text
+
+    Returns:
+        str: Text that encodes to UTF-8 cleanly
+    """
+    return text.encode("utf-8", "ignore").decode("utf-8")
+
+
+# The PDF last parsed by this worker process, by digest, reused for its later page ranges
+_worker_reader: Optional[Tuple[str, PdfReader]] = None
+
+
+def _extract_pages(path: str, digest: str, start: int, end: int) -> str:
+    # Runs in a worker process, which parses the PDF once rather than once per range
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[0] != digest:
+        _worker_reader = (digest, PdfReader(path))
+    reader = _worker_reader[1]
+    return "".join([reader.pages[i].extract_text() or "" for i in range(start, end)])
+
+
+class PdfTextExtractor:
+    def __init__(self, workers: Optional[int] = None, pages_per_task: int = 4, min_parallel_pages: int = 8,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
+        """Extract PDF text across a process pool, caching the results.
+
+        Args:
+            workers (Optional[int]): Worker processes, defaults to the number of CPUs
+            pages_per_task (int): Pages extracted per pool task
+            min_parallel_pages (int): PDFs with fewer pages are extracted in-process,
+                where the pool's overhead would outweigh its gain
+            cache_dir (Optional[str]): Text cache directory, caching is disabled if None
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.min_parallel_pages = min_parallel_pages
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.counters = {'cache_hits': 0, 'extractions': 0, 'pages': 0}
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """The worker pool, started on first use."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # Forking a process that runs pipeline threads can copy held locks into the workers
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _cache_path(self, digest: str, max_pages: Optional[int], max_chars: Optional[int]) -> Path:
+        name = f"{digest}.p{max_pages or 'all'}.c{max_chars or 'all'}.txt"
+        return self.cache_dir / digest[:2] / name
+
+    def _read_cache(self, digest: str, max_pages: Optional[int], max_chars: Optional[int]) -> Optional[str]:
+        candidates = [(self._cache_path(digest, max_pages, max_chars), None)]
+        if max_pages is None and max_chars is not None:
+            # The full text answers any character limit
+            candidates.append((self._cache_path(digest, None, None), max_chars))
+        for path, limit in candidates:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except OSError:
+                continue
+            return text[:limit] if limit else text
+        return None
+
+    def _write_cache(self, path: Path, text: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'w', encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def _extract_serial(self, reader: PdfReader, page_count: int, max_chars: Optional[int]) -> List[str]:
+        parts: List[str] = []
+        chars = 0
+        for i in range(page_count):
+            part = reader.pages[i].extract_text() or ""
+            parts.append(part)
+            chars += len(part)
+            if max_chars is not None and chars >= max_chars:
+                break
+        return parts
+
+    def _in_flight_limit(self, parts: List[str], chars: int, max_chars: Optional[int]) -> int:
+        if max_chars is None:
+            return self.workers
+        if not parts:
+            # Nothing is known about the text density yet, so keep every worker busy with the first wave
+            return self.workers
+        chars_per_range = max(chars / len(parts), 1.0)
+        return max(1, min(self.workers, math.ceil((max_chars - chars) / chars_per_range)))
+
+    def _extract_parallel(self, data: bytes, digest: str, ranges: List[range], max_chars: Optional[int]) -> List[str]:
+        parts: List[str] = []
+        chars = 0
+        # Workers read the PDF from a file instead of each task pickling the bytes
+        fd, path = tempfile.mkstemp(prefix="pdf-", suffix=".pdf")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            pending = deque()
+            next_range = 0
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < self._in_flight_limit(parts, chars, max_chars):
+                    r = ranges[next_range]
+                    pending.append(self.pool.submit(_extract_pages, path, digest, r.start, r.stop))
+                    next_range += 1
+                part = pending.popleft().result()
+                parts.append(part)
+                chars += len(part)
+                if max_chars is not None and chars >= max_chars:
+                    for future in pending:
+                        future.cancel()
+                    break
+        finally:
+            os.unlink(path)
+        return parts
+
+    def extract(self, data: bytes, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+        """Extract the text of a PDF.
+
+        Args:
+            data (bytes): PDF file contents
+            max_pages (Optional[int]): Only extract the first N pages
+            max_chars (Optional[int]): Stop once N characters are extracted and truncate to N
+
+        Returns:
+            str: Sanitized text of the extracted pages
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self.cache_dir is not None:
+            text = self._read_cache(digest, max_pages, max_chars)
+            if text is not None:
+                self._count('cache_hits')
+                return text
+
+        with span("pdf.parse", bytes=len(data)) as stage:
+            reader = PdfReader(BytesIO(data))
+            page_count = len(reader.pages)
+            if max_pages is not None:
+                page_count = min(page_count, max_pages)
+            if page_count < self.min_parallel_pages or self.workers == 1:
+                parts = self._extract_serial(reader, page_count, max_chars)
+                pages = len(parts)
+            else:
+                ranges = [range(start, min(start + self.pages_per_task, page_count))
+                          for start in range(0, page_count, self.pages_per_task)]
+                parts = self._extract_parallel(data, digest, ranges, max_chars)
+                pages = sum(len(r) for r in ranges[:len(parts)])
+            stage.set(pages=pages)
+        text = sanitize("".join(parts))
+        if max_chars is not None:
+            text = text[:max_chars]
+        self._count('extractions')
+        self._count('pages', pages)
+
+        if self.cache_dir is not None:
+            self._write_cache(self._cache_path(digest, max_pages, max_chars), text)
+        return text
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of cache hits, extractions and pages extracted."""
+        with self._lock:
+            return dict(self.counters)
+
+
+_extractor: Optional[PdfTextExtractor] = None
+_extractor_lock = threading.Lock()
+
+
+def get_extractor() -> PdfTextExtractor:
+    """The process-wide extractor used by the PDF tools, created on first use."""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = PdfTextExtractor()
+    return _extractor
+
+
+def set_extractor(extractor: PdfTextExtractor) -> None:
+    """Replace the process-wide extractor, e.g. with a different pool size or cache."""
+    global _extractor
+    _extractor = extractor
@@ -0,0 +1,196 @@
+import json
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional
+from pathlib import Path
+from segments import drop_segments, segment_dirs, write_segment
+
+ATTRIBUTE_DIR = "attributes"
+ATTRIBUTE_FIELDS = ("year", "month", "technique_type", "authors")
+
+
+def normalize_value(value: Any) -> str:
+    """Normalize an attribute value so lookups ignore case and spacing.
+
+    Args:
+        value (Any): Metadata or filter value
+
+    Returns:
+        str: Normalized value
+    """
+    return " ".join(str(value).lower().split())
+
+
+def _as_number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class AttributeIndex:
+    def __init__(self, fields: Dict[str, Dict[str, np.ndarray]]):
+        """Sorted document-id lists for each value of the filterable metadata fields.
+
+        Args:
+            fields (Dict[str, Dict[str, np.ndarray]]): Field to normalized value to sorted row ids
+        """
+        self.fields = fields
+        # Users repeat the same filters constantly, so recent selections are kept
+        self._selections: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.max_cached_selections = 256
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, metadata: Iterable[Dict[str, Any]], fields: Iterable[str] = ATTRIBUTE_FIELDS,
+              first_row: int = 0) -> "AttributeIndex":
+        """Index the metadata of every document, whose positions become their ids.
+
+        List-valued fields such as authors index each element separately.
+
+        Args:
+            metadata (Iterable[Dict[str, Any]]): Metadata, one dict per document
+            fields (Iterable[str]): Metadata fields to index
+            first_row (int): Id of the first document
+
+        Returns:
+            AttributeIndex: The built index
+        """
+        fields = list(fields)
+        postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in fields}
+        for row, meta in enumerate(metadata, first_row):
+            for field in fields:
+                values = meta.get(field)
+                if values is None or values == "":
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for value in {normalize_value(value) for value in values}:
+                    postings[field].setdefault(value, []).append(row)
+        return cls({
+            field: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+            for field, values in postings.items()
+        })
+
+    def save(self, save_dir: str) -> None:
+        """Save the index next to the FAISS index.
+
+        Args:
+            save_dir (str): Directory to save the index in
+        """
+        save_dir = Path(save_dir)
+        save_dir.mkdir(parents=True, exist_ok=True)
+        drop_segments(save_dir)
+        header = {}
+        for field, values in self.fields.items():
+            names = sorted(values)
+            lengths = [len(values[name]) for name in names]
+            offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64)
+            rows = np.concatenate([values[name] for name in names]) if names else np.zeros(0, dtype=np.int64)
+            np.save(save_dir / f"{field}.offsets.npy", offsets)
+            np.save(save_dir / f"{field}.rows.npy", rows)
+            header[field] = names
+        with open(save_dir / "values.json", 'w') as f:
+            json.dump(header, f)
+
+    @classmethod
+    def save_segment(cls, save_dir: str, metadata: Iterable[Dict[str, Any]], first_row: int) -> None:
+        """Index the metadata of documents appended to a saved index as a new segment.
+
+        Args:
+            save_dir (str): Directory the index was saved in
+            metadata (Iterable[Dict[str, Any]]): Metadata of the appended documents
+            first_row (int): Id of the first of them
+        """
+        write_segment(save_dir, first_row, cls.build(metadata, first_row=first_row).save)
+
+    @classmethod
+    def load(cls, save_dir: str) -> "AttributeIndex":
+        """Load a saved index, merging in the segments of appended documents.
+
+        Args:
+            save_dir (str): Directory the index was saved in
+
+        Returns:
+            AttributeIndex: The loaded index
+        """
+        save_dir = Path(save_dir)
+        with open(save_dir / "values.json", 'r') as f:
+            header = json.load(f)
+        fields = {}
+        for field, names in header.items():
+            offsets = np.load(save_dir / f"{field}.offsets.npy")
+            rows = np.load(save_dir / f"{field}.rows.npy")
+            fields[field] = {name: rows[offsets[i]:offsets[i + 1]] for i, name in enumerate(names)}
+        # Segments hold later rows, so appending their ids keeps every list sorted
+        for _, path in segment_dirs(save_dir):
+            for field, values in cls.load(path).fields.items():
+                merged = fields.setdefault(field, {})
+                for name, rows in values.items():
+                    merged[name] = np.concatenate([merged[name], rows]) if name in merged else rows
+        return cls(fields)
+
+    def _matching_values(self, field: str, condition: Any) -> List[str]:
+        values = self.fields[field]
+        if isinstance(condition, dict):
+            # Range over numeric values, e.g. {"gte": 2023, "lt": 2025}
+            checks = {
+                'gt': lambda v, bound: v > bound, 'gte': lambda v, bound: v >= bound,
+                'lt': lambda v, bound: v < bound, 'lte': lambda v, bound: v <= bound,
+            }
+            unknown = set(condition) - set(checks)
+            if unknown:
+                raise ValueError(f"Unknown range operators {sorted(unknown)} for {field!r}")
+            matching = []
+            for value in values:
+                number = _as_number(value)
+                if number is not None and all(checks[op](number, float(bound)) for op, bound in condition.items()):
+                    matching.append(value)
+            return matching
+        if isinstance(condition, (list, tuple, set)):
+            return [normalize_value(value) for value in condition]
+        return [normalize_value(condition)]
+
+    def select(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Find the documents matching every filter.
+
+        Each filter is a single value, a list of values of which any may match,
+        or a numeric range such as ``{"gte": 2023}``. Filters on different
+        fields must all match.
+
+        Args:
+            filters (Dict[str, Any]): Field to condition
+
+        Returns:
+            np.ndarray: Sorted ids of the matching documents
+
+        Raises:
+            ValueError: If a field has no attribute index
+        """
+        key = json.dumps(filters, sort_keys=True, default=str)
+        with self._lock:
+            selected = self._selections.get(key)
+            if selected is not None:
+                self._selections.move_to_end(key)
+                return selected
+
+        selected = None
+        for field, condition in filters.items():
+            if field not in self.fields:
+                raise ValueError(f"No attribute index for {field!r}, indexed fields are {sorted(self.fields)}")
+            empty = np.zeros(0, dtype=np.int64)
+            parts = [self.fields[field].get(value, empty) for value in self._matching_values(field, condition)]
+            if len(parts) == 1:
+                rows = parts[0]
+            else:
+                rows = np.unique(np.concatenate(parts)) if parts else empty
+            selected = rows if selected is None else np.intersect1d(selected, rows, assume_unique=True)
+        if selected is None:
+            selected = np.zeros(0, dtype=np.int64)
+
+        with self._lock:
+            self._selections[key] = selected
+            if len(self._selections) > self.max_cached_selections:
+                self._selections.popitem(last=False)
+        return selected
@@ -0,0 +1,416 @@
+"""Offline benchmark of index builds and searches over synthetic corpora.
+
+Generates corpora in the research_papers.json schema, indexes them with
+``DocumentIndexer`` and serves queries from ``VectorSearchAgent``. For every
+corpus size and index type it records embedding and build time, size on disk,
+load time, peak RSS of the build and of the serving process, single-query and
+batched QPS, and p50/p99 latency. Each build and each serving run happens in
+a fresh process, so the peak RSS figures do not bleed into each other.
+
+``--stub-model`` swaps the sentence-transformer for ``StubEmbeddingModel``, a
+deterministic hashing embedder, so the benchmark runs offline and measures
+the index rather than the model. The results are written as JSON; pass an
+earlier result file as ``--baseline`` to print the relative change of each
+metric. Comparing a ``--shards 4`` run against a ``--shards 1`` baseline shows
+how search throughput scales with the cores the shards are searched on.
+
+Example:
+    python benchmark.py --sizes 1000,10000,100000 --index-types flat,ivf_flat,hnsw \
+        --stub-model --out bench.json --baseline bench_prev.json
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MODEL = "intfloat/multilingual-e5-large-instruct"
+
+TECHNIQUE_TYPES = [
+    "Prompt Engineering Technique", "Fine-tuning Method", "Retrieval Augmentation",
+    "Reasoning Strategy", "Evaluation Method", "Agent Framework",
+]
+TECHNIQUES = [
+    "chain-of-thought", "self-consistency", "tree-of-thought", "few-shot prompting", "zero-shot prompting",
+    "in-context learning", "instruction tuning", "prompt compression", "retrieval augmentation",
+    "self-refinement", "tool use", "program-aided reasoning", "least-to-most prompting", "role prompting",
+    "contrastive decoding", "prompt ensembling", "soft prompt tuning", "reflection", "planning", "debate",
+]
+TASKS = [
+    "mathematical reasoning", "code generation", "question answering", "summarization", "translation",
+    "commonsense reasoning", "information extraction", "dialogue", "classification", "table understanding",
+    "multi-hop reasoning", "fact verification", "semantic parsing", "data-to-text generation",
+]
+DOMAINS = [
+    "large language models", "small language models", "multilingual models", "vision-language models",
+    "clinical text", "legal documents", "scientific literature", "software engineering", "education",
+    "finance", "low-resource languages", "long documents",
+]
+ADJECTIVES = [
+    "Efficient", "Robust", "Scalable", "Adaptive", "Faithful", "Interpretable", "Automatic", "Structured",
+    "Iterative", "Compositional", "Calibrated", "Dynamic",
+]
+NAMES = [
+    "Chen", "Wang", "Li", "Zhang", "Liu", "Smith", "Kumar", "Garcia", "Müller", "Kim", "Nguyen", "Rossi",
+    "Silva", "Cohen", "Tanaka", "Ivanova", "Okafor", "Dubois", "Novak", "Haddad",
+]
+INITIALS = "ABCDEFGHJKLMNPRSTWY"
+
+
+def generate_corpus(size: int, seed: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """Generate a synthetic corpus in the research_papers.json schema.
+
+    Args:
+        size (int): Number of papers
+        seed (int): Random seed; the same seed gives the same corpus
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: {"top_papers": [...]}
+    """
+    rng = np.random.default_rng(seed)
+    picks = {
+        name: rng.integers(0, len(values), size)
+        for name, values in (("adjective", ADJECTIVES), ("technique", TECHNIQUES), ("task", TASKS),
+                             ("domain", DOMAINS), ("type", TECHNIQUE_TYPES), ("other", TECHNIQUES))
+    }
+    years = rng.integers(2019, 2026, size)
+    months = rng.integers(1, 13, size)
+    author_counts = rng.integers(1, 6, size)
+    papers = []
+    for i in range(size):
+        technique = TECHNIQUES[picks['technique'][i]]
+        task = TASKS[picks['task'][i]]
+        domain = DOMAINS[picks['domain'][i]]
+        authors = [
+            f"{INITIALS[(i + j) % len(INITIALS)]}. {NAMES[(i * 7 + j * 3) % len(NAMES)]}"
+            for j in range(author_counts[i])
+        ]
+        papers.append({
+            'id': f"synthetic-{seed}-{i}",
+            'title': f"{ADJECTIVES[picks['adjective'][i]]} {technique.title()} for {task.title()} in {domain.title()} ({i})",
+            'authors': authors,
+            'year': str(years[i]),
+            'month': str(months[i]),
+            'technique_type': TECHNIQUE_TYPES[picks['type'][i]],
+            'technique_description': f"Combines {technique} with {TECHNIQUES[picks['other'][i]]} to improve {task}.",
+            'summary': f"We study {technique} for {task} with {domain}, and report gains over strong baselines "
+                       f"on {task} benchmarks while reducing inference cost.",
+        })
+    return {'top_papers': papers}
+
+
+def generate_queries(count: int, seed: int = 1) -> List[str]:
+    """Generate search queries over the synthetic corpus vocabulary.
+
+    Args:
+        count (int): Number of queries
+        seed (int): Random seed
+
+    Returns:
+        List[str]: Queries
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        f"{TECHNIQUES[rng.integers(len(TECHNIQUES))]} for {TASKS[rng.integers(len(TASKS))]} "
+        f"in {DOMAINS[rng.integers(len(DOMAINS))]}"
+        for _ in range(count)
+    ]
+
+
+class StubEmbeddingModel:
+    def __init__(self, dim: int = 1024, buckets: int = 1 << 12, seed: int = 0):
+        """Deterministic stand-in for a sentence-transformer.
+
+        Tokens are hashed into buckets, each bucket has a fixed random
+        direction, and a text embeds to the normalized sum of its tokens'
+        directions, so texts sharing words land close together. It answers
+        ``encode`` like SentenceTransformer, without a model download.
+
+        Args:
+            dim (int): Embedding dimension; the default matches multilingual-e5-large
+            buckets (int): Hash buckets for tokens
+            seed (int): Seed of the bucket directions
+        """
+        self.dim = dim
+        self.buckets = buckets
+        self.directions = np.random.default_rng(seed).standard_normal((buckets, dim)).astype(np.float32)
+        self._token_buckets: Dict[str, int] = {}
+
+    def _bucket(self, token: str) -> int:
+        bucket = self._token_buckets.get(token)
+        if bucket is None:
+            bucket = self._token_buckets[token] = zlib.crc32(token.encode("utf-8")) % self.buckets
+        return bucket
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        # Embeddings are always unit length; SentenceTransformer options are accepted and ignored
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        embeddings = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            tokens = sentence.lower().split()
+            if tokens:
+                embeddings[row] = self.directions[[self._bucket(token) for token in tokens]].sum(axis=0)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _dir_size_mb(path: Path) -> Dict[str, float]:
+    sizes = {}
+    for item in path.iterdir():
+        files = [item] if item.is_file() else [f for f in item.rglob("*") if f.is_file()]
+        sizes[item.name] = sum(f.stat().st_size for f in files) / 2**20
+    return sizes
+
+
+def _build(corpus_path: str, index_dir: str, index_type: str, index_params: Dict[str, Any],
+           model_name: str, stub_dim: Optional[int], shards: int = 1, encode_workers: int = 1) -> Dict[str, Any]:
+    # Runs in a fresh process
+    from document_indexer import DocumentIndexer
+
+    indexer = DocumentIndexer(model_name, index_type=index_type, index_params=index_params,
+                              show_progress_bar=False, shards=shards, encode_workers=encode_workers)
+    if stub_dim:
+        indexer.model = StubEmbeddingModel(stub_dim)
+        if indexer.encoding_engine is not None:
+            indexer.encoding_engine.model_factory = functools.partial(StubEmbeddingModel, stub_dim)
+    start = time.perf_counter()
+    indexer.load_documents(corpus_path)
+    read_s = time.perf_counter() - start
+    start = time.perf_counter()
+    embeddings = indexer.generate_embeddings()
+    embed_s = time.perf_counter() - start
+    start = time.perf_counter()
+    indexer.create_index(embeddings)
+    index_s = time.perf_counter() - start
+    start = time.perf_counter()
+    indexer.save_index(index_dir)
+    save_s = time.perf_counter() - start
+    return {
+        'read_s': read_s, 'embed_s': embed_s, 'embed_docs_per_sec': len(embeddings) / embed_s, 'index_s': index_s, 'save_s': save_s,
+        'build_s': index_s + save_s, 'build_peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _serve(index_dir: str, queries: List[str], top_k: int, batch_size: int,
+           model_name: str, stub_dim: Optional[int], search_params: Dict[str, Any]) -> Dict[str, Any]:
+    # Runs in a fresh process
+    from vector_search_agent import VectorSearchAgent
+
+    agent = VectorSearchAgent(model_name)
+    if stub_dim:
+        agent.model = StubEmbeddingModel(stub_dim)
+    start = time.perf_counter()
+    agent.load_index(index_dir, **search_params)
+    load_s = time.perf_counter() - start
+    rss_after_load = _peak_rss_mb()
+
+    # One throwaway query keeps first-call costs out of the latencies
+    agent.search(queries[0], top_k, mode="vector")
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        agent.search(query, top_k, mode="vector")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in agent.search_many(queries, top_k, batch_size=batch_size, mode="vector"):
+        pass
+    batch_s = time.perf_counter() - start
+
+    return {
+        'load_s': load_s,
+        'load_peak_rss_mb': rss_after_load,
+        'serve_peak_rss_mb': _peak_rss_mb(),
+        'single_qps': len(queries) / sum(latencies),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'batch_qps': len(queries) / batch_s,
+        'batch_size': batch_size,
+    }
+
+
+def _in_fresh_process(fn, *args) -> Dict[str, Any]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def run_benchmark(sizes: List[int], index_types: List[str], num_queries: int = 1000, top_k: int = 10,
+                  batch_size: int = 256, model_name: str = DEFAULT_MODEL, stub_dim: Optional[int] = 1024,
+                  index_params: Optional[Dict[str, Any]] = None, search_params: Optional[Dict[str, Any]] = None,
+                  work_dir: Optional[str] = None, seed: int = 0, shards: int = 1,
+                  encode_workers: int = 1) -> List[Dict[str, Any]]:
+    """Build and query every index type at every corpus size.
+
+    Args:
+        sizes (List[int]): Corpus sizes in papers
+        index_types (List[str]): Index types passed to ``DocumentIndexer``
+        num_queries (int): Queries per serving run
+        top_k (int): Results per query
+        batch_size (int): Queries per batch for the batched QPS
+        model_name (str): Sentence-transformer, used when ``stub_dim`` is None
+        stub_dim (Optional[int]): Dimension of the stub embedding model, or None for the real model
+        index_params (Optional[Dict[str, Any]]): Build parameters for ``build_index``
+        search_params (Optional[Dict[str, Any]]): nprobe/ef_search for ``load_index``
+        work_dir (Optional[str]): Directory for corpora and indexes, a temporary one by default
+        seed (int): Corpus seed
+        shards (int): Shards every index is split into
+        encode_workers (int): Processes embedding the corpus
+
+    Returns:
+        List[Dict[str, Any]]: One row of measurements per corpus size and index type
+    """
+    work = Path(work_dir or tempfile.mkdtemp(prefix="rag-bench-"))
+    work.mkdir(parents=True, exist_ok=True)
+    queries = generate_queries(num_queries, seed + 1)
+    rows = []
+    try:
+        for size in sizes:
+            corpus_path = work / f"corpus_{size}.json"
+            with open(corpus_path, 'w') as f:
+                json.dump(generate_corpus(size, seed), f)
+            for index_type in index_types:
+                index_dir = work / f"index_{size}_{index_type}"
+                shutil.rmtree(index_dir, ignore_errors=True)
+                row = {'corpus_size': size, 'index_type': index_type, 'shards': shards}
+                row.update(_in_fresh_process(
+                    _build, str(corpus_path), str(index_dir), index_type, index_params or {}, model_name, stub_dim,
+                    shards, encode_workers
+                ))
+                sizes_mb = _dir_size_mb(index_dir)
+                row['disk_mb'] = sum(sizes_mb.values())
+                row['disk_breakdown_mb'] = sizes_mb
+                row.update(_in_fresh_process(
+                    _serve, str(index_dir), queries, top_k, batch_size, model_name, stub_dim, search_params or {}
+                ))
+                rows.append(row)
+                print(f"{size:>9} {index_type:<9} build {row['build_s']:.2f}s  disk {row['disk_mb']:.1f}MB  "
+                      f"load {row['load_s']:.3f}s  qps {row['single_qps']:.0f}/{row['batch_qps']:.0f}  "
+                      f"p50 {row['p50_ms']:.2f}ms  p99 {row['p99_ms']:.2f}ms", file=sys.stderr)
+    finally:
+        if work_dir is None:
+            shutil.rmtree(work, ignore_errors=True)
+    return rows
+
+
+# Metrics where a larger value is an improvement; for all others smaller is better
+HIGHER_IS_BETTER = {'embed_docs_per_sec', 'single_qps', 'batch_qps'}
+COMPARED_METRICS = ['embed_docs_per_sec', 'build_s', 'disk_mb', 'load_s', 'build_peak_rss_mb', 'serve_peak_rss_mb',
+                    'single_qps', 'batch_qps', 'p50_ms', 'p99_ms']
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.1) -> List[Dict[str, Any]]:
+    """Relative change of each metric against a baseline run.
+
+    Args:
+        baseline (Dict[str, Any]): Earlier output of this benchmark
+        current (Dict[str, Any]): New output of this benchmark
+        tolerance (float): Relative worsening flagged as a regression
+
+    Returns:
+        List[Dict[str, Any]]: One row per metric of each configuration present in both runs
+    """
+    before = {(row['corpus_size'], row['index_type']): row for row in baseline['rows']}
+    changes = []
+    for row in current['rows']:
+        old = before.get((row['corpus_size'], row['index_type']))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if not old.get(metric):
+                continue
+            change = row[metric] / old[metric] - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            changes.append({
+                'corpus_size': row['corpus_size'], 'index_type': row['index_type'], 'metric': metric,
+                'baseline': old[metric], 'current': row[metric], 'change': change,
+                'regression': worse > tolerance,
+            })
+    return changes
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Corpus sizes, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--index-types", default="flat,ivf_flat,hnsw")
+    parser.add_argument("--num-queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--stub-model", action="store_true", help="Embed with the deterministic stub model")
+    parser.add_argument("--stub-dim", type=int, default=1024)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--ef-search", type=int)
+    parser.add_argument("--shards", type=int, default=1, help="Split every index into this many shards")
+    parser.add_argument("--encode-workers", type=int, default=1, help="Processes embedding the corpus")
+    parser.add_argument("--work-dir", help="Keep corpora and indexes here instead of a temporary directory")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    search_params = {name: value for name, value in (("nprobe", args.nprobe), ("ef_search", args.ef_search))
+                     if value is not None}
+    rows = run_benchmark(
+        [int(size) for size in args.sizes.split(",")], args.index_types.split(","), args.num_queries,
+        args.top_k, args.batch_size, args.model, args.stub_dim if args.stub_model else None,
+        search_params=search_params, work_dir=args.work_dir, shards=args.shards,
+        encode_workers=args.encode_workers,
+    )
+    from lazy_imports import faiss
+    result = {
+        'commit': _git_commit(),
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'faiss': faiss.__version__,
+        'model': f"stub-{args.stub_dim}" if args.stub_model else args.model,
+        'num_queries': args.num_queries,
+        'top_k': args.top_k,
+        'search_params': search_params,
+        'shards': args.shards,
+        'encode_workers': args.encode_workers,
+        'cpu_count': os.cpu_count(),
+        'rows': rows,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            changes = compare(json.load(f), result, args.tolerance)
+        for change in changes:
+            flag = "  REGRESSION" if change['regression'] else ""
+            print(f"{change['corpus_size']:>9} {change['index_type']:<9} {change['metric']:<18} "
+                  f"{change['baseline']:>12.3f} -> {change['current']:>12.3f} ({change['change']:+.1%}){flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Streaming full-text ingestion: PDF text -> overlapping chunks -> embeddings -> index.
+
+Every stage is a generator, so only one batch of chunks is held in memory at
+a time no matter how many papers are ingested. Chunks are cut on model tokens
+with an overlap, embedded in batches and appended to the FAISS index and the
+document store as each batch completes. Every chunk row carries the metadata
+of its paper plus ``parent_id`` and ``chunk``, which ``VectorSearchAgent``
+uses to collapse chunk hits back to their paper.
+
+Example:
+    python chunked_ingest.py --sources pdf_urls.txt --index-dir ../data/chunk_index
+
+``--sources`` holds one PDF URL per line, or one JSON paper entry with a
+``pdf_url`` field per line.
+"""
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Callable, Union
+from lazy_imports import faiss
+from document_indexer import DocumentIndexer, MANIFEST_FILE
+from index_factory import build_index, read_index, write_index
+from document_store import STORE_DIR, DocumentStoreWriter, DocumentStore
+from lexical_index import LEXICAL_DIR, LexicalIndex
+from attribute_index import ATTRIBUTE_DIR, AttributeIndex
+
+WORD_RE = re.compile(r"\S+")
+
+
+def load_pdf_text_extractor() -> Callable[[str], str]:
+    """Import the PDF text extractor of the paper finder agent.
+
+    Returns:
+        Callable[[str], str]: Function from PDF URL to its text
+    """
+    repo_root = str(Path(__file__).resolve().parent.parent)
+    if repo_root not in sys.path:
+        sys.path.append(repo_root)
+    from agent_pdf_extractor_vibe import extract_pdf_text_fn
+    return extract_pdf_text_fn
+
+
+def chunk_text(text: str, tokenizer: Any = None, chunk_tokens: int = 256, overlap: int = 32) -> Iterator[str]:
+    """Split text into overlapping chunks of at most ``chunk_tokens`` tokens.
+
+    Chunks are cut on the embedding model's token boundaries and sliced from
+    the original text, so no chunk is truncated by the model.
+
+    Args:
+        text (str): Full paper text
+        tokenizer (Any): Hugging Face tokenizer of the embedding model, or None
+            to count whitespace-separated words instead
+        chunk_tokens (int): Maximum tokens per chunk
+        overlap (int): Tokens shared by consecutive chunks
+
+    Yields:
+        str: Chunk text
+    """
+    if overlap >= chunk_tokens:
+        raise ValueError(f"overlap ({overlap}) must be smaller than chunk_tokens ({chunk_tokens})")
+    if tokenizer is not None:
+        spans = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)['offset_mapping']
+    else:
+        spans = [match.span() for match in WORD_RE.finditer(text)]
+    step = chunk_tokens - overlap
+    for start in range(0, max(len(spans) - overlap, 1), step):
+        window = spans[start:start + chunk_tokens]
+        if not window:
+            break
+        yield text[window[0][0]:window[-1][1]]
+
+
+def iter_paper_texts(sources: Iterable[Union[str, Dict[str, Any]]],
+                     extract_text: Callable[[str], str]) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """Extract the text of each paper, skipping PDFs that fail to download or parse.
+
+    Args:
+        sources (Iterable[Union[str, Dict[str, Any]]]): PDF URLs or paper entries with a ``pdf_url``
+        extract_text (Callable[[str], str]): Function from PDF URL to its text
+
+    Yields:
+        Tuple[Dict[str, Any], str]: (paper metadata, full text)
+    """
+    for source in sources:
+        paper = {'pdf_url': source} if isinstance(source, str) else dict(source)
+        try:
+            text = extract_text(paper['pdf_url'])
+        except Exception as exc:
+            print(f"⚠️ Skipping {paper['pdf_url']}: {exc}")
+            continue
+        yield paper, text
+
+
+def iter_chunks(papers: Iterable[Tuple[Dict[str, Any], str]], tokenizer: Any = None,
+                chunk_tokens: int = 256, overlap: int = 32) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """Split each paper into chunks that carry the paper's metadata.
+
+    Args:
+        papers (Iterable[Tuple[Dict[str, Any], str]]): (paper metadata, full text)
+        tokenizer (Any): Tokenizer for ``chunk_text``
+        chunk_tokens (int): Maximum tokens per chunk
+        overlap (int): Tokens shared by consecutive chunks
+
+    Yields:
+        Tuple[Dict[str, Any], str]: (chunk metadata, chunk text)
+    """
+    for paper, text in papers:
+        for number, chunk in enumerate(chunk_text(text, tokenizer, chunk_tokens, overlap)):
+            yield {**paper, 'parent_id': paper['pdf_url'], 'chunk': number}, chunk
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most ``batch_size`` items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ChunkIngestor:
+    def __init__(self, index_dir: str, model_name: str = "intfloat/multilingual-e5-large-instruct",
+                 chunk_tokens: int = 256, overlap: int = 32, batch_size: int = 64,
+                 cache_dir: Optional[str] = None, index_type: str = "flat",
+                 extract_text: Optional[Callable[[str], str]] = None, storage: str = "float32"):
+        """Stream full paper texts into a chunk-level index.
+
+        Args:
+            index_dir (str): Directory of the chunk index, appended to when it exists
+            model_name (str): Name of the sentence-transformer model to use
+            chunk_tokens (int): Maximum model tokens per chunk
+            overlap (int): Tokens shared by consecutive chunks
+            batch_size (int): Chunks embedded and added to the index per batch
+            cache_dir (Optional[str]): Directory of the on-disk embedding cache, disabled if None
+            index_type (str): FAISS index type for a new index; IVF types are
+                trained on the first batch only, so "flat" or "hnsw" suit streaming best
+            extract_text (Optional[Callable[[str], str]]): Function from PDF URL to
+                text, defaults to ``extract_pdf_text_fn`` of the paper finder agent
+            storage (str): Vector storage of a new index, see ``DocumentIndexer``; int8
+                and binary are trained on the first batch only
+        """
+        self.index_dir = Path(index_dir)
+        self.indexer = DocumentIndexer(model_name, cache_dir=cache_dir, index_type=index_type,
+                                       show_progress_bar=False, storage=storage)
+        self.chunk_tokens = chunk_tokens
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.extract_text = extract_text
+
+    def _open(self) -> Tuple[Optional["faiss.Index"], Dict[str, Any], DocumentStoreWriter]:
+        manifest = {'model_name': self.indexer.model_name, 'chunked': True, 'papers': {}, 'tombstones': []}
+        if not (self.index_dir / MANIFEST_FILE).exists():
+            return None, manifest, DocumentStoreWriter(self.index_dir / STORE_DIR)
+        with open(self.index_dir / MANIFEST_FILE, 'r') as f:
+            manifest = json.load(f)
+        if not manifest.get('chunked') or manifest.get('model_name') != self.indexer.model_name:
+            raise ValueError(
+                f"Index in {self.index_dir} is not a chunk index built with "
+                f"{self.indexer.model_name!r}; ingest into a new directory"
+            )
+        index = read_index(str(self.index_dir / "papers.index"))
+        # New rows are appended to the store in place
+        writer = DocumentStoreWriter(self.index_dir / STORE_DIR, append=True)
+        # A run killed while saving can leave the store or the index with rows the
+        # saved manifest does not know about: cut the store back to the index and
+        # tombstone whatever no paper owns
+        if writer.count > index.ntotal:
+            writer.truncate(index.ntotal)
+        owned = max((entry['rows'][1] for entry in manifest['papers'].values()), default=0)
+        manifest['tombstones'] = sorted(set(manifest['tombstones']) | set(range(owned, index.ntotal)))
+        return index, manifest, writer
+
+    def ingest(self, sources: Iterable[Union[str, Dict[str, Any]]],
+               build_side_indexes: bool = True) -> Iterator[Dict[str, int]]:
+        """Ingest papers, yielding progress after every batch added to the index.
+
+        Papers already in the index are skipped. The index, document store
+        and manifest are saved when the generator finishes or is closed, so an
+        interrupted run keeps every completed batch and can be resumed. The
+        paper being ingested when a run is interrupted may be incomplete, so
+        its rows are tombstoned and it is ingested again on the next run.
+
+        Args:
+            sources (Iterable[Union[str, Dict[str, Any]]]): PDF URLs or paper entries with a ``pdf_url``
+            build_side_indexes (bool): Also build the BM25 and attribute indexes at the end
+
+        Yields:
+            Dict[str, int]: Running counts of papers, chunks and index rows
+        """
+        index, manifest, writer = self._open()
+        extract_text = self.extract_text or load_pdf_text_extractor()
+        papers = manifest['papers']
+        sources = (
+            source for source in sources
+            if (source if isinstance(source, str) else source['pdf_url']) not in papers
+        )
+        tokenizer = getattr(self.indexer.model, 'tokenizer', None)
+        chunks = iter_chunks(iter_paper_texts(sources, extract_text), tokenizer, self.chunk_tokens, self.overlap)
+        stats = {'papers': 0, 'chunks': 0, 'rows': writer.count}
+
+        last_parent = None
+        completed = False
+        try:
+            for batch in batched(chunks, self.batch_size):
+                embeddings = self.indexer.generate_embeddings([text for _, text in batch])
+                if index is None:
+                    index = build_index(embeddings, self.indexer.index_type, storage=self.indexer.storage,
+                                        **self.indexer.index_params)
+                # Store rows go first: unlike index rows, they can be taken back if the batch fails
+                first_row = writer.count
+                try:
+                    rows = [writer.append(text, metadata) for metadata, text in batch]
+                    index.add(embeddings)
+                except BaseException:
+                    writer.truncate(first_row)
+                    raise
+                for (metadata, _), row in zip(batch, rows):
+                    entry = papers.get(metadata['parent_id'])
+                    if entry is None:
+                        papers[metadata['parent_id']] = {'rows': [row, row + 1]}
+                        stats['papers'] += 1
+                    else:
+                        entry['rows'][1] = row + 1
+                    last_parent = metadata['parent_id']
+                stats['chunks'] += len(batch)
+                stats['rows'] = writer.count
+                yield dict(stats)
+            completed = True
+        finally:
+            if not completed and last_parent is not None:
+                start, end = papers.pop(last_parent)['rows']
+                manifest['tombstones'] = sorted(set(manifest['tombstones']) | set(range(start, end)))
+            self._save(index, manifest, writer, build_side_indexes)
+
+    def _save(self, index: Optional["faiss.Index"], manifest: Dict[str, Any],
+              writer: DocumentStoreWriter, build_side_indexes: bool) -> None:
+        if index is None:
+            writer.abort()
+            return
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        # Store before index, so a run killed in between leaves extra store rows, which can be cut back
+        writer.close()
+        write_index(index, str(self.index_dir / "papers.index"))
+        if build_side_indexes:
+            store = DocumentStore(self.index_dir / STORE_DIR)
+            tombstones = set(manifest['tombstones'])
+            documents = ("" if row in tombstones else document for row, document in enumerate(store.documents))
+            LexicalIndex.build(documents).save(self.index_dir / LEXICAL_DIR)
+            AttributeIndex.build(store.metadata).save(self.index_dir / ATTRIBUTE_DIR)
+        # Manifest last, as for paper-level indexes
+        with open(self.index_dir / MANIFEST_FILE, 'w') as f:
+            json.dump(manifest, f)
+
+    def run(self, sources: Iterable[Union[str, Dict[str, Any]]], build_side_indexes: bool = True) -> Dict[str, int]:
+        """Ingest papers to completion, printing progress.
+
+        Args:
+            sources (Iterable[Union[str, Dict[str, Any]]]): PDF URLs or paper entries with a ``pdf_url``
+            build_side_indexes (bool): Also build the BM25 and attribute indexes at the end
+
+        Returns:
+            Dict[str, int]: Final counts of papers, chunks and index rows
+        """
+        # ingest() yields nothing when every source is already indexed, so start from the existing rows
+        rows = len(DocumentStore(self.index_dir / STORE_DIR)) if (self.index_dir / MANIFEST_FILE).exists() else 0
+        stats = {'papers': 0, 'chunks': 0, 'rows': rows}
+        for stats in self.ingest(sources, build_side_indexes):
+            print(f"📥 {stats['papers']} papers, {stats['chunks']} chunks ingested ({stats['rows']} rows)")
+        return stats
+
+
+def read_sources(path: str) -> Iterator[Union[str, Dict[str, Any]]]:
+    """Read PDF URLs or JSON paper entries, one per line, lazily."""
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line) if line.startswith("{") else line
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", required=True, help="File with one PDF URL or JSON paper entry per line")
+    parser.add_argument("--index-dir", default="../data/chunk_index")
+    parser.add_argument("--cache-dir", default="../data/embedding_cache")
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--storage", default="float32", help="float32, float16, int8 or binary")
+    args = parser.parse_args()
+
+    ingestor = ChunkIngestor(args.index_dir, chunk_tokens=args.chunk_tokens, overlap=args.overlap,
+                             batch_size=args.batch_size, cache_dir=args.cache_dir, index_type=args.index_type,
+                             storage=args.storage)
+    stats = ingestor.run(read_sources(args.sources))
+    print(f"✅ Chunk index in {args.index_dir}: {stats['rows']} rows")
+
+
+if __name__ == "__main__":
+    main()
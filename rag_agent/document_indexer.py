@@ -1,26 +1,134 @@
 import json
+import hashlib
 import numpy as np
-from typing import List, Dict, Any
-import sentence_transformers
-import faiss
+from typing import List, Dict, Any, Optional, Iterator, Sequence, Tuple
 import os
 from pathlib import Path
+from lazy_imports import LazySentenceTransformer
+from embedding_cache import EmbeddingCache
+from encoding_engine import EncodingEngine
+from index_factory import ShardedIndex, build_index, build_sharded_index, detect_index_type, detect_storage, reconstruct_all, read_index, write_index
+from document_store import HEADER_FILE, STORE_DIR, DocumentStoreWriter, write_document_store, load_documents_and_metadata
+from lexical_index import LEXICAL_DIR, LexicalIndex
+from attribute_index import ATTRIBUTE_DIR, AttributeIndex
+from segments import drop_segments, segment_dirs
+from tracing import span
+
+MANIFEST_FILE = "manifest.json"
+# Incremental updates append a segment to the BM25 and attribute indexes; past
+# this many, the next update rebuilds them so searches don't visit ever more
+MAX_SEGMENTS = 16
+
+
+def render_paper(paper: Dict[str, Any]) -> str:
+    """Create the text representation of a paper that gets embedded.
+
+    Args:
+        paper (Dict[str, Any]): Paper entry from research_papers.json
+
+    Returns:
+        str: Rendered paper text
+    """
+    text = f"Title: {paper['title']}\n"
+    text += f"Authors: {', '.join(paper['authors'])}\n"
+    text += f"Year: {paper['year']}, Month: {paper['month']}\n"
+    text += f"Technique: {paper['technique_type']}\n"
+    if paper['technique_description']:
+        text += f"Technique Description: {paper['technique_description']}\n"
+    text += f"Summary: {paper['summary']}"
+    return text
+
+
+def content_hash(text: str) -> str:
+    """Hash rendered paper text so changed papers can be detected.
+
+    Args:
+        text (str): Rendered paper text
+
+    Returns:
+        str: Hex SHA-256 digest of the text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def keyed_papers(papers: List[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield a stable identity for each paper alongside the paper itself.
+
+    Papers are identified by an explicit id or URL when the corpus has one and
+    by their normalized title otherwise. Repeated keys get an occurrence suffix
+    so every paper in the corpus maps to exactly one index row.
+
+    Args:
+        papers (List[Dict[str, Any]]): Paper entries from research_papers.json
+
+    Yields:
+        Tuple[str, Dict[str, Any]]: (paper key, paper)
+    """
+    seen: Dict[str, int] = {}
+    for paper in papers:
+        key = None
+        for field in ("id", "arxiv_id", "url", "pdf_url"):
+            if paper.get(field):
+                key = f"{field}:{paper[field]}"
+                break
+        if key is None:
+            key = "title:" + " ".join(str(paper['title']).lower().split())
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        yield (key if count == 0 else f"{key}#{count}"), paper
+
 
 class DocumentIndexer:
-    def __init__(self, model_name: str = "intfloat/multilingual-e5-large-instruct"):
+    def __init__(self, model_name: str = "intfloat/multilingual-e5-large-instruct", compact_ratio: float = 0.25,
+                 cache_dir: Optional[str] = None, cache_size: int = 100_000,
+                 index_type: str = "flat", index_params: Optional[Dict[str, Any]] = None,
+                 show_progress_bar: bool = True, storage: str = "float32", shards: int = 1,
+                 encode_workers: int = 1, encode_batch_size: int = 32):
         """Initialize the document indexer with a specific embedding model.
-        
+
         Args:
             model_name (str): Name of the sentence-transformer model to use
+            compact_ratio (float): Fraction of tombstoned rows above which an
+                incremental update compacts the index
+            cache_dir (Optional[str]): Directory of the on-disk embedding cache, disabled if None
+            cache_size (int): Maximum number of embeddings kept in the cache
+            index_type (str): FAISS index type, one of "flat", "ivf_flat", "ivf_pq" or "hnsw"
+            index_params (Optional[Dict[str, Any]]): Build parameters passed to
+                ``index_factory.build_index`` (nlist, pq_m, hnsw_m, train_size, ...)
+            show_progress_bar (bool): Show a progress bar while encoding
+            storage (str): Vector storage, one of "float32", "float16", "int8" (scalar
+                quantization) or "binary" (sign bits re-ranked with float16 vectors)
+            shards (int): Number of shards of consecutive rows the index is split
+                into, each saved to its own file and searched in parallel
+            encode_workers (int): Worker processes encoding length-bucketed batches
+                into a memmap (``encoding_engine.EncodingEngine``); 1 encodes in-process,
+                as do small incremental updates
+            encode_batch_size (int): Texts per batch with several encode workers
         """
-        self.model = sentence_transformers.SentenceTransformer(model_name)
+        self.model_name = model_name
+        # Loaded on first encode, so updates with nothing new never load the model
+        self.model = LazySentenceTransformer(model_name)
+        self.embedding_cache = EmbeddingCache(cache_dir, model_name, cache_size) if cache_dir else None
+        self.encoding_engine = None
+        if encode_workers > 1:
+            self.encoding_engine = EncodingEngine(model_name, encode_workers, encode_batch_size, report=show_progress_bar)
+        self.compact_ratio = compact_ratio
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.storage = storage
+        self.shards = shards
+        self.show_progress_bar = show_progress_bar
         self.documents = []
         self.metadata = []
         self.index = None
-        
+        self.manifest = self._empty_manifest()
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {'model_name': self.model_name, 'papers': {}, 'tombstones': []}
+
     def load_documents(self, json_path: str) -> None:
         """Load documents from a JSON file.
-        
+
         Args:
             json_path (str): Path to the JSON file containing the documents
         """
@@ -28,66 +136,244 @@ class DocumentIndexer:
             data = json.load(file)
             self.documents = []
             self.metadata = []
-            
-            for paper in data['top_papers']:
+            self.manifest = self._empty_manifest()
+
+            for key, paper in keyed_papers(data['top_papers']):
                 # Create a text representation of the paper
-                text = f"Title: {paper['title']}\n"
-                text += f"Authors: {', '.join(paper['authors'])}\n"
-                text += f"Year: {paper['year']}, Month: {paper['month']}\n"
-                text += f"Technique: {paper['technique_type']}\n"
-                if paper['technique_description']:
-                    text += f"Technique Description: {paper['technique_description']}\n"
-                text += f"Summary: {paper['summary']}"
-                
+                text = render_paper(paper)
+
+                self.manifest['papers'][key] = {'hash': content_hash(text), 'row': len(self.documents)}
                 self.documents.append(text)
                 self.metadata.append(paper)
-    
-    def generate_embeddings(self) -> np.ndarray:
-        """Generate embeddings for all loaded documents.
-        
+
+    def generate_embeddings(self, documents: Optional[List[str]] = None) -> np.ndarray:
+        """Generate embeddings for documents.
+
+        Args:
+            documents (Optional[List[str]]): Texts to embed, defaults to all loaded documents
+
         Returns:
             np.ndarray: Document embeddings
         """
-        embeddings = self.model.encode(self.documents, show_progress_bar=True)
-        return embeddings.astype(np.float32)
-    
+        if documents is None:
+            documents = self.documents
+        with span("embed.encode", texts=len(documents)):
+            if self.embedding_cache is not None:
+                embeddings = self.embedding_cache.encode(documents, self._encode)
+                # A build is one batch, so its embeddings are persisted right away
+                self.embedding_cache.flush()
+                return embeddings
+            embeddings = self._encode(documents)
+        # Embeddings from the encoding engine stay in their memmap
+        return embeddings.astype(np.float32, copy=False)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self.encoding_engine is not None:
+            return self.encoding_engine.encode(texts)
+        return self.model.encode(texts, show_progress_bar=self.show_progress_bar)
+
     def create_index(self, embeddings: np.ndarray) -> None:
-        """Create a FAISS index from document embeddings.
-        
+        """Create a FAISS index of the configured type from document embeddings.
+
+        IVF indexes are trained on a sample of the embeddings before they are added.
+        With several shards, each shard is built and trained on its own rows.
+
         Args:
             embeddings (np.ndarray): Document embeddings
         """
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
+        if self.shards > 1:
+            self.index = build_sharded_index(embeddings, self.shards, self.index_type, storage=self.storage, **self.index_params)
+            return
+        self.index = build_index(embeddings, self.index_type, storage=self.storage, **self.index_params)
         self.index.add(embeddings)
-    
+
     def save_index(self, save_dir: str) -> None:
-        """Save the FAISS index and metadata to disk.
-        
+        """Save the FAISS index, document store, search-side indexes and manifest to disk.
+
         Args:
             save_dir (str): Directory to save the index and metadata
         """
         save_dir = Path(save_dir)
         save_dir.mkdir(parents=True, exist_ok=True)
-        
+
         # Save FAISS index
-        faiss.write_index(self.index, str(save_dir / "papers.index"))
-        
-        # Save metadata
-        with open(save_dir / "metadata.json", 'w') as f:
-            json.dump({
-                'documents': self.documents,
-                'metadata': self.metadata
-            }, f, indent=2)
-    
-    def process_and_index_documents(self, json_path: str, save_dir: str) -> None:
+        write_index(self.index, str(save_dir / "papers.index"))
+
+        # Save documents and metadata
+        write_document_store(save_dir / STORE_DIR, self.documents, self.metadata)
+        self._save_side_indexes(save_dir, self.documents, self.metadata)
+
+        # Save manifest last so it only ever describes a complete index
+        self.manifest['rows'] = len(self.documents)
+        with open(save_dir / MANIFEST_FILE, 'w') as f:
+            json.dump(self.manifest, f)
+
+    def _save_side_indexes(self, save_dir: Path, documents: Sequence[str], metadata: Sequence[Dict[str, Any]]) -> None:
+        # Tombstoned rows are left out of the BM25 and attribute indexes
+        tombstones = set(self.manifest['tombstones'])
+        LexicalIndex.build(
+            "" if row in tombstones else document for row, document in enumerate(documents)
+        ).save(save_dir / LEXICAL_DIR)
+        AttributeIndex.build(
+            {} if row in tombstones else meta for row, meta in enumerate(metadata)
+        ).save(save_dir / ATTRIBUTE_DIR)
+
+    def _append_rows(self, save_dir: Path, first_row: int, documents: List[str], metadata: List[Dict[str, Any]]) -> None:
+        """Save an update by appending its rows to the saved index instead of rewriting it."""
+        with DocumentStoreWriter(save_dir / STORE_DIR, append=True) as writer:
+            # Rows past the manifest's count were written by an update that never finished
+            writer.truncate(first_row)
+            for document, meta in zip(documents, metadata):
+                writer.append(document, meta)
+        for side_dir in (save_dir / LEXICAL_DIR, save_dir / ATTRIBUTE_DIR):
+            drop_segments(side_dir, first_row)
+        if len(segment_dirs(save_dir / LEXICAL_DIR)) >= MAX_SEGMENTS:
+            self._save_side_indexes(save_dir, *load_documents_and_metadata(save_dir))
+        elif documents:
+            LexicalIndex.save_segment(save_dir / LEXICAL_DIR, documents, first_row)
+            AttributeIndex.save_segment(save_dir / ATTRIBUTE_DIR, metadata, first_row)
+        write_index(self.index, str(save_dir / "papers.index"))
+
+        self.manifest['rows'] = first_row + len(documents)
+        with open(save_dir / MANIFEST_FILE, 'w') as f:
+            json.dump(self.manifest, f)
+        self.documents, self.metadata = load_documents_and_metadata(save_dir)
+
+    def load_existing(self, save_dir: str) -> None:
+        """Load a previously saved index, documents and manifest.
+
+        Args:
+            save_dir (str): Directory containing the saved index
+
+        Raises:
+            ValueError: If the index was built with a different embedding model
+        """
+        save_dir = Path(save_dir)
+
+        with open(save_dir / MANIFEST_FILE, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('model_name') != self.model_name:
+            raise ValueError(
+                f"Index in {save_dir} was built with {manifest.get('model_name')!r}, "
+                f"not {self.model_name!r}; rebuild it from scratch"
+            )
+
+        self.index = read_index(str(save_dir / "papers.index"))
+        # Updates and compaction keep the type, storage and sharding the index was built with
+        self.index_type = detect_index_type(self.index)
+        self.storage = detect_storage(self.index)
+        self.shards = len(self.index.shards) if isinstance(self.index, ShardedIndex) else 1
+        # Rows are read from the document store only when needed
+        self.documents, self.metadata = load_documents_and_metadata(save_dir)
+        self.manifest = manifest
+
+    def update_index(self, json_path: str, save_dir: str) -> Dict[str, int]:
+        """Bring a saved index up to date with the papers in a JSON file.
+
+        Only new or changed papers are embedded and appended to the index,
+        and only their rows are appended to the document store and the BM25
+        and attribute indexes. Rows of changed and deleted papers are
+        tombstoned, and the index is compacted once tombstones exceed
+        ``compact_ratio`` of its rows.
+
+        Args:
+            json_path (str): Path to the JSON file containing the documents
+            save_dir (str): Directory containing the saved index
+
+        Returns:
+            Dict[str, int]: Counts of added, updated, removed and unchanged papers
+        """
+        self.load_existing(save_dir)
+        with open(json_path, 'r') as file:
+            papers = json.load(file)['top_papers']
+
+        entries = self.manifest['papers']
+        tombstones = set(self.manifest['tombstones'])
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        pending = []
+        seen = set()
+
+        for key, paper in keyed_papers(papers):
+            seen.add(key)
+            text = render_paper(paper)
+            digest = content_hash(text)
+            entry = entries.get(key)
+            if entry is not None and entry['hash'] == digest:
+                stats['unchanged'] += 1
+                continue
+            if entry is not None:
+                tombstones.add(entry['row'])
+                stats['updated'] += 1
+            else:
+                stats['added'] += 1
+            pending.append((key, digest, text, paper))
+
+        for key in [key for key in entries if key not in seen]:
+            tombstones.add(entries.pop(key)['row'])
+            stats['removed'] += 1
+
+        # Vectors an unfinished update added past the saved rows belong to no paper
+        first_row = self.manifest.get('rows', len(self.documents))
+        orphans = self.index.ntotal - first_row
+        tombstones.update(range(first_row, first_row + orphans))
+        documents, metadata = [""] * orphans, [{}] * orphans
+
+        if pending:
+            embeddings = self.generate_embeddings([text for _, _, text, _ in pending])
+            self.index.add(embeddings)
+            for key, digest, text, paper in pending:
+                entries[key] = {'hash': digest, 'row': first_row + len(documents)}
+                documents.append(text)
+                metadata.append(paper)
+
+        self.manifest['tombstones'] = sorted(tombstones)
+        rows = first_row + len(documents)
+        save_dir = Path(save_dir)
+        appendable = (save_dir / STORE_DIR / HEADER_FILE).exists() and (save_dir / LEXICAL_DIR).exists()
+        if appendable and not (tombstones and len(tombstones) > self.compact_ratio * rows):
+            self._append_rows(save_dir, first_row, documents, metadata)
+            return stats
+
+        # Compaction, and indexes saved before the document store, rewrite everything
+        self.documents = list(self.documents[:first_row]) + documents
+        self.metadata = list(self.metadata[:first_row]) + metadata
+        if tombstones and len(tombstones) > self.compact_ratio * rows:
+            self.compact()
+        self.save_index(save_dir)
+        return stats
+
+    def compact(self) -> None:
+        """Rebuild the index without tombstoned rows, renumbering live rows."""
+        tombstones = set(self.manifest['tombstones'])
+        live_rows = [row for row in range(len(self.documents)) if row not in tombstones]
+
+        vectors = reconstruct_all(self.index)
+        self.create_index(np.ascontiguousarray(vectors[live_rows]))
+
+        new_row = {old: new for new, old in enumerate(live_rows)}
+        for entry in self.manifest['papers'].values():
+            entry['row'] = new_row[entry['row']]
+        self.documents = [self.documents[row] for row in live_rows]
+        self.metadata = [self.metadata[row] for row in live_rows]
+        self.manifest['tombstones'] = []
+
+    def process_and_index_documents(self, json_path: str, save_dir: str, incremental: bool = False) -> Optional[Dict[str, int]]:
         """Process documents and create searchable index.
-        
+
         Args:
             json_path (str): Path to the JSON file containing the documents
             save_dir (str): Directory to save the index and metadata
+            incremental (bool): Update an existing index in place instead of
+                rebuilding it, when one exists
+
+        Returns:
+            Optional[Dict[str, int]]: Update counts for incremental runs
         """
+        if incremental and os.path.exists(Path(save_dir) / MANIFEST_FILE):
+            return self.update_index(json_path, save_dir)
+
         self.load_documents(json_path)
         embeddings = self.generate_embeddings()
         self.create_index(embeddings)
-        self.save_index(save_dir) 
\ No newline at end of file
+        self.save_index(save_dir)
+        return None
\ No newline at end of file
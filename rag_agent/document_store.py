@@ -0,0 +1,380 @@
+"""Compact on-disk document store for the search index.
+
+Rendered documents are packed into one UTF-8 blob addressed by a memory-mapped
+offsets table. Metadata is stored column by column: low-cardinality fields such
+as year or technique type as integer codes into a small vocabulary, every other
+field as its own JSON-encoded blob column. Opening a store only maps the files,
+so nothing is decoded until a row is actually read.
+
+Convert an index saved with the old metadata.json layout with:
+    python document_store.py ../data/index
+"""
+import json
+import os
+import shutil
+import sys
+import numpy as np
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence, Tuple
+from pathlib import Path
+
+STORE_DIR = "docstore"
+HEADER_FILE = "docstore.json"
+CATEGORICAL_FIELDS = ("year", "month", "technique_type")
+
+
+class _BlobColumnWriter:
+    def __init__(self, path: Path, rows: Optional[int] = None):
+        if rows is None:
+            self.blob = open(f"{path}.blob", 'wb')
+            # Readable too, so ``truncate`` can look up where a row starts
+            self.offsets = open(f"{path}.offsets", 'w+b')
+            self.position = 0
+            self.offsets.write(np.uint64(0).tobytes())
+        else:
+            # Reopen an existing column after its first ``rows`` rows
+            self.blob = open(f"{path}.blob", 'r+b')
+            self.offsets = open(f"{path}.offsets", 'r+b')
+            self.truncate(rows)
+
+    def truncate(self, rows: int) -> None:
+        self.offsets.flush()
+        self.offsets.seek(rows * 8)
+        self.position = int(np.frombuffer(self.offsets.read(8), dtype=np.uint64)[0])
+        self.offsets.truncate()
+        self.blob.flush()
+        self.blob.truncate(self.position)
+        self.blob.seek(self.position)
+
+    def backfill(self, count: int) -> None:
+        self.offsets.write(np.full(count, self.position, dtype=np.uint64).tobytes())
+
+    def write(self, data: bytes) -> None:
+        self.blob.write(data)
+        self.position += len(data)
+        self.offsets.write(np.uint64(self.position).tobytes())
+
+    def close(self) -> None:
+        self.blob.close()
+        self.offsets.close()
+
+
+class _CategoricalColumnWriter:
+    def __init__(self, path: Path, rows: Optional[int] = None, values: Sequence[Any] = ()):
+        self.values: List[Any] = list(values)
+        self.vocab: Dict[str, int] = {json.dumps(value, sort_keys=True): code for code, value in enumerate(self.values)}
+        if rows is None:
+            self.codes = open(f"{path}.codes", 'wb')
+        else:
+            # Reopen an existing column after its first ``rows`` rows
+            self.codes = open(f"{path}.codes", 'r+b')
+            self.truncate(rows)
+
+    def truncate(self, rows: int) -> None:
+        self.codes.flush()
+        self.codes.truncate(rows * 4)
+        self.codes.seek(rows * 4)
+
+    def backfill(self, count: int) -> None:
+        self.codes.write(np.full(count, -1, dtype=np.int32).tobytes())
+
+    def write(self, value: Any) -> None:
+        key = json.dumps(value, sort_keys=True)
+        code = self.vocab.get(key)
+        if code is None:
+            code = self.vocab[key] = len(self.values)
+            self.values.append(value)
+        self.codes.write(np.int32(code).tobytes())
+
+    def close(self) -> None:
+        self.codes.close()
+
+
+class DocumentStoreWriter:
+    def __init__(self, store_dir: str, categorical_fields: Sequence[str] = CATEGORICAL_FIELDS, append: bool = False):
+        """Stream documents and their metadata into a new document store.
+
+        Rows are written to disk as they are appended, so memory stays flat no
+        matter how many documents are stored. The store only replaces an
+        existing one at ``store_dir`` when the writer is closed.
+
+        With ``append``, rows are added to the existing store in place instead.
+        Its header alone decides how many rows are visible and is replaced when
+        the writer is closed, so readers and an aborted writer only ever see
+        the rows of the last closed writer.
+
+        Args:
+            store_dir (str): Directory of the document store
+            categorical_fields (Sequence[str]): Metadata fields stored as vocabulary codes
+            append (bool): Add to the store at ``store_dir`` when there is one
+        """
+        self.store_dir = Path(store_dir)
+        self.categorical_fields = set(categorical_fields)
+        self.columns: Dict[str, Any] = {}
+        self.appending = append and (self.store_dir / HEADER_FILE).exists()
+        if self.appending:
+            with open(self.store_dir / HEADER_FILE, 'r') as f:
+                header = json.load(f)
+            self.data_dir = self.store_dir
+            self.count = header['count']
+            # Bytes past the header's row count are left over from an aborted writer
+            self.documents = _BlobColumnWriter(self.data_dir / "documents", self.count)
+            for field in header['fields']:
+                path = self.data_dir / field['file']
+                if field['kind'] == "categorical":
+                    self.columns[field['name']] = _CategoricalColumnWriter(path, self.count, field['values'])
+                else:
+                    self.columns[field['name']] = _BlobColumnWriter(path, self.count)
+            return
+        self.data_dir = self.store_dir.with_name(self.store_dir.name + ".tmp")
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+        self.data_dir.mkdir(parents=True)
+        self.documents = _BlobColumnWriter(self.data_dir / "documents")
+        self.count = 0
+
+    def __enter__(self) -> "DocumentStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _column(self, name: str):
+        column = self.columns.get(name)
+        if column is None:
+            path = self.data_dir / f"meta.{len(self.columns)}"
+            if name in self.categorical_fields:
+                column = _CategoricalColumnWriter(path)
+            else:
+                column = _BlobColumnWriter(path)
+            # Rows written before this field first appeared don't have it
+            column.backfill(self.count)
+            self.columns[name] = column
+        return column
+
+    def append(self, document: str, metadata: Dict[str, Any]) -> int:
+        """Append one document and its metadata.
+
+        Args:
+            document (str): Rendered document text
+            metadata (Dict[str, Any]): Metadata of the document
+
+        Returns:
+            int: Row id of the appended document
+        """
+        self.documents.write(document.encode("utf-8"))
+        for name, value in metadata.items():
+            column = self._column(name)
+            if isinstance(column, _CategoricalColumnWriter):
+                column.write(value)
+            else:
+                column.write(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        for name, column in self.columns.items():
+            if name not in metadata:
+                column.backfill(1)
+        self.count += 1
+        return self.count - 1
+
+    def truncate(self, count: int) -> None:
+        """Drop every row from ``count`` on, e.g. rows of a batch that failed half way.
+
+        Args:
+            count (int): Number of rows to keep
+        """
+        self.documents.truncate(count)
+        for column in self.columns.values():
+            column.truncate(count)
+        self.count = count
+
+    def close(self) -> None:
+        """Finish the store and move it into place."""
+        self.documents.close()
+        fields = []
+        for position, (name, column) in enumerate(self.columns.items()):
+            column.close()
+            field = {'name': name, 'file': f"meta.{position}"}
+            if isinstance(column, _CategoricalColumnWriter):
+                field.update(kind="categorical", values=column.values)
+            else:
+                field.update(kind="json")
+            fields.append(field)
+        if self.appending:
+            tmp_header = self.store_dir / (HEADER_FILE + ".tmp")
+            with open(tmp_header, 'w') as f:
+                json.dump({'count': self.count, 'fields': fields}, f)
+            os.replace(tmp_header, self.store_dir / HEADER_FILE)
+            return
+        with open(self.data_dir / HEADER_FILE, 'w') as f:
+            json.dump({'count': self.count, 'fields': fields}, f)
+
+        old_dir = self.store_dir.with_name(self.store_dir.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if self.store_dir.exists():
+            os.replace(self.store_dir, old_dir)
+        os.replace(self.data_dir, self.store_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def abort(self) -> None:
+        """Discard a partially written store, or the rows appended to an existing one."""
+        self.documents.close()
+        for column in self.columns.values():
+            column.close()
+        if not self.appending:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+def _map(path: Path, dtype) -> np.ndarray:
+    # Zero-length files cannot be memory-mapped
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class _LazyRows(Sequence):
+    def __init__(self, getter: Callable[[int], Any], length: int):
+        self._getter = getter
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._getter(i) for i in range(*row.indices(self._length))]
+        row = int(row)
+        if row < 0:
+            row += self._length
+        if not 0 <= row < self._length:
+            raise IndexError(row)
+        return self._getter(row)
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in range(self._length):
+            yield self._getter(row)
+
+
+class DocumentStore:
+    def __init__(self, store_dir: str):
+        """Open a document store written by ``DocumentStoreWriter``.
+
+        Args:
+            store_dir (str): Directory of the document store
+        """
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / HEADER_FILE, 'r') as f:
+            header = json.load(f)
+        self.count = header['count']
+        self.fields = header['fields']
+        self._documents = self._blob_column("documents")
+        self._columns = []
+        for field in self.fields:
+            if field['kind'] == "categorical":
+                codes = _map(self.store_dir / f"{field['file']}.codes", np.int32)
+                self._columns.append((field['name'], "categorical", (codes, field['values'])))
+            else:
+                self._columns.append((field['name'], "json", self._blob_column(field['file'])))
+
+        self.documents = _LazyRows(self.document, self.count)
+        self.metadata = _LazyRows(self.get_metadata, self.count)
+
+    def _blob_column(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = _map(self.store_dir / f"{name}.offsets", np.uint64)
+        blob = _map(self.store_dir / f"{name}.blob", np.uint8)
+        return offsets, blob
+
+    @staticmethod
+    def _read(column: Tuple[np.ndarray, np.ndarray], row: int) -> bytes:
+        offsets, blob = column
+        return blob[int(offsets[row]):int(offsets[row + 1])].tobytes()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def document(self, row: int) -> str:
+        """Decode the rendered text of one document.
+
+        Args:
+            row (int): Row id of the document
+
+        Returns:
+            str: Document text
+        """
+        return self._read(self._documents, row).decode("utf-8")
+
+    def get_metadata(self, row: int) -> Dict[str, Any]:
+        """Decode the metadata of one document.
+
+        Args:
+            row (int): Row id of the document
+
+        Returns:
+            Dict[str, Any]: Metadata fields present on the document
+        """
+        metadata = {}
+        for name, kind, column in self._columns:
+            if kind == "categorical":
+                codes, values = column
+                code = codes[row]
+                if code >= 0:
+                    metadata[name] = values[code]
+            else:
+                data = self._read(column, row)
+                if data:
+                    metadata[name] = json.loads(data)
+        return metadata
+
+
+def write_document_store(store_dir: str, documents: Sequence[str], metadata: Sequence[Dict[str, Any]]) -> None:
+    """Write documents and their metadata to a new document store.
+
+    Args:
+        store_dir (str): Directory of the document store
+        documents (Sequence[str]): Rendered document texts
+        metadata (Sequence[Dict[str, Any]]): Metadata, one dict per document
+    """
+    with DocumentStoreWriter(store_dir) as writer:
+        for document, meta in zip(documents, metadata):
+            writer.append(document, meta)
+
+
+def load_documents_and_metadata(index_dir: str) -> Tuple[Sequence[str], Sequence[Dict[str, Any]]]:
+    """Open the documents and metadata saved next to a FAISS index.
+
+    Uses the document store when present and falls back to metadata.json for
+    indexes saved before it existed.
+
+    Args:
+        index_dir (str): Directory containing the index
+
+    Returns:
+        Tuple[Sequence[str], Sequence[Dict[str, Any]]]: Documents and metadata, indexed by row
+    """
+    index_dir = Path(index_dir)
+    if (index_dir / STORE_DIR / HEADER_FILE).exists():
+        store = DocumentStore(index_dir / STORE_DIR)
+        return store.documents, store.metadata
+    with open(index_dir / "metadata.json", 'r') as f:
+        data = json.load(f)
+    return data['documents'], data['metadata']
+
+
+def convert_metadata_json(index_dir: str) -> int:
+    """Convert an index directory from metadata.json to a document store.
+
+    Args:
+        index_dir (str): Directory containing papers.index and metadata.json
+
+    Returns:
+        int: Number of converted documents
+    """
+    index_dir = Path(index_dir)
+    with open(index_dir / "metadata.json", 'r') as f:
+        data = json.load(f)
+    write_document_store(index_dir / STORE_DIR, data['documents'], data['metadata'])
+    return len(data['documents'])
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "../data/index"
+    print(f"Converted {convert_metadata_json(target)} documents in {target}")
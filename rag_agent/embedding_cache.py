@@ -0,0 +1,239 @@
+import atexit
+import json
+import os
+import re
+import hashlib
+import threading
+import time
+import numpy as np
+from typing import List, Dict, Any, Callable
+from pathlib import Path
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 100_000,
+                 flush_entries: int = 1024, flush_interval: float = 30.0):
+        """Initialize an on-disk embedding cache for one embedding model.
+
+        Vectors are stored in a memory-mapped float32 array with one row per
+        cache slot. A compact key index maps the first 16 bytes of each text's
+        SHA-256 digest to its slot and records when the slot was last used, so
+        the least recently used entries are evicted once the cache is full.
+
+        Rewriting the key index costs the same however few entries changed, so
+        new entries and recency updates are persisted in batches: once
+        ``flush_entries`` are pending, once ``flush_interval`` seconds have
+        passed since the last flush, on ``flush()``/``close()`` and at
+        interpreter exit. Evicted slots are marked empty on disk before their
+        vectors are overwritten, so a crash loses entries but never maps a key
+        to another text's embedding.
+
+        Args:
+            cache_dir (str): Root directory of the cache, shared between models
+            model_name (str): Name of the model whose embeddings are cached
+            max_entries (int): Maximum number of cached embeddings
+            flush_entries (int): New entries that trigger a flush
+            flush_interval (float): Seconds after which pending entries are flushed
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.flush_entries = flush_entries
+        self.flush_interval = flush_interval
+        self.cache_dir = Path(cache_dir) / re.sub(r"[^\w.-]+", "_", model_name)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.dimension = None
+        self.vectors = None
+        self.keys = np.zeros((max_entries, 16), dtype=np.uint8)
+        self.last_used = np.zeros(max_entries, dtype=np.uint64)
+        self.slots: Dict[bytes, int] = {}
+        self.size = 0
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self._pending = 0
+        self._touched = False
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._load()
+        atexit.register(self.close)
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        """Compute the cache key of a text.
+
+        Args:
+            text (str): Text to embed
+
+        Returns:
+            bytes: Truncated SHA-256 digest of the text
+        """
+        return hashlib.sha256(text.encode("utf-8")).digest()[:16]
+
+    def _load(self) -> None:
+        meta_path = self.cache_dir / "cache.json"
+        if not meta_path.exists():
+            return
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta['model_name'] != self.model_name or meta['max_entries'] != self.max_entries:
+            # A resized cache starts over rather than migrating slots
+            return
+
+        index = np.load(self.cache_dir / "keys.npz")
+        self.keys = index['keys'].copy()
+        self.last_used = index['last_used'].copy()
+        self.size = int(meta['size'])
+        self.clock = int(meta['clock'])
+        # All-zero keys mark slots emptied by eviction
+        self.slots = {k.tobytes(): slot for slot, k in enumerate(self.keys[:self.size]) if k.any()}
+        self._open_vectors(meta['dimension'], mode='r+')
+
+    def _open_vectors(self, dimension: int, mode: str) -> None:
+        self.dimension = dimension
+        self.vectors = np.memmap(
+            self.cache_dir / "vectors.f32",
+            dtype=np.float32,
+            mode=mode,
+            shape=(self.max_entries, dimension),
+        )
+
+    def _write_index(self) -> None:
+        # Vectors first, so the key index never names a row that is not on disk yet
+        self.vectors.flush()
+        tmp_path = self.cache_dir / "keys.tmp.npz"
+        np.savez(tmp_path, keys=self.keys, last_used=self.last_used)
+        os.replace(tmp_path, self.cache_dir / "keys.npz")
+        tmp_path = self.cache_dir / "cache.tmp.json"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'model_name': self.model_name,
+                'max_entries': self.max_entries,
+                'dimension': self.dimension,
+                'size': self.size,
+                'clock': self.clock,
+            }, f)
+        os.replace(tmp_path, self.cache_dir / "cache.json")
+        self._pending = 0
+        self._touched = False
+        self._flushed_at = time.monotonic()
+        self.flushes += 1
+
+    def flush(self) -> None:
+        """Persist the vectors, key index and recency of the entries to disk."""
+        with self._lock:
+            if self.vectors is None or not (self._pending or self._touched):
+                return
+            self._write_index()
+
+    def close(self) -> None:
+        """Flush pending entries; the cache stays usable afterwards."""
+        self.flush()
+
+    def _flush_due(self) -> bool:
+        with self._lock:
+            if self._pending >= self.flush_entries:
+                return True
+            return (bool(self._pending) or self._touched) and time.monotonic() - self._flushed_at >= self.flush_interval
+
+    def _allocate(self, count: int) -> np.ndarray:
+        """Return ``count`` free slots, evicting least recently used entries."""
+        free = min(count, self.max_entries - self.size)
+        evict = count - free
+        slots = np.arange(self.size, self.size + free)
+        if evict:
+            evicted = np.argpartition(self.last_used[:self.size], evict - 1)[:evict]
+            for slot in evicted:
+                self.slots.pop(self.keys[slot].tobytes(), None)
+            # Forget the evicted keys on disk before their rows are reused
+            self.keys[evicted] = 0
+            self.last_used[evicted] = 0
+            self._write_index()
+            slots = np.concatenate([slots, evicted])
+        self.size += free
+        return slots
+
+    def put(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Store embeddings under their cache keys.
+
+        Args:
+            keys (List[bytes]): Cache keys, as returned by ``key``
+            vectors (np.ndarray): Embeddings, one row per key
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(keys) > self.max_entries:
+            keys, vectors = keys[-self.max_entries:], vectors[-self.max_entries:]
+        with self._lock:
+            if self.vectors is None:
+                self._open_vectors(vectors.shape[1], mode='w+')
+            # Another thread may have stored the same text in the meantime
+            fresh = [i for i, key in enumerate(keys) if key not in self.slots]
+            keys, vectors = [keys[i] for i in fresh], vectors[fresh]
+            slots = self._allocate(len(keys))
+            self.clock += 1
+            for slot, key, vector in zip(slots, keys, vectors):
+                self.vectors[slot] = vector
+                self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self.last_used[slot] = self.clock
+                self.slots[key] = int(slot)
+            self._pending += len(keys)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embed texts, calling ``encode_fn`` only for texts not yet cached.
+
+        Args:
+            texts (List[str]): Texts to embed
+            encode_fn (Callable[[List[str]], np.ndarray]): Embeds the missing texts
+
+        Returns:
+            np.ndarray: float32 embeddings in the order of ``texts``
+        """
+        keys = [self.key(text) for text in texts]
+        found: Dict[int, np.ndarray] = {}
+        with self._lock:
+            self.clock += 1
+            for i, key in enumerate(keys):
+                slot = self.slots.get(key)
+                if slot is not None:
+                    found[i] = np.array(self.vectors[slot])
+                    self.last_used[slot] = self.clock
+            self._touched |= bool(found)
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+
+        # Encode each missing text once, even when it is repeated in the batch
+        missing: Dict[bytes, int] = {}
+        for i, key in enumerate(keys):
+            if i not in found and key not in missing:
+                missing[key] = i
+        if missing:
+            encoded = np.asarray(encode_fn([texts[i] for i in missing.values()]), dtype=np.float32)
+            self.put(list(missing), encoded)
+            by_key = dict(zip(missing, encoded))
+            for i, key in enumerate(keys):
+                if i not in found:
+                    found[i] = by_key[key]
+        if self._flush_due():
+            self.flush()
+
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.stack([found[i] for i in range(len(texts))])
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache occupancy and hit rate.
+
+        Returns:
+            Dict[str, Any]: Entry count, capacity, hits, misses and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.slots),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'pending': self._pending,
+            'flushes': self.flushes,
+        }
@@ -0,0 +1,269 @@
+"""Multi-process, length-bucketed embedding generation for large index builds.
+
+Texts are sorted by length in model tokens and cut into batches of similar
+length, so little of each batch is padding. The batches go to a pool of worker
+processes, each holding its own copy of the model, longest first so the pool
+drains evenly, and every worker writes its embeddings straight into one
+preallocated float32 memmap at the rows of the original texts. Nothing but row
+numbers travels back to the parent, which prints a throughput report at the end.
+
+The pool and its models stay up between calls until ``close()``, and small
+calls such as incremental updates are encoded in-process instead.
+
+Example:
+    python encoding_engine.py --corpus ../data/research_papers.json --workers 8 \\
+        --batch-size 32 --out ../data/embeddings.f32
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_MODEL = "intfloat/multilingual-e5-large-instruct"
+
+# Per-process state of the pool workers
+_worker_model = None
+_worker_outputs: Dict[str, np.memmap] = {}
+
+
+def text_lengths(texts: List[str], tokenizer: Any = None) -> np.ndarray:
+    """Length of each text in model tokens, or in words without a tokenizer.
+
+    Word counts order texts almost exactly like token counts, without loading
+    the tokenizer in the parent process.
+
+    Args:
+        texts (List[str]): Texts to measure
+        tokenizer (Any): Hugging Face tokenizer of the embedding model, or None
+
+    Returns:
+        np.ndarray: One length per text
+    """
+    if tokenizer is not None:
+        return np.array([len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids']])
+    return np.array([len(text.split()) for text in texts])
+
+
+def length_batches(lengths: np.ndarray, batch_size: int) -> List[np.ndarray]:
+    """Group text positions into batches of similar length, longest batch first.
+
+    Args:
+        lengths (np.ndarray): Length of each text
+        batch_size (int): Texts per batch
+
+    Returns:
+        List[np.ndarray]: Positions of the texts in each batch
+    """
+    order = np.argsort(-lengths, kind="stable")
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def padding_efficiency(lengths: np.ndarray, batches: List[np.ndarray]) -> float:
+    """Fraction of the padded batch tensors taken up by real tokens."""
+    padded = sum(int(lengths[batch].max()) * len(batch) for batch in batches)
+    return float(lengths.sum() / padded) if padded else 1.0
+
+
+def _load_model(model_name: str):
+    from lazy_imports import LazySentenceTransformer
+    return LazySentenceTransformer(model_name).load()
+
+
+def _init_worker(model_name: str, model_factory: Optional[Callable[[], Any]], threads: int) -> None:
+    global _worker_model
+    # Split the cores between the workers instead of every worker using all of them
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    _worker_model = model_factory() if model_factory is not None else _load_model(model_name)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _worker_dimension() -> int:
+    return _encode(_worker_model, ["dimension probe"]).shape[1]
+
+
+def _encode(model: Any, texts: List[str]) -> np.ndarray:
+    return np.asarray(model.encode(texts, batch_size=len(texts), show_progress_bar=False), dtype=np.float32)
+
+
+def _worker_encode(out_path: str, shape: tuple, rows: np.ndarray, texts: List[str]) -> int:
+    out = _worker_outputs.get(out_path)
+    if out is None:
+        # Mappings of earlier calls would keep their unlinked files alive
+        _worker_outputs.clear()
+        out = _worker_outputs[out_path] = np.memmap(out_path, dtype=np.float32, mode='r+', shape=shape)
+    out[rows] = _encode(_worker_model, texts)
+    out.flush()
+    return len(rows)
+
+
+class EncodingEngine:
+    def __init__(self, model_name: str = DEFAULT_MODEL, workers: Optional[int] = None, batch_size: int = 32,
+                 model_factory: Optional[Callable[[], Any]] = None, tokenizer: Any = None, report: bool = True,
+                 min_parallel_texts: int = 1024):
+        """Encoder that spreads length-bucketed batches over worker processes.
+
+        Args:
+            model_name (str): Name of the sentence-transformer model each worker loads
+            workers (Optional[int]): Worker processes, defaults to the core count; with
+                one worker texts are encoded in-process
+            batch_size (int): Texts per batch
+            model_factory (Optional[Callable[[], Any]]): Picklable callable building the
+                model in each worker instead of loading ``model_name``, e.g. a stub model
+            tokenizer (Any): Tokenizer measuring text lengths; if None, the tokenizer of
+                ``model_name`` is loaded on first use, or words are counted with a ``model_factory``
+            report (bool): Print the throughput report to stderr after each encode
+            min_parallel_texts (int): Calls with fewer texts are encoded in-process, where
+                starting the pool and loading a model per worker would cost more than it saves
+        """
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.model_factory = model_factory
+        self.tokenizer = tokenizer
+        self.report = report
+        self.min_parallel_texts = min_parallel_texts
+        self.last_report: Dict[str, Any] = {}
+        self._model = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._dimension: Optional[int] = None
+
+    def _local_model(self):
+        if self._model is None:
+            self._model = self.model_factory() if self.model_factory is not None else _load_model(self.model_name)
+        return self._model
+
+    def _length_tokenizer(self) -> Any:
+        if self.tokenizer is None and self.model_factory is None:
+            if self._model is not None:
+                self.tokenizer = getattr(self._model, 'tokenizer', None)
+            else:
+                # The model's own tokenizer, without loading the model in the parent
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return self.tokenizer
+
+    def _worker_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(self.model_name, self.model_factory, threads),
+            )
+            self._dimension = self._pool.submit(_worker_dimension).result()
+        return self._pool
+
+    def close(self) -> None:
+        """Shut down the worker pool; the next parallel encode starts a new one."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def encode(self, texts: List[str], out_path: Optional[str] = None) -> np.ndarray:
+        """Embed texts into a memmap, in the order of ``texts``.
+
+        Args:
+            texts (List[str]): Texts to embed
+            out_path (Optional[str]): File of the float32 embeddings; without one, a
+                temporary file is used and unlinked once encoding is done, so the
+                returned memmap is the only reference to it
+
+        Returns:
+            np.ndarray: float32 memmap of the embeddings, one row per text
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        start = time.perf_counter()
+        parallel = self.workers > 1 and len(texts) >= self.min_parallel_texts
+        lengths = text_lengths(texts, self._length_tokenizer())
+        batches = length_batches(lengths, self.batch_size)
+        temporary = out_path is None
+        if temporary:
+            fd, out_path = tempfile.mkstemp(prefix="embeddings-", suffix=".f32")
+            os.close(fd)
+
+        try:
+            if not parallel:
+                model = self._local_model()
+                out = None
+                for rows in batches:
+                    vectors = _encode(model, [texts[row] for row in rows])
+                    if out is None:
+                        out = np.memmap(out_path, dtype=np.float32, mode='w+', shape=(len(texts), vectors.shape[1]))
+                    out[rows] = vectors
+            else:
+                pool = self._worker_pool()
+                out = np.memmap(out_path, dtype=np.float32, mode='w+', shape=(len(texts), self._dimension))
+                out.flush()
+                futures = [
+                    pool.submit(_worker_encode, out_path, out.shape, rows, [texts[row] for row in rows])
+                    for rows in batches
+                ]
+                for future in as_completed(futures):
+                    future.result()
+            out.flush()
+        finally:
+            # The mapping stays valid after the file is unlinked
+            if temporary:
+                os.remove(out_path)
+
+        seconds = time.perf_counter() - start
+        self.last_report = {
+            'docs': len(texts),
+            'workers': self.workers if parallel else 1,
+            'batch_size': self.batch_size,
+            'batches': len(batches),
+            'seconds': seconds,
+            'docs_per_sec': len(texts) / seconds,
+            'padding_efficiency': padding_efficiency(lengths, batches),
+            'unsorted_padding_efficiency': padding_efficiency(
+                lengths, [np.arange(i, min(i + self.batch_size, len(texts))) for i in range(0, len(texts), self.batch_size)]
+            ),
+        }
+        if self.report:
+            print(format_report(self.last_report), file=sys.stderr)
+        return out
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """One-line summary of an ``EncodingEngine.last_report``."""
+    return (f"Encoded {report['docs']} docs in {report['seconds']:.2f}s ({report['docs_per_sec']:.1f} docs/sec) "
+            f"with {report['workers']} workers in {report['batches']} batches of {report['batch_size']}; "
+            f"padding efficiency {report['padding_efficiency']:.0%} "
+            f"({report['unsorted_padding_efficiency']:.0%} unsorted)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default="../data/research_papers.json")
+    parser.add_argument("--out", required=True, help="float32 file the embeddings are written to")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--stub-model", action="store_true", help="Embed with the deterministic stub model")
+    args = parser.parse_args()
+
+    from document_indexer import render_paper
+    with open(args.corpus, 'r') as f:
+        texts = [render_paper(paper) for paper in json.load(f)['top_papers']]
+    model_factory = None
+    if args.stub_model:
+        from benchmark import StubEmbeddingModel
+        model_factory = StubEmbeddingModel
+    engine = EncodingEngine(args.model, args.workers, args.batch_size, model_factory=model_factory)
+    try:
+        embeddings = engine.encode(texts, args.out)
+    finally:
+        engine.close()
+    print(f"{embeddings.shape[0]} x {embeddings.shape[1]} embeddings written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
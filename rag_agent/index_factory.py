@@ -0,0 +1,607 @@
+import json
+import math
+import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from lazy_imports import faiss
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# How vectors are stored: full floats, scalar-quantized, or sign bits re-ranked with float16 copies
+STORAGE_TYPES = ("float32", "float16", "int8", "binary")
+
+# Side files of binary indexes, next to the index file
+RERANK_SUFFIX = ".rerank.npy"
+BINARY_META_SUFFIX = ".binary.json"
+# Manifest of a sharded index, listing one index file per shard
+SHARDS_SUFFIX = ".shards.json"
+# Global ids of a shard's rows, next to the shard file
+SHARD_IDS_SUFFIX = ".ids.npy"
+
+# Search-time defaults applied when the caller does not pick its own knobs
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+
+def _training_sample(embeddings: np.ndarray, train_size: int, seed: int) -> np.ndarray:
+    if len(embeddings) <= train_size:
+        return embeddings
+    rows = np.random.default_rng(seed).choice(len(embeddings), train_size, replace=False)
+    return np.ascontiguousarray(embeddings[np.sort(rows)])
+
+
+def _pq_subquantizers(dimension: int, requested: int) -> int:
+    # Product quantization needs the sub-quantizer count to divide the dimension
+    for m in range(min(requested, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+class BinaryRerankIndex:
+    def __init__(self, dimension: int, thresholds: Optional[np.ndarray] = None, rerank_factor: int = 10,
+                 binary: Optional["faiss.IndexBinary"] = None, vectors: Optional[np.ndarray] = None):
+        """Index of one bit per dimension, with exact re-ranking of the best candidates.
+
+        Each vector is stored as the bits ``vector > thresholds``, searched by
+        Hamming distance, and the ``rerank_factor * k`` closest codes are
+        re-ranked by exact L2 distance to float16 copies of the vectors. Saved
+        indexes memory-map those copies, so only the codes stay resident; rows
+        added afterwards go to an in-memory buffer that doubles when full. It
+        answers the parts of the FAISS index API the RAG agent uses.
+
+        Args:
+            dimension (int): Vector dimension
+            thresholds (Optional[np.ndarray]): Per-dimension bit thresholds, zeros by default
+            rerank_factor (int): Candidates re-ranked per requested result
+            binary (Optional[faiss.IndexBinary]): Existing binary index of the codes
+            vectors (Optional[np.ndarray]): Existing float16 vectors, one row per code
+        """
+        self.d = dimension
+        self.thresholds = np.zeros(dimension, dtype=np.float32) if thresholds is None else thresholds.astype(np.float32)
+        self.rerank_factor = rerank_factor
+        self.binary = binary if binary is not None else faiss.IndexBinaryFlat(-(-dimension // 8) * 8)
+        self.vectors = vectors if vectors is not None else np.empty((0, dimension), dtype=np.float16)
+        self._added = np.empty((0, dimension), dtype=np.float16)
+        self._added_count = 0
+        self.is_trained = True
+
+    @property
+    def ntotal(self) -> int:
+        return self.binary.ntotal
+
+    def train(self, embeddings: np.ndarray) -> None:
+        # Splitting each dimension at its median gives balanced, informative bits
+        self.thresholds = np.median(embeddings, axis=0).astype(np.float32)
+
+    def codes(self, embeddings: np.ndarray) -> np.ndarray:
+        return np.packbits(embeddings > self.thresholds, axis=1)
+
+    def add(self, embeddings: np.ndarray) -> None:
+        end = self._added_count + len(embeddings)
+        if end > len(self._added):
+            grown = np.empty((max(end, 2 * len(self._added)), self.d), dtype=np.float16)
+            grown[:self._added_count] = self._added[:self._added_count]
+            self._added = grown
+        self._added[self._added_count:end] = embeddings
+        # The codes go in last, so a failed add leaves the index unchanged
+        self.binary.add(self.codes(embeddings))
+        self._added_count = end
+
+    def _rows(self, rows: np.ndarray) -> np.ndarray:
+        # Saved rows are read from the memory map, later ones from the buffer
+        rows = np.asarray(rows, dtype=np.int64)
+        saved = len(self.vectors)
+        vectors = np.empty((len(rows), self.d), dtype=np.float32)
+        in_saved = rows < saved
+        vectors[in_saved] = self.vectors[rows[in_saved]]
+        vectors[~in_saved] = self._added[rows[~in_saved] - saved]
+        return vectors
+
+    def write_vectors(self, path: str, chunk_rows: int = 65536) -> None:
+        """Write the float16 vectors of every row to a ``.npy`` file, one chunk at a time."""
+        saved = len(self.vectors)
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float16, shape=(self.ntotal, self.d))
+        for start in range(0, saved, chunk_rows):
+            end = min(start + chunk_rows, saved)
+            out[start:end] = self.vectors[start:end]
+        out[saved:] = self._added[:self._added_count]
+        out.flush()
+        del out
+
+    def search(self, queries: np.ndarray, k: int, params: Optional["faiss.SearchParameters"] = None):
+        """Search like ``faiss.Index.search``; ``params`` may carry an ID selector."""
+        queries = np.asarray(queries, dtype=np.float32)
+        candidates = min(max(k * self.rerank_factor, k), self.ntotal)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if candidates == 0:
+            return distances, ids
+        binary_params = faiss.SearchParameters(sel=params.sel) if params is not None and params.sel is not None else None
+        _, candidate_ids = self.binary.search(self.codes(queries), candidates, params=binary_params)
+        for row, (query, found) in enumerate(zip(queries, candidate_ids)):
+            # Sorted rows make the reads from memory-mapped vectors sequential
+            found = np.sort(found[found >= 0])
+            if len(found) == 0:
+                continue
+            vectors = self._rows(found)
+            exact = ((vectors - query) ** 2).sum(axis=1)
+            best = np.argsort(exact, kind="stable")[:k]
+            distances[row, :len(best)] = exact[best]
+            ids[row, :len(best)] = found[best]
+        return distances, ids
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        return self._rows(np.arange(start, min(start + count, self.ntotal)))
+
+    def reconstruct_batch(self, rows: np.ndarray) -> np.ndarray:
+        return self._rows(rows)
+
+
+def _balanced_counts(sizes: np.ndarray, count: int) -> np.ndarray:
+    # Raise the smallest shards to a common level, the largest m shards that stay below it
+    order = np.argsort(sizes, kind="stable")
+    ordered = sizes[order]
+    for m in range(len(sizes), 0, -1):
+        total = int(ordered[:m].sum()) + count
+        if total // m >= ordered[m - 1]:
+            break
+    level, extra = divmod(total, m)
+    counts = np.zeros(len(sizes), dtype=np.int64)
+    counts[order[:m]] = level - ordered[:m]
+    counts[order[:extra]] += 1
+    return counts
+
+
+class ShardedIndex:
+    def __init__(self, shards: List["faiss.Index"], workers: Optional[int] = None,
+                 ids: Optional[List[np.ndarray]] = None):
+        """One logical index split into shards, searched in parallel.
+
+        A query is searched in every shard on a thread pool (FAISS releases the
+        GIL, so shards run on separate cores) and the per-shard top-k lists are
+        merged with a heap. ``ids[i]`` maps the rows of shard ``i`` to ascending
+        global ids, consecutive for shards built by ``build_sharded_index``, so
+        merged results use the same ids as an unsharded index, and for flat
+        shards they are identical to it. New rows take the next global ids and
+        go to the smallest shards, keeping the shards balanced.
+
+        Args:
+            shards (List[faiss.Index]): Shard indexes
+            workers (Optional[int]): Threads searching shards, defaults to one per shard up to the core count
+            ids (Optional[List[np.ndarray]]): Global id of every row of each shard,
+                defaults to consecutive ids in shard order
+        """
+        self.shards = shards
+        if ids is None:
+            starts = np.cumsum([0] + [shard.ntotal for shard in shards])
+            ids = [np.arange(start, start + shard.ntotal, dtype=np.int64) for start, shard in zip(starts, shards)]
+        self.ids = ids
+        self.d = shards[0].d
+        self.is_trained = True
+        self.workers = workers or min(len(shards), os.cpu_count() or 1)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards)
+
+    def add(self, embeddings: np.ndarray) -> None:
+        start = self.ntotal
+        counts = _balanced_counts(np.array([shard.ntotal for shard in self.shards]), len(embeddings))
+        for i, count in enumerate(counts):
+            if count:
+                self.shards[i].add(np.ascontiguousarray(embeddings[:count]))
+                self.ids[i] = np.concatenate([self.ids[i], np.arange(start, start + count, dtype=np.int64)])
+                embeddings = embeddings[count:]
+                start += count
+
+    def _local_rows(self, shard: int, rows: np.ndarray):
+        # Shard ids ascend, so global rows are found by binary search
+        ids = self.ids[shard]
+        positions = np.searchsorted(ids, rows)
+        found = positions < len(ids)
+        found[found] = ids[positions[found]] == rows[found]
+        return found, positions[found]
+
+    def _map(self, fn, items) -> list:
+        if self.workers <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shard")
+            pool = self._pool
+        return list(pool.map(fn, items))
+
+    def close(self) -> None:
+        """Stop the threads searching the shards; a later search starts new ones."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def search(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray] = None):
+        """Search like ``faiss.Index.search``, optionally only among the sorted global ids ``allowed``."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        jobs = []
+        for i, shard in enumerate(self.shards):
+            if allowed is None:
+                jobs.append((shard, self.ids[i], None))
+                continue
+            # Translate the filter to shard-local ids and skip shards it excludes entirely
+            _, local = self._local_rows(i, allowed)
+            if len(local):
+                jobs.append((shard, self.ids[i], local))
+
+        def search_shard(job):
+            shard, shard_ids, local = job
+            shard_k = min(k, shard.ntotal if local is None else len(local))
+            if shard_k == 0:
+                return None
+            if local is None:
+                distances, ids = shard.search(queries, shard_k)
+            else:
+                distances, ids = filtered_search(shard, queries, shard_k, local)
+            return distances, np.where(ids >= 0, shard_ids[np.maximum(ids, 0)], -1)
+
+        heap = faiss.ResultHeap(len(queries), k)
+        for result in self._map(search_shard, jobs):
+            if result is not None:
+                heap.add_result(*result)
+        heap.finalize()
+        return heap.D, heap.I
+
+    def reconstruct_batch(self, rows: np.ndarray) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.empty((len(rows), self.d), dtype=np.float32)
+        for i, shard in enumerate(self.shards):
+            found, local = self._local_rows(i, rows)
+            if len(local):
+                vectors[found] = reconstruct_rows(shard, local)
+        return vectors
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        return self.reconstruct_batch(np.arange(start, start + count))
+
+
+def _scalar_quantizer_type(storage: str):
+    return {'float16': faiss.ScalarQuantizer.QT_fp16, 'int8': faiss.ScalarQuantizer.QT_8bit}[storage]
+
+
+def build_index(embeddings: np.ndarray, index_type: str = "flat", nlist: Optional[int] = None,
+                pq_m: int = 64, pq_bits: int = 8, hnsw_m: int = 32, ef_construction: int = 200,
+                train_size: int = 50_000, seed: int = 0, storage: str = "float32",
+                rerank_factor: int = 10) -> "faiss.Index":
+    """Create a trained, empty FAISS index of the requested type.
+
+    IVF indexes and quantized storage are trained on a random sample of
+    ``train_size`` embeddings. When the corpus is too small for the requested
+    parameters they are scaled down rather than failing, so tiny test corpora
+    still build.
+
+    Args:
+        embeddings (np.ndarray): Document embeddings used to size and train the index
+        index_type (str): One of "flat", "ivf_flat", "ivf_pq" or "hnsw"
+        nlist (Optional[int]): Number of IVF partitions, defaults to 4 * sqrt(n)
+        pq_m (int): Number of product quantizer sub-vectors for IVF-PQ
+        pq_bits (int): Bits per product quantizer code for IVF-PQ
+        hnsw_m (int): Number of graph neighbours per node for HNSW
+        ef_construction (int): HNSW candidate list size while building
+        train_size (int): Maximum number of embeddings used for training
+        seed (int): Seed for the training sample
+        storage (str): Vector storage, one of STORAGE_TYPES; "float16" and "int8"
+            apply to flat, ivf_flat and hnsw, "binary" to flat only
+        rerank_factor (int): Candidates re-ranked per result by binary indexes
+
+    Returns:
+        faiss.Index: Index ready for ``add``
+
+    Raises:
+        ValueError: If the index type or storage is unknown, or they do not combine
+    """
+    count, dimension = embeddings.shape
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown storage {storage!r}, expected one of {STORAGE_TYPES}")
+    if storage == "binary" and index_type != "flat":
+        raise ValueError("Binary storage is only available for flat indexes")
+    if storage != "float32" and index_type == "ivf_pq":
+        raise ValueError("IVF-PQ indexes are already quantized; use storage='float32'")
+    quantized = storage in ("float16", "int8")
+
+    if index_type == "flat":
+        if storage == "binary":
+            index = BinaryRerankIndex(dimension, rerank_factor=rerank_factor)
+            index.train(_training_sample(embeddings, train_size, seed))
+            return index
+        if quantized:
+            index = faiss.IndexScalarQuantizer(dimension, _scalar_quantizer_type(storage), faiss.METRIC_L2)
+            index.train(_training_sample(embeddings, train_size, seed))
+            return index
+        return faiss.IndexFlatL2(dimension)
+
+    if index_type == "hnsw":
+        if quantized:
+            index = faiss.IndexHNSWSQ(dimension, _scalar_quantizer_type(storage), hnsw_m)
+            index.train(_training_sample(embeddings, train_size, seed))
+        else:
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    if index_type not in ("ivf_flat", "ivf_pq"):
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    sample = _training_sample(embeddings, train_size, seed)
+    if nlist is None:
+        nlist = int(4 * math.sqrt(count))
+    # FAISS wants roughly 39 training points per partition
+    nlist = max(1, min(nlist, len(sample) // 39))
+
+    quantizer = faiss.IndexFlatL2(dimension)
+    if index_type == "ivf_flat" and quantized:
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, _scalar_quantizer_type(storage), faiss.METRIC_L2)
+    elif index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+    else:
+        pq_bits = max(1, min(pq_bits, int(math.log2(max(len(sample), 2)))))
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_subquantizers(dimension, pq_m), pq_bits)
+    index.train(sample)
+    return index
+
+
+def build_sharded_index(embeddings: np.ndarray, shards: int, index_type: str = "flat", **params) -> ShardedIndex:
+    """Split embeddings into shards of consecutive rows and index each shard.
+
+    Each shard is built by ``build_index`` and trained on its own rows.
+
+    Args:
+        embeddings (np.ndarray): Embeddings to index
+        shards (int): Number of shards
+        index_type (str): Index type of every shard
+        **params: Build parameters passed to ``build_index``
+
+    Returns:
+        ShardedIndex: Index already holding ``embeddings``
+    """
+    bounds = np.linspace(0, len(embeddings), max(min(shards, len(embeddings)), 1) + 1).astype(int)
+    indexes = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        rows = np.ascontiguousarray(embeddings[lo:hi])
+        index = build_index(rows, index_type, **params)
+        index.add(rows)
+        indexes.append(index)
+    return ShardedIndex(indexes)
+
+
+def detect_storage(index: "faiss.Index") -> str:
+    """Identify how a loaded index stores its vectors.
+
+    Args:
+        index (faiss.Index): Index returned by ``read_index``
+
+    Returns:
+        str: One of STORAGE_TYPES
+    """
+    if isinstance(index, ShardedIndex):
+        index = index.shards[0]
+    if isinstance(index, BinaryRerankIndex):
+        return "binary"
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    sq = getattr(index, 'sq', None)
+    if sq is not None:
+        if sq.qtype == faiss.ScalarQuantizer.QT_fp16:
+            return "float16"
+        if sq.qtype == faiss.ScalarQuantizer.QT_8bit:
+            return "int8"
+    return "float32"
+
+
+def _remove_stale_files(path: str, shards: int = 0) -> None:
+    # Files of an earlier build with more shards or another layout must not be read back
+    base = Path(path)
+    for stale in base.parent.glob(base.name + ".shard-*"):
+        number = stale.name[len(base.name) + len(".shard-"):].split(".")[0]
+        if int(number) >= shards:
+            stale.unlink()
+    if shards:
+        for suffix in ("", BINARY_META_SUFFIX, RERANK_SUFFIX):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    elif os.path.exists(path + SHARDS_SUFFIX):
+        os.remove(path + SHARDS_SUFFIX)
+
+
+def write_index(index: "faiss.Index", path: str) -> None:
+    """Save an index of any type, storage and sharding.
+
+    Binary indexes also write their float16 vectors and bit thresholds next to
+    the index file. Sharded indexes write each shard to ``<path>.shard-NNN`` and
+    its global ids to ``<path>.shard-NNN.ids.npy``, and list them in the
+    ``<path>.shards.json`` manifest, written last.
+
+    Args:
+        index (faiss.Index): Index to save
+        path (str): Index file, e.g. ``<index_dir>/papers.index``
+    """
+    path = str(path)
+    if isinstance(index, ShardedIndex):
+        entries = []
+        for i, shard in enumerate(index.shards):
+            name = f"{os.path.basename(path)}.shard-{i:03d}"
+            write_index(shard, os.path.join(os.path.dirname(path), name))
+            np.save(os.path.join(os.path.dirname(path), name + SHARD_IDS_SUFFIX), index.ids[i])
+            entries.append({'file': name, 'ids': name + SHARD_IDS_SUFFIX, 'rows': shard.ntotal})
+        _remove_stale_files(path, shards=len(entries))
+        with open(path + SHARDS_SUFFIX + ".tmp", 'w') as f:
+            json.dump({'shards': entries}, f)
+        os.replace(path + SHARDS_SUFFIX + ".tmp", path + SHARDS_SUFFIX)
+        return
+    _remove_stale_files(path)
+    if isinstance(index, BinaryRerankIndex):
+        faiss.write_index_binary(index.binary, path)
+        # The vectors may be a memory map of the file being saved; writing it in place
+        # would truncate the mapping under us, so write a new file and swap it in
+        tmp_path = path + ".tmp" + RERANK_SUFFIX
+        index.write_vectors(tmp_path)
+        os.replace(tmp_path, path + RERANK_SUFFIX)
+        with open(path + BINARY_META_SUFFIX, 'w') as f:
+            json.dump({'dimension': index.d, 'rerank_factor': index.rerank_factor,
+                       'thresholds': index.thresholds.tolist()}, f)
+        return
+    faiss.write_index(index, path)
+    # A rebuilt index of another storage must not be read back as binary
+    for suffix in (BINARY_META_SUFFIX, RERANK_SUFFIX):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def read_index(path: str) -> "faiss.Index":
+    """Load an index saved by ``write_index``.
+
+    Args:
+        path (str): Index file
+
+    Returns:
+        faiss.Index: The index; binary indexes memory-map their float16 vectors
+    """
+    path = str(path)
+    if os.path.exists(path + SHARDS_SUFFIX):
+        with open(path + SHARDS_SUFFIX, 'r') as f:
+            entries = json.load(f)['shards']
+        shards = [read_index(os.path.join(os.path.dirname(path), entry['file'])) for entry in entries]
+        # Manifests written before shards had ids hold consecutive rows
+        ids = None
+        if all('ids' in entry for entry in entries):
+            ids = [np.load(os.path.join(os.path.dirname(path), entry['ids'])) for entry in entries]
+        return ShardedIndex(shards, ids=ids)
+    if not os.path.exists(path + BINARY_META_SUFFIX):
+        return faiss.read_index(path)
+    with open(path + BINARY_META_SUFFIX, 'r') as f:
+        meta = json.load(f)
+    return BinaryRerankIndex(
+        meta['dimension'],
+        thresholds=np.array(meta['thresholds'], dtype=np.float32),
+        rerank_factor=meta['rerank_factor'],
+        binary=faiss.read_index_binary(path),
+        vectors=np.load(path + RERANK_SUFFIX, mmap_mode='r'),
+    )
+
+
+def detect_index_type(index: "faiss.Index") -> str:
+    """Identify the type of a loaded FAISS index.
+
+    Args:
+        index (faiss.Index): Index returned by ``read_index``
+
+    Returns:
+        str: One of INDEX_TYPES
+    """
+    if isinstance(index, ShardedIndex):
+        index = index.shards[0]
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def set_search_params(index: "faiss.Index", nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Dict[str, Any]:
+    """Apply search-time knobs to an index, ignoring those it does not have.
+
+    Args:
+        index (faiss.Index): Index to configure
+        nprobe (Optional[int]): IVF partitions visited per query
+        ef_search (Optional[int]): HNSW candidate list size per query
+
+    Returns:
+        Dict[str, Any]: Knobs now in effect on the index
+    """
+    if isinstance(index, ShardedIndex):
+        knobs = {}
+        for shard in index.shards:
+            knobs = set_search_params(shard, nprobe, ef_search)
+        return knobs
+    index_type = detect_index_type(index)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        index.nprobe = min(nprobe or DEFAULT_NPROBE, index.nlist)
+        return {'nprobe': index.nprobe}
+    if index_type == "hnsw":
+        index.hnsw.efSearch = ef_search or DEFAULT_EF_SEARCH
+        return {'ef_search': index.hnsw.efSearch}
+    return {}
+
+
+def reconstruct_all(index: "faiss.Index") -> np.ndarray:
+    """Recover the stored vectors of an index, e.g. to rebuild it.
+
+    Vectors of IVF-PQ indexes come back with their quantization error.
+
+    Args:
+        index (faiss.Index): Index to read
+
+    Returns:
+        np.ndarray: Stored vectors, one row per index id
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def search_parameters(index: "faiss.Index", selector: "faiss.IDSelector") -> "faiss.SearchParameters":
+    """Per-call search parameters that restrict results to the ids of a selector.
+
+    The index's current nprobe/efSearch knobs are carried over. The caller
+    must keep ``selector`` alive for as long as the parameters are used.
+
+    Args:
+        index (faiss.Index): Index that will be searched
+        selector (faiss.IDSelector): Ids that may be returned
+
+    Returns:
+        faiss.SearchParameters: Parameters to pass to ``index.search``
+    """
+    index_type = detect_index_type(index)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def reconstruct_rows(index: "faiss.Index", rows: np.ndarray) -> np.ndarray:
+    """Recover the stored vectors of some rows of an index.
+
+    Args:
+        index (faiss.Index): Index to read
+        rows (np.ndarray): Ids of the rows to recover
+
+    Returns:
+        np.ndarray: Stored vectors, one row per id
+    """
+    if isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.NoMap:
+        index.make_direct_map()
+    return index.reconstruct_batch(np.ascontiguousarray(rows, dtype=np.int64))
+
+
+def filtered_search(index: "faiss.Index", queries: np.ndarray, k: int, allowed: np.ndarray):
+    """Search an index among the given ids only.
+
+    Args:
+        index (faiss.Index): Index to search
+        queries (np.ndarray): Query embeddings
+        k (int): Number of neighbours per query
+        allowed (np.ndarray): Sorted ids that may be returned
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Distances and ids, like ``faiss.Index.search``
+    """
+    if isinstance(index, ShardedIndex):
+        return index.search(queries, k, allowed=allowed)
+    selector = faiss.IDSelectorBatch(allowed)
+    return index.search(queries, k, params=search_parameters(index, selector))
@@ -0,0 +1,216 @@
+"""Compare FAISS index types on recall@k against the flat baseline and on QPS.
+
+Example:
+    python index_report.py --corpus ../data/research_papers.json --k 10 \
+        --index-types flat,ivf_flat,ivf_pq,hnsw --nprobe 1,8,32 --ef-search 16,64,256
+
+With ``--storage float32,float16,int8,binary`` it also reports the memory each
+vector storage saves and the recall it loses against float32 flat search.
+"""
+import argparse
+import json
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional
+from lazy_imports import faiss
+from document_indexer import DocumentIndexer
+from index_factory import INDEX_TYPES, STORAGE_TYPES, BinaryRerankIndex, build_index, set_search_params
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    """Fraction of the true top-k neighbours that an index returned.
+
+    Args:
+        found (np.ndarray): Ids returned by the index under test, one row per query
+        truth (np.ndarray): Ids returned by the flat baseline, one row per query
+        k (int): Cut-off
+
+    Returns:
+        float: Mean recall@k over all queries
+    """
+    hits = sum(len(set(f[:k]) & set(t[:k]) - {-1}) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def _timed_search(index: "faiss.Index", queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return ids, len(queries) / elapsed if elapsed else float("inf")
+
+
+def evaluate(embeddings: np.ndarray, queries: np.ndarray, k: int = 10,
+             index_types: List[str] = INDEX_TYPES, nprobes: List[int] = (1, 8, 32),
+             ef_searches: List[int] = (16, 64, 256),
+             index_params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Build each index type and measure it against exact search.
+
+    Args:
+        embeddings (np.ndarray): Corpus embeddings
+        queries (np.ndarray): Query embeddings
+        k (int): Number of neighbours per query
+        index_types (List[str]): Index types to evaluate
+        nprobes (List[int]): IVF nprobe values to sweep
+        ef_searches (List[int]): HNSW efSearch values to sweep
+        index_params (Optional[Dict[str, Any]]): Extra build parameters for ``build_index``
+
+    Returns:
+        List[Dict[str, Any]]: One row per index type and search setting
+    """
+    flat = build_index(embeddings, "flat")
+    flat.add(embeddings)
+    truth, flat_qps = _timed_search(flat, queries, k)
+
+    rows = []
+    for index_type in index_types:
+        if index_type == "flat":
+            rows.append({
+                'index_type': "flat", 'params': {}, 'build_s': 0.0,
+                'size_mb': len(faiss.serialize_index(flat)) / 2**20,
+                'recall': 1.0, 'qps': flat_qps,
+            })
+            continue
+
+        start = time.perf_counter()
+        index = build_index(embeddings, index_type, **(index_params or {}))
+        index.add(embeddings)
+        build_s = time.perf_counter() - start
+        size_mb = len(faiss.serialize_index(index)) / 2**20
+
+        if index_type == "hnsw":
+            settings = [{'ef_search': ef} for ef in ef_searches]
+        else:
+            settings = [{'nprobe': nprobe} for nprobe in nprobes]
+        for knobs in settings:
+            params = set_search_params(index, **knobs)
+            ids, qps = _timed_search(index, queries, k)
+            rows.append({
+                'index_type': index_type, 'params': params, 'build_s': build_s,
+                'size_mb': size_mb, 'recall': recall_at_k(ids, truth, k), 'qps': qps,
+            })
+    return rows
+
+
+def index_memory_mb(index: "faiss.Index") -> Dict[str, float]:
+    """Memory held by an index once loaded, and its size on disk.
+
+    Args:
+        index (faiss.Index): Index to measure
+
+    Returns:
+        Dict[str, float]: 'resident_mb' and 'disk_mb'; binary indexes keep only
+            their codes resident and memory-map their float16 re-ranking vectors
+    """
+    if isinstance(index, BinaryRerankIndex):
+        codes = index.binary.ntotal * index.binary.code_size
+        # Plus one float16 vector per row
+        vectors = index.ntotal * index.d * 2
+        return {'resident_mb': codes / 2**20, 'disk_mb': (codes + vectors) / 2**20}
+    size = len(faiss.serialize_index(index)) / 2**20
+    return {'resident_mb': size, 'disk_mb': size}
+
+
+def evaluate_storage(embeddings: np.ndarray, queries: np.ndarray, k: int = 10,
+                     storages: List[str] = STORAGE_TYPES, index_type: str = "flat",
+                     index_params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Measure the memory saved and recall lost by each vector storage.
+
+    Args:
+        embeddings (np.ndarray): Corpus embeddings
+        queries (np.ndarray): Query embeddings
+        k (int): Number of neighbours per query
+        storages (List[str]): Storages to evaluate
+        index_type (str): Index type built with each storage
+        index_params (Optional[Dict[str, Any]]): Extra build parameters for ``build_index``
+
+    Returns:
+        List[Dict[str, Any]]: One row per storage, recall measured against float32 flat search
+    """
+    flat = build_index(embeddings, "flat")
+    flat.add(embeddings)
+    truth, _ = _timed_search(flat, queries, k)
+    baseline_mb = index_memory_mb(flat)['resident_mb']
+
+    rows = []
+    for storage in storages:
+        start = time.perf_counter()
+        index = build_index(embeddings, index_type, storage=storage, **(index_params or {}))
+        index.add(embeddings)
+        build_s = time.perf_counter() - start
+        set_search_params(index)
+        ids, qps = _timed_search(index, queries, k)
+        memory = index_memory_mb(index)
+        rows.append({
+            'storage': storage, 'index_type': index_type, 'build_s': build_s,
+            'resident_mb': memory['resident_mb'], 'disk_mb': memory['disk_mb'],
+            'bytes_per_vector': memory['resident_mb'] * 2**20 / len(embeddings),
+            'memory_saved': 1 - memory['resident_mb'] / baseline_mb,
+            'recall': recall_at_k(ids, truth, k), 'qps': qps,
+        })
+    return rows
+
+
+def print_storage_report(rows: List[Dict[str, Any]], k: int) -> None:
+    """Print the storage evaluation rows as a table."""
+    print(f"{'storage':<8} {'index':<9} {'resident MB':>11} {'disk MB':>9} {'B/vector':>9} {'saved':>7} "
+          f"{'recall@' + str(k):>10} {'QPS':>10}")
+    for row in rows:
+        print(f"{row['storage']:<8} {row['index_type']:<9} {row['resident_mb']:>11.1f} {row['disk_mb']:>9.1f} "
+              f"{row['bytes_per_vector']:>9.0f} {row['memory_saved']:>7.1%} {row['recall']:>10.4f} {row['qps']:>10.0f}")
+
+
+def print_report(rows: List[Dict[str, Any]], k: int) -> None:
+    """Print the evaluation rows as a table."""
+    print(f"{'index':<10} {'params':<18} {'build s':>8} {'size MB':>9} {'recall@' + str(k):>10} {'QPS':>10}")
+    for row in rows:
+        params = ", ".join(f"{name}={value}" for name, value in row['params'].items()) or "-"
+        print(f"{row['index_type']:<10} {params:<18} {row['build_s']:>8.2f} {row['size_mb']:>9.1f} "
+              f"{row['recall']:>10.4f} {row['qps']:>10.0f}")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default="../data/research_papers.json")
+    parser.add_argument("--queries", help="Text file with one query per line; defaults to sampled corpus papers")
+    parser.add_argument("--num-queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--nprobe", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--ef-search", type=_int_list, default=[16, 64, 256])
+    parser.add_argument("--storage", help="Vector storages to compare, e.g. float32,float16,int8,binary")
+    parser.add_argument("--storage-index-type", default="flat")
+    parser.add_argument("--cache-dir", default="../data/embedding_cache")
+    parser.add_argument("--json", help="Also write the rows to this JSON file")
+    args = parser.parse_args()
+
+    indexer = DocumentIndexer(cache_dir=args.cache_dir)
+    indexer.load_documents(args.corpus)
+    embeddings = indexer.generate_embeddings()
+
+    if args.queries:
+        with open(args.queries, 'r') as f:
+            queries = indexer.generate_embeddings([line.strip() for line in f if line.strip()])
+    else:
+        rng = np.random.default_rng(0)
+        rows = rng.choice(len(embeddings), min(args.num_queries, len(embeddings)), replace=False)
+        queries = np.ascontiguousarray(embeddings[rows])
+
+    rows = evaluate(embeddings, queries, args.k, args.index_types.split(","), args.nprobe, args.ef_search)
+    print_report(rows, args.k)
+    storage_rows = []
+    if args.storage:
+        storage_rows = evaluate_storage(embeddings, queries, args.k, args.storage.split(","), args.storage_index_type)
+        print()
+        print_storage_report(storage_rows, args.k)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'k': args.k, 'corpus_size': len(embeddings), 'queries': len(queries), 'rows': rows,
+                       'storage_rows': storage_rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Deferred imports and model construction for the search path.
+
+Importing faiss and sentence_transformers, and loading the e5-large model, is
+most of the start-up time of a search process. Everything here is resolved on
+first use instead, so processes that only serve cached queries or inspect an
+index never pay for the parts they do not touch.
+"""
+import importlib
+import threading
+import time
+from typing import Dict, Any, Optional
+
+# Seconds spent importing each heavy module, filled in as they are first used
+IMPORT_TIMES: Dict[str, float] = {}
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        """Stand-in for a module that is imported on first attribute access.
+
+        Args:
+            name (str): Name of the module to import
+        """
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """Import the module now if it has not been imported yet."""
+        if self._module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)
+            IMPORT_TIMES.setdefault(self._name, time.perf_counter() - start)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+
+faiss = LazyModule("faiss")
+sentence_transformers = LazyModule("sentence_transformers")
+
+
+class LazySentenceTransformer:
+    def __init__(self, model_name: str):
+        """Sentence-transformer model that is only loaded when first used.
+
+        Args:
+            model_name (str): Name of the sentence-transformer model to load
+        """
+        self.model_name = model_name
+        self.load_seconds: Optional[float] = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Load the model now if it has not been loaded yet."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    sentence_transformers.load()
+                    start = time.perf_counter()
+                    self._model = sentence_transformers.SentenceTransformer(self.model_name)
+                    self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
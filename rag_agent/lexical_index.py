@@ -0,0 +1,199 @@
+import json
+import math
+import re
+import numpy as np
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable, Optional, Sequence
+from pathlib import Path
+from segments import drop_segments, segment_dirs, write_segment
+
+LEXICAL_DIR = "lexical"
+
+# Hyphenated and dotted terms such as "chain-of-thought", "gpt-3.5" or arXiv ids
+# like "2401.12345" are kept whole, and their parts are indexed as well
+TOKEN_RE = re.compile(r"\w+(?:[-.]\w+)*")
+PART_RE = re.compile(r"[-.]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms for the inverted index.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: Terms, with compound terms followed by their parts
+    """
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        if PART_RE.search(token):
+            terms.extend(part for part in PART_RE.split(token) if part)
+    return terms
+
+
+class LexicalIndex:
+    def __init__(self, terms: Dict[str, int], offsets: np.ndarray, postings: np.ndarray,
+                 frequencies: np.ndarray, doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75,
+                 segments: Sequence[Tuple[int, "LexicalIndex"]] = ()):
+        """BM25 inverted index over the rendered documents.
+
+        Postings of term ``t`` are ``postings[offsets[t]:offsets[t + 1]]``, the
+        ids of the documents containing it, with matching term frequencies.
+        Documents appended by incremental updates are indexed in ``segments``,
+        whose ids start at their first document; a search scores every segment
+        with the document counts and lengths of all of them.
+
+        Args:
+            terms (Dict[str, int]): Term to term id
+            offsets (np.ndarray): Start of each term's postings, plus the end of the last
+            postings (np.ndarray): Document ids of all postings lists, concatenated
+            frequencies (np.ndarray): Term frequency of each posting
+            doc_lengths (np.ndarray): Number of terms in each document
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 document length normalization
+            segments (Sequence[Tuple[int, LexicalIndex]]): (first document id, index) of appended documents
+        """
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.frequencies = frequencies
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.segments = list(segments)
+        self._parts = [(0, self)] + self.segments
+        self.num_docs = sum(len(part.doc_lengths) for _, part in self._parts)
+        total_length = sum(float(part.doc_lengths.sum()) for _, part in self._parts)
+        self.avg_length = total_length / self.num_docs if self.num_docs else 0.0
+
+    @classmethod
+    def build(cls, documents: Iterable[str]) -> "LexicalIndex":
+        """Build the index from documents, whose positions become their ids.
+
+        Args:
+            documents (Iterable[str]): Rendered documents
+
+        Returns:
+            LexicalIndex: The built index
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = []
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        terms = {term: term_id for term_id, term in enumerate(sorted(postings))}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for term, term_id in terms.items():
+            offsets[term_id + 1] = len(postings[term])
+        offsets = np.cumsum(offsets)
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.float32)
+        for term, term_id in terms.items():
+            entries = np.asarray(postings[term])
+            doc_ids[offsets[term_id]:offsets[term_id + 1]] = entries[:, 0]
+            frequencies[offsets[term_id]:offsets[term_id + 1]] = entries[:, 1]
+        return cls(terms, offsets, doc_ids, frequencies, np.asarray(doc_lengths, dtype=np.float32))
+
+    def save(self, save_dir: str) -> None:
+        """Save the index next to the FAISS index.
+
+        Args:
+            save_dir (str): Directory to save the index in
+        """
+        save_dir = Path(save_dir)
+        save_dir.mkdir(parents=True, exist_ok=True)
+        drop_segments(save_dir)
+        with open(save_dir / "terms.json", 'w') as f:
+            json.dump(sorted(self.terms, key=self.terms.get), f)
+        np.save(save_dir / "offsets.npy", self.offsets)
+        np.save(save_dir / "postings.npy", self.postings)
+        np.save(save_dir / "frequencies.npy", self.frequencies)
+        np.save(save_dir / "doc_lengths.npy", self.doc_lengths)
+        for first_doc, segment in self.segments:
+            write_segment(save_dir, first_doc, segment.save)
+
+    @classmethod
+    def save_segment(cls, save_dir: str, documents: Iterable[str], first_doc: int) -> None:
+        """Index documents appended to a saved index as a new segment, without loading the index.
+
+        Args:
+            save_dir (str): Directory the index was saved in
+            documents (Iterable[str]): Rendered documents appended to the index
+            first_doc (int): Id of the first of them
+        """
+        write_segment(save_dir, first_doc, cls.build(documents).save)
+
+    @classmethod
+    def load(cls, save_dir: str) -> "LexicalIndex":
+        """Load a saved index, memory-mapping its postings.
+
+        Args:
+            save_dir (str): Directory the index was saved in
+
+        Returns:
+            LexicalIndex: The loaded index
+        """
+        save_dir = Path(save_dir)
+        with open(save_dir / "terms.json", 'r') as f:
+            terms = {term: term_id for term_id, term in enumerate(json.load(f))}
+        return cls(
+            terms,
+            np.load(save_dir / "offsets.npy"),
+            np.load(save_dir / "postings.npy", mmap_mode='r'),
+            np.load(save_dir / "frequencies.npy", mmap_mode='r'),
+            np.load(save_dir / "doc_lengths.npy"),
+            segments=[(first_doc, cls.load(path)) for first_doc, path in segment_dirs(save_dir)],
+        )
+
+    def search(self, query: str, top_k: int = 3, exclude: Optional[Iterable[int]] = None,
+               allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Rank documents for a query with BM25.
+
+        Args:
+            query (str): Search query
+            top_k (int): Number of results to return
+            exclude (Optional[Iterable[int]]): Document ids never to return
+            allowed (Optional[np.ndarray]): Only return these document ids
+
+        Returns:
+            List[Tuple[int, float]]: (document id, BM25 score), best first
+        """
+        doc_parts, score_parts = [], []
+        for term in set(tokenize(query)):
+            docs, tf, lengths = [], [], []
+            for first_doc, part in self._parts:
+                term_id = part.terms.get(term)
+                if term_id is None:
+                    continue
+                start, end = part.offsets[term_id], part.offsets[term_id + 1]
+                part_docs = np.asarray(part.postings[start:end], dtype=np.int64)
+                docs.append(part_docs + first_doc)
+                tf.append(np.asarray(part.frequencies[start:end]))
+                lengths.append(part.doc_lengths[part_docs])
+            if not docs:
+                continue
+            docs, tf, lengths = np.concatenate(docs), np.concatenate(tf), np.concatenate(lengths)
+            idf = math.log(1 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths / self.avg_length)
+            doc_parts.append(docs)
+            score_parts.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not doc_parts:
+            return []
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if exclude:
+            keep = ~np.isin(docs, np.fromiter(exclude, dtype=np.int64))
+            docs, scores = docs[keep], scores[keep]
+        if allowed is not None:
+            keep = np.isin(docs, allowed)
+            docs, scores = docs[keep], scores[keep]
+        if len(docs) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            docs, scores = docs[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(docs[i]), float(scores[i])) for i in order]
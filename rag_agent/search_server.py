@@ -0,0 +1,290 @@
+"""Local asyncio search server with dynamic micro-batching.
+
+Concurrent requests are queued and grouped into micro-batches of at most
+``max_batch_size`` queries, waiting no longer than ``max_wait_ms`` for a batch
+to fill. Each batch is encoded and searched with one ``search_many`` call on a
+worker thread, so one model instance serves many clients without blocking the
+event loop. While all workers are busy, requests keep queueing and the next
+batch grows accordingly.
+
+Run over TCP or a Unix socket:
+    python search_server.py --index-dir ../data/index --port 8765
+    python search_server.py --index-dir ../data/index --unix /tmp/rag_search.sock
+
+Endpoints:
+    POST /search  {"query": "...", "top_k": 3, "filters": {"year": "2024"}}  ->  {"results": [...]}
+    GET  /stats                                 ->  queue depth and batch-size stats
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from vector_search_agent import VectorSearchAgent
+
+
+class MicroBatcher:
+    def __init__(self, agent: VectorSearchAgent, max_batch_size: int = 64, max_wait_ms: float = 5.0, workers: int = 1):
+        """Group concurrent search requests into batches for the agent.
+
+        Args:
+            agent (VectorSearchAgent): Agent with a loaded index
+            max_batch_size (int): Maximum number of queries per batch
+            max_wait_ms (float): Maximum time to wait for a batch to fill
+            workers (int): Number of batches searched in parallel
+        """
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        self.queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.requests = 0
+        self.batches = 0
+        self.batches_in_flight = 0
+        self.batch_sizes = Counter()
+        self.search_seconds = 0.0
+
+    def start(self) -> None:
+        """Start collecting batches on the running event loop."""
+        self.queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop batching, shut down the worker pools and persist cached query embeddings."""
+        if self._task is not None:
+            self._task.cancel()
+        self.executor.shutdown(wait=True)
+        self.agent.close()
+
+    async def search(self, query: str, top_k: int = 3, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Queue a query and wait for the batch that answers it.
+
+        Args:
+            query (str): Search query
+            top_k (int): Number of results to return
+            filters (Optional[Dict[str, Any]]): Metadata filters, see ``VectorSearchAgent.select``
+
+        Returns:
+            List[Dict[str, Any]]: List of top_k most similar documents with scores
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await self.queue.put((query, top_k, filters or None, future))
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[str, int, Optional[Dict[str, Any]], asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            # Wait for a free worker first, so requests pile up into larger batches under load
+            await self._slots.acquire()
+            batch = await self._next_batch()
+            asyncio.get_running_loop().create_task(self._process(batch))
+
+    def _search_batch(self, batch: List[Tuple[str, int, Optional[Dict[str, Any]], asyncio.Future]]) -> Tuple[List[Any], float]:
+        # Runs on a worker thread, so it reports its time instead of updating the counters
+        start = time.perf_counter()
+        # Queries sharing the same filters are searched together
+        groups: Dict[str, List[int]] = {}
+        for i, (_, _, filters, _) in enumerate(batch):
+            groups.setdefault(json.dumps(filters, sort_keys=True), []).append(i)
+        results: List[Any] = [None] * len(batch)
+        for rows in groups.values():
+            top_k = max(batch[i][1] for i in rows)
+            try:
+                hits = self.agent.search_many(
+                    [batch[i][0] for i in rows], top_k, batch_size=len(rows), filters=batch[rows[0]][2]
+                )
+                for i, query_hits in zip(rows, hits):
+                    results[i] = query_hits[:batch[i][1]]
+            except Exception as exc:
+                for i in rows:
+                    results[i] = exc
+        return results, time.perf_counter() - start
+
+    async def _process(self, batch: List[Tuple[str, int, Optional[Dict[str, Any]], asyncio.Future]]) -> None:
+        self.batches += 1
+        self.batches_in_flight += 1
+        self.batch_sizes[len(batch)] += 1
+        try:
+            results, seconds = await asyncio.get_running_loop().run_in_executor(self.executor, self._search_batch, batch)
+            self.search_seconds += seconds
+        except Exception as exc:
+            results = [exc] * len(batch)
+        try:
+            for (_, _, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self.batches_in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report queueing and batching statistics.
+
+        Returns:
+            Dict[str, Any]: Queue depth, request and batch counts and batch-size distribution
+        """
+        batched = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'batches_in_flight': self.batches_in_flight,
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': batched / self.batches if self.batches else 0.0,
+            'max_batch_size': max(self.batch_sizes, default=0),
+            'batch_size_histogram': dict(sorted(self.batch_sizes.items())),
+            'search_seconds': self.search_seconds,
+        }
+
+
+def _json_default(value: Any) -> Any:
+    # Scores and ids come back from FAISS as numpy scalars
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SearchServer:
+    def __init__(self, batcher: MicroBatcher):
+        """Minimal HTTP/1.1 front end for a ``MicroBatcher``.
+
+        Args:
+            batcher (MicroBatcher): Batcher that answers search requests
+        """
+        self.batcher = batcher
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[str, Dict[str, Any]]:
+        if method == "GET" and path == "/stats":
+            return "200 OK", self.batcher.stats()
+        if method != "POST" or path != "/search":
+            return "404 Not Found", {'error': f"No route for {method} {path}"}
+        try:
+            request = json.loads(body or b"{}")
+            query = request['query']
+            top_k = int(request.get('top_k', 3))
+            filters = request.get('filters')
+        except (ValueError, KeyError, TypeError) as exc:
+            return "400 Bad Request", {'error': f"Invalid search request: {exc}"}
+        try:
+            results = await self.batcher.search(query, top_k, filters)
+        except ValueError as exc:
+            return "400 Bad Request", {'error': str(exc)}
+        return "200 OK", {'results': results}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                try:
+                    status, payload = await self._route(method, path, body)
+                except Exception as exc:
+                    status, payload = "500 Internal Server Error", {'error': str(exc)}
+                data = json.dumps(payload, default=_json_default).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(agent: VectorSearchAgent, host: str = "127.0.0.1", port: int = 8765,
+                unix_path: Optional[str] = None, max_batch_size: int = 64,
+                max_wait_ms: float = 5.0, workers: int = 1) -> None:
+    """Serve searches until cancelled.
+
+    Args:
+        agent (VectorSearchAgent): Agent with a loaded index
+        host (str): Interface to listen on
+        port (int): TCP port to listen on
+        unix_path (Optional[str]): Listen on this Unix socket instead of TCP
+        max_batch_size (int): Maximum number of queries per batch
+        max_wait_ms (float): Maximum time to wait for a batch to fill
+        workers (int): Number of batches searched in parallel
+    """
+    batcher = MicroBatcher(agent, max_batch_size, max_wait_ms, workers)
+    batcher.start()
+    server = SearchServer(batcher)
+    if unix_path:
+        listener = await asyncio.start_unix_server(server.handle, path=unix_path)
+        print(f"🔌 Serving searches on unix:{unix_path}")
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+        print(f"🔌 Serving searches on http://{host}:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-batching search server for the RAG index")
+    parser.add_argument("--index-dir", default="../data/index")
+    parser.add_argument("--cache-dir", default="../data/embedding_cache")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mode", default="vector", help="vector, lexical, hybrid or auto")
+    args = parser.parse_args()
+
+    agent = VectorSearchAgent(cache_dir=args.cache_dir, search_mode=args.mode)
+    agent.warm(args.index_dir)
+    try:
+        asyncio.run(serve(agent, args.host, args.port, args.unix,
+                          args.max_batch_size, args.max_wait_ms, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Append-only segments of the search-side indexes.
+
+An incremental update indexes only the rows it appends and saves them as a
+segment directory, named after its first row, under ``<index dir>/segments``.
+Loading an index reads its segments after the base files, in row order, and a
+full save of the index drops them.
+"""
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+SEGMENTS_DIR = "segments"
+
+
+def segment_dirs(save_dir: str) -> List[Tuple[int, Path]]:
+    """List the segments of a saved index.
+
+    Args:
+        save_dir (str): Directory of the index
+
+    Returns:
+        List[Tuple[int, Path]]: (first row, segment directory), in row order
+    """
+    root = Path(save_dir) / SEGMENTS_DIR
+    if not root.exists():
+        return []
+    return sorted((int(path.name), path) for path in root.iterdir() if path.is_dir() and path.name.isdigit())
+
+
+def write_segment(save_dir: str, first_row: int, save: Callable[[Path], None]) -> None:
+    """Save a segment and move it into place once it is complete.
+
+    Args:
+        save_dir (str): Directory of the index
+        first_row (int): First row the segment holds
+        save (Callable[[Path], None]): Writes the segment into the directory it is given
+    """
+    root = Path(save_dir) / SEGMENTS_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    final = root / f"{first_row:012d}"
+    tmp = root / f".tmp-{first_row:012d}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    save(tmp)
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(tmp, final)
+
+
+def drop_segments(save_dir: str, from_row: int = 0) -> None:
+    """Delete the segments starting at or after ``from_row``, all of them by default.
+
+    Args:
+        save_dir (str): Directory of the index
+        from_row (int): First row to drop
+    """
+    for first_row, path in segment_dirs(save_dir):
+        if first_row >= from_row:
+            shutil.rmtree(path)
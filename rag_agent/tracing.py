@@ -0,0 +1,13 @@
+"""Tracing for the RAG agent's flat imports.
+
+Re-exports the repo-level ``instrumentation`` module, so spans recorded here
+land in the same histograms and trace file as the agents' and tools' spans.
+"""
+import sys
+from pathlib import Path
+
+_repo_root = str(Path(__file__).resolve().parent.parent)
+if _repo_root not in sys.path:
+    sys.path.append(_repo_root)
+
+from instrumentation import disable, enable, is_enabled, report, reset, span, summary, traced  # noqa: E402,F401
@@ -1,66 +1,417 @@
 import json
+import re
+import time
 import numpy as np
-from typing import List, Dict, Any, Tuple
-import sentence_transformers
-import faiss
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
 from pathlib import Path
+from lazy_imports import IMPORT_TIMES, faiss, LazySentenceTransformer
+from embedding_cache import EmbeddingCache
+from index_factory import ShardedIndex, detect_index_type, detect_storage, filtered_search, read_index, set_search_params, reconstruct_rows
+from document_store import load_documents_and_metadata
+from lexical_index import LEXICAL_DIR, LexicalIndex
+from attribute_index import ATTRIBUTE_DIR, AttributeIndex
+from tracing import span
+
+SEARCH_MODES = ("vector", "lexical", "hybrid", "auto")
+
+# Queries that name something exactly: quoted phrases and arXiv ids
+EXACT_QUERY_RE = re.compile(r'^\s*".+"\s*$|\b\d{4}\.\d{4,5}(v\d+)?\b')
 
 class VectorSearchAgent:
-    def __init__(self, model_name: str = "intfloat/multilingual-e5-large-instruct"):
+    def __init__(self, model_name: str = "intfloat/multilingual-e5-large-instruct",
+                 cache_dir: Optional[str] = None, cache_size: int = 100_000,
+                 search_mode: str = "vector", hybrid_alpha: float = 0.5, hybrid_candidates: int = 50,
+                 exact_filter_limit: int = 4096, chunk_overfetch: int = 5, shard_workers: Optional[int] = None):
         """Initialize the vector search agent.
         
         Args:
             model_name (str): Name of the sentence-transformer model to use
+            cache_dir (Optional[str]): Directory of the on-disk embedding cache, disabled if None
+            cache_size (int): Maximum number of embeddings kept in the cache
+            search_mode (str): Default retrieval mode, one of "vector", "lexical", "hybrid" or "auto"
+            hybrid_alpha (float): Weight of the vector score in hybrid mode, BM25 gets the rest
+            hybrid_candidates (int): Candidates fetched from each retriever before fusing
+            exact_filter_limit (int): Filters matching at most this many documents are
+                answered by exact search over just those documents
+            chunk_overfetch (int): On chunk indexes, chunk hits fetched per requested
+                paper before collapsing them to their parent papers
+            shard_workers (Optional[int]): Threads searching the shards of a sharded
+                index, defaults to one per shard up to the core count
         """
-        self.model = sentence_transformers.SentenceTransformer(model_name)
+        # Loaded on first cache miss; call warm() to pay for it up front
+        self.model = LazySentenceTransformer(model_name)
+        self.embedding_cache = EmbeddingCache(cache_dir, model_name, cache_size) if cache_dir else None
         self.index = None
+        self.index_type = None
+        self.storage = None
+        self.search_params = {}
         self.documents = []
         self.metadata = []
+        self.tombstones = set()
+        self._tombstone_rows = np.zeros(0, dtype=np.int64)
+        self.lexical_index = None
+        self.attribute_index = None
+        self.exact_filter_limit = exact_filter_limit
+        self.search_mode = search_mode
+        self.hybrid_alpha = hybrid_alpha
+        self.hybrid_candidates = hybrid_candidates
+        self.chunked = False
+        self.chunk_overfetch = chunk_overfetch
+        self.shard_workers = shard_workers
+        self.timings = {}
         
-    def load_index(self, index_dir: str) -> None:
+    def load_index(self, index_dir: str, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
         """Load the FAISS index and metadata from disk.
         
         Args:
             index_dir (str): Directory containing the index and metadata
+            nprobe (Optional[int]): IVF partitions visited per query
+            ef_search (Optional[int]): HNSW candidate list size per query
         """
         index_dir = Path(index_dir)
         
         # Load FAISS index
-        self.index = faiss.read_index(str(index_dir / "papers.index"))
+        faiss.load()
+        start = time.perf_counter()
+        if isinstance(self.index, ShardedIndex):
+            # The search threads of a replaced index would otherwise outlive it
+            self.index.close()
+        self.index = read_index(str(index_dir / "papers.index"))
+        self.index_type = detect_index_type(self.index)
+        self.storage = detect_storage(self.index)
+        if isinstance(self.index, ShardedIndex) and self.shard_workers:
+            self.index.workers = self.shard_workers
+        self.set_search_params(nprobe, ef_search)
+        self.timings['index_load'] = time.perf_counter() - start
+        
+        # Map documents and metadata; rows are only decoded when returned as hits
+        start = time.perf_counter()
+        self.documents, self.metadata = load_documents_and_metadata(index_dir)
+        self.timings['metadata_load'] = time.perf_counter() - start
+        
+        # BM25 index over the same documents, when the index was built with one
+        self.lexical_index = None
+        if (index_dir / LEXICAL_DIR).exists():
+            self.lexical_index = LexicalIndex.load(index_dir / LEXICAL_DIR)
+        
+        # Sorted-id indexes over year, month, technique_type and authors for filtered search
+        self.attribute_index = None
+        if (index_dir / ATTRIBUTE_DIR).exists():
+            self.attribute_index = AttributeIndex.load(index_dir / ATTRIBUTE_DIR)
+
+        # Rows of changed or deleted papers left behind by incremental updates
+        self.tombstones = set()
+        self.chunked = False
+        manifest_path = index_dir / "manifest.json"
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            self.tombstones = set(manifest['tombstones'])
+            # Full-text indexes built by chunked_ingest hold several rows per paper
+            self.chunked = manifest.get('chunked', False)
+        self._tombstone_rows = np.array(sorted(self.tombstones), dtype=np.int64)
+            
+    def warm(self, index_dir: Optional[str] = None) -> Dict[str, float]:
+        """Pre-warm the agent so the first query does not pay start-up costs.
+        
+        Loads the model and runs one throwaway encode, and loads the index
+        when a directory is given.
+        
+        Args:
+            index_dir (Optional[str]): Directory containing the index and metadata
+            
+        Returns:
+            Dict[str, float]: Start-up time breakdown, see ``startup_timings``
+        """
+        if index_dir is not None:
+            self.load_index(index_dir)
+        self.model.encode(["warm-up"])
+        return self.startup_timings()
+    
+    def close(self) -> None:
+        """Stop the threads searching a sharded index and persist cached query embeddings."""
+        if isinstance(self.index, ShardedIndex):
+            self.index.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+    
+    def startup_timings(self) -> Dict[str, float]:
+        """Seconds spent on each start-up step so far.
+        
+        Returns:
+            Dict[str, float]: Time spent on imports, model load, index load and metadata load
+        """
+        return {
+            'import': sum(IMPORT_TIMES.values(), 0.0),
+            'model_load': getattr(self.model, 'load_seconds', None) or 0.0,
+            'index_load': self.timings.get('index_load', 0.0),
+            'metadata_load': self.timings.get('metadata_load', 0.0),
+        }
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Dict[str, Any]:
+        """Tune the recall/latency tradeoff of the loaded index.
+        
+        Knobs that do not apply to the index type are ignored.
         
-        # Load metadata
-        with open(index_dir / "metadata.json", 'r') as f:
-            data = json.load(f)
-            self.documents = data['documents']
-            self.metadata = data['metadata']
+        Args:
+            nprobe (Optional[int]): IVF partitions visited per query
+            ef_search (Optional[int]): HNSW candidate list size per query
             
-    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        Returns:
+            Dict[str, Any]: Knobs now in effect
+        """
+        self.search_params = set_search_params(self.index, nprobe, ef_search)
+        return self.search_params
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed a batch of queries in a single model call.
+        
+        Args:
+            queries (List[str]): Search queries
+            
+        Returns:
+            np.ndarray: float32 query embeddings, one row per query
+        """
+        with span("embed.encode", texts=len(queries)):
+            if self.embedding_cache is not None:
+                embeddings = self.embedding_cache.encode(queries, self.model.encode)
+            else:
+                embeddings = self.model.encode(queries)
+        return embeddings.astype(np.float32)
+    
+    def _dense_hits(self, query_embeddings: np.ndarray, top_k: int,
+                    allowed: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        if allowed is not None:
+            return self._filtered_dense_hits(query_embeddings, top_k, allowed)
+        
+        # Over-fetch a little to skip tombstoned rows, then search deeper only
+        # for the queries that still come back short
+        ntotal = self.index.ntotal
+        fetch_k = min(2 * top_k if self.tombstones else top_k, ntotal)
+        batch_hits = [None] * len(query_embeddings)
+        pending = np.arange(len(query_embeddings))
+        while True:
+            with span("faiss.search", queries=len(pending), k=fetch_k):
+                distances, indices = self.index.search(query_embeddings[pending], fetch_k)
+            short = []
+            for query, hits in zip(pending, self._collect_hits(distances, indices, top_k)):
+                batch_hits[query] = hits
+                if len(hits) < top_k:
+                    short.append(query)
+            if not short or fetch_k >= ntotal:
+                return batch_hits
+            pending = np.array(short)
+            fetch_k = min(2 * fetch_k, ntotal)
+    
+    def _collect_hits(self, distances: np.ndarray, indices: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        batch_hits = []
+        for row_distances, row_indices in zip(distances, indices):
+            hits = []
+            for distance, index in zip(row_distances, row_indices):
+                if index < 0 or index in self.tombstones:
+                    continue
+                if len(hits) == top_k:
+                    break
+                hits.append((int(index), 1 / (1 + float(distance))))  # Convert distance to similarity score
+            batch_hits.append(hits)
+        return batch_hits
+    
+    def _filtered_dense_hits(self, query_embeddings: np.ndarray, top_k: int, allowed: np.ndarray) -> List[List[Tuple[int, float]]]:
+        if len(allowed) == 0:
+            return [[] for _ in query_embeddings]
+        fetch_k = min(top_k, len(allowed))
+        
+        if len(allowed) <= self.exact_filter_limit:
+            # Few matches: exact distances to just those vectors beat any index traversal
+            with span("faiss.exact_search", queries=len(query_embeddings), candidates=len(allowed)):
+                vectors = reconstruct_rows(self.index, allowed)
+                distances = (
+                    (query_embeddings ** 2).sum(axis=1)[:, None]
+                    + (vectors ** 2).sum(axis=1)[None, :]
+                    - 2 * query_embeddings @ vectors.T
+                )
+                best = np.argpartition(distances, fetch_k - 1, axis=1)[:, :fetch_k]
+                best_distances = np.take_along_axis(distances, best, axis=1)
+                order = np.argsort(best_distances, axis=1, kind="stable")
+            return self._collect_hits(
+                np.maximum(np.take_along_axis(best_distances, order, axis=1), 0),
+                allowed[np.take_along_axis(best, order, axis=1)],
+                top_k,
+            )
+        
+        # Many matches: let FAISS skip everything outside the filter while it searches
+        with span("faiss.filtered_search", queries=len(query_embeddings), candidates=len(allowed)):
+            distances, indices = filtered_search(self.index, query_embeddings, fetch_k, allowed)
+        return self._collect_hits(distances, indices, top_k)
+    
+    def _lexical_hits(self, query: str, top_k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        hits = self.lexical_index.search(query.strip().strip('"'), top_k, exclude=self.tombstones, allowed=allowed)
+        # Squash unbounded BM25 scores into (0, 1) like the vector similarity
+        return [(index, score / (1 + score)) for index, score in hits]
+    
+    def _result(self, index: int, score: float) -> Dict[str, Any]:
+        return {
+            'score': score,
+            'document': self.documents[index],
+            'metadata': self.metadata[index]
+        }
+    
+    def _collapse(self, hits: List[Tuple[int, float]], top_k: int) -> List[Tuple[int, float]]:
+        # Keep the best-scoring chunk of each paper; hits arrive best first
+        seen, collapsed = set(), []
+        for index, score in hits:
+            parent = self.metadata[index].get('parent_id', index)
+            if parent in seen:
+                continue
+            seen.add(parent)
+            collapsed.append((index, score))
+            if len(collapsed) == top_k:
+                break
+        return collapsed
+    
+    @staticmethod
+    def _fuse(dense: List[Tuple[int, float]], lexical: List[Tuple[int, float]], alpha: float, top_k: int) -> List[Tuple[int, float]]:
+        # Min-max normalize each candidate list, then blend the two scores
+        def normalize(hits):
+            if not hits:
+                return {}
+            scores = [score for _, score in hits]
+            low, span = min(scores), (max(scores) - min(scores)) or 1.0
+            return {index: (score - low) / span if len(hits) > 1 else 1.0 for index, score in hits}
+        dense_scores, lexical_scores = normalize(dense), normalize(lexical)
+        fused = {
+            index: alpha * dense_scores.get(index, 0.0) + (1 - alpha) * lexical_scores.get(index, 0.0)
+            for index in {**dense_scores, **lexical_scores}
+        }
+        return sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+    
+    def resolve_mode(self, query: str, mode: Optional[str] = None) -> str:
+        """Pick the retrieval mode for a query.
+        
+        In "auto" mode, quoted phrases and arXiv ids are answered by the
+        lexical index alone, skipping the transformer, and all other queries
+        use hybrid retrieval.
+        
+        Args:
+            query (str): Search query
+            mode (Optional[str]): "vector", "lexical", "hybrid" or "auto", defaults to the agent's mode
+            
+        Returns:
+            str: "vector", "lexical" or "hybrid"
+        """
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+        if mode == "vector" or self.lexical_index is None:
+            return "vector"
+        if mode == "auto":
+            return "lexical" if EXACT_QUERY_RE.search(query) else "hybrid"
+        return mode
+    
+    def select(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Find the documents matching metadata filters.
+        
+        Args:
+            filters (Dict[str, Any]): Field to a value, a list of accepted values
+                or a numeric range such as ``{"gte": 2024}``, e.g.
+                ``{"year": "2024", "technique_type": "Prompt Engineering Technique"}``
+                
+        Returns:
+            np.ndarray: Sorted ids of the matching live documents
+        """
+        if self.attribute_index is None:
+            raise ValueError("This index has no attribute indexes; rebuild it to use filters")
+        selected = self.attribute_index.select(filters)
+        # Incremental updates leave tombstoned rows in the attribute indexes
+        if self.tombstones:
+            selected = selected[~np.isin(selected, self._tombstone_rows)]
+        return selected
+    
+    def _search_batch(self, queries: List[str], top_k: int, mode: Optional[str],
+                      filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        allowed = self.select(filters) if filters else None
+        modes = [self.resolve_mode(query, mode) for query in queries]
+        # Chunk indexes return several rows per paper, so fetch enough to fill top_k papers
+        wanted = top_k * self.chunk_overfetch if self.chunked else top_k
+        pool = max(wanted, self.hybrid_candidates) if "hybrid" in modes else wanted
+        
+        # Encode every query that needs an embedding in one model and FAISS call
+        dense_rows = [i for i, query_mode in enumerate(modes) if query_mode != "lexical"]
+        dense = {}
+        if dense_rows:
+            embeddings = self.encode_queries([queries[i] for i in dense_rows])
+            dense = dict(zip(dense_rows, self._dense_hits(embeddings, pool, allowed)))
+        
+        batch_results = []
+        for i, (query, query_mode) in enumerate(zip(queries, modes)):
+            if query_mode == "vector":
+                hits = dense[i][:wanted]
+            elif query_mode == "lexical":
+                hits = self._lexical_hits(query, wanted, allowed)
+            else:
+                hits = self._fuse(dense[i], self._lexical_hits(query, pool, allowed), self.hybrid_alpha, wanted)
+            hits = self._collapse(hits, top_k) if self.chunked else hits
+            batch_results.append([self._result(index, score) for index, score in hits])
+        return batch_results
+    
+    def search_embeddings(self, query_embeddings: np.ndarray, top_k: int = 3) -> List[List[Dict[str, Any]]]:
+        """Search the index for a batch of query embeddings with one FAISS call.
+        
+        Args:
+            query_embeddings (np.ndarray): Query embeddings, one row per query
+            top_k (int): Number of results to return per query
+            
+        Returns:
+            List[List[Dict[str, Any]]]: top_k most similar documents for each query
+        """
+        wanted = top_k * self.chunk_overfetch if self.chunked else top_k
+        return [
+            [self._result(index, score) for index, score in (self._collapse(hits, top_k) if self.chunked else hits)]
+            for hits in self._dense_hits(query_embeddings, wanted)
+        ]
+    
+    def search(self, query: str, top_k: int = 3, mode: Optional[str] = None,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Search for documents similar to the query.
         
         Args:
             query (str): Search query
             top_k (int): Number of results to return
+            mode (Optional[str]): "vector", "lexical", "hybrid" or "auto", defaults to the agent's mode
+            filters (Optional[Dict[str, Any]]): Metadata filters, see ``select``
             
         Returns:
             List[Dict[str, Any]]: List of top_k most similar documents with scores
         """
-        # Generate query embedding
-        query_embedding = self.model.encode([query])
-        query_embedding = query_embedding.astype(np.float32)
-        
-        # Search in FAISS index
-        distances, indices = self.index.search(query_embedding, top_k)
-        
-        # Format results
-        results = []
-        for score, index in zip(distances[0], indices[0]):
-            results.append({
-                'score': 1 / (1 + score),  # Convert distance to similarity score
-                'document': self.documents[index],
-                'metadata': self.metadata[index]
-            })
+        return self._search_batch([query], top_k, mode, filters)[0]
+    
+    def search_many(self, queries: Iterable[str], top_k: int = 3, batch_size: int = 256,
+                    mode: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Search for many queries, encoding and searching them in batches.
+        
+        Queries are consumed lazily, so a generator over a huge query file can
+        be passed in and only one batch is held in memory at a time. Results
+        are yielded in query order as each batch completes; wrap the call in
+        ``list()`` to collect them all.
+        
+        Args:
+            queries (Iterable[str]): Search queries
+            top_k (int): Number of results to return per query
+            batch_size (int): Number of queries encoded and searched per batch
+            mode (Optional[str]): "vector", "lexical", "hybrid" or "auto", defaults to the agent's mode
+            filters (Optional[Dict[str, Any]]): Metadata filters applied to every query, see ``select``
             
-        return results
+        Yields:
+            List[Dict[str, Any]]: top_k most similar documents for each query
+        """
+        batch = []
+        for query in queries:
+            batch.append(query)
+            if len(batch) == batch_size:
+                yield from self._search_batch(batch, top_k, mode, filters)
+                batch = []
+        if batch:
+            yield from self._search_batch(batch, top_k, mode, filters)
     
     def format_result(self, result: Dict[str, Any]) -> str:
         """Format a search result for display.
@@ -75,6 +426,13 @@ class VectorSearchAgent:
         confidence = f"{result['score']:.2%}"
         
         formatted = f"Confidence: {confidence}\n"
+        if 'chunk' in metadata:
+            # Chunk hits only carry whatever paper metadata was ingested with the PDF
+            formatted += f"Title: {metadata.get('title') or metadata['parent_id']}\n"
+            if metadata.get('authors'):
+                formatted += f"Authors: {', '.join(metadata['authors'])}\n"
+            formatted += f"Passage {metadata['chunk'] + 1}: {result['document']}\n"
+            return formatted
         formatted += f"Title: {metadata['title']}\n"
         formatted += f"Authors: {', '.join(metadata['authors'])}\n"
         formatted += f"Year: {metadata['year']}"
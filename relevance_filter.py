@@ -0,0 +1,222 @@
+"""Cheap local relevance scoring of papers before they reach the LLM.
+
+Most links on an arXiv listing are not about prompt engineering or language
+model techniques, and ``analyze_paper_fn`` answers ``null`` for them. Scoring
+each paper's abstract locally, with weighted keywords and optionally the
+sentence-transformer of ``rag_agent``, lets ``orchestrate`` skip those papers
+and analyze the most promising ones first.
+
+Label a sample with the LLM, then report the filter's precision and recall
+against those labels across thresholds:
+    python relevance_filter.py label --sources pdf_urls.txt --out labelled.jsonl
+    python relevance_filter.py report --labels labelled.jsonl
+"""
+import argparse
+import json
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.25
+
+# Weight of each occurrence of a term in the abstract, capped at three occurrences
+KEYWORD_WEIGHTS = {
+    "prompt engineering": 4.0,
+    "prompt": 2.0,
+    "prompts": 2.0,
+    "prompting": 2.5,
+    "chain-of-thought": 3.0,
+    "chain of thought": 3.0,
+    "in-context learning": 3.0,
+    "few-shot": 1.5,
+    "zero-shot": 1.5,
+    "instruction tuning": 2.0,
+    "instructions": 1.0,
+    "large language model": 2.0,
+    "large language models": 2.0,
+    "language model": 1.5,
+    "language models": 1.5,
+    "llm": 2.0,
+    "llms": 2.0,
+    "gpt": 1.5,
+    "retrieval-augmented": 1.5,
+    "reasoning": 0.5,
+}
+KEYWORD_RES = {term: re.compile(r"\b" + re.escape(term) + r"\b") for term in KEYWORD_WEIGHTS}
+KEYWORD_SCALE = 10.0
+
+# What relevant papers are about, for embedding similarity
+TOPIC_DESCRIPTIONS = [
+    "prompt engineering techniques for large language models",
+    "in-context learning, chain-of-thought reasoning and prompting methods",
+    "new techniques for training, adapting or using large language models",
+]
+
+ABSTRACT_RE = re.compile(r"\babstract\b[\s.:—-]*", re.IGNORECASE)
+ABSTRACT_END_RE = re.compile(r"\n\s*(?:1\.?|I\.?)?\s*introduction\b|\bkeywords\b|\bindex terms\b", re.IGNORECASE)
+
+
+def extract_abstract(text: str, max_chars: int = 3000) -> str:
+    """Cut the abstract out of a paper's text.
+
+    Falls back to the start of the paper when no abstract heading is found.
+
+    Args:
+        text (str): Paper text
+        max_chars (int): Maximum length of the returned abstract
+
+    Returns:
+        str: The abstract
+    """
+    match = ABSTRACT_RE.search(text[:max_chars * 2])
+    start = match.end() if match else 0
+    abstract = text[start:start + max_chars]
+    end = ABSTRACT_END_RE.search(abstract)
+    return abstract[:end.start()] if end and end.start() > 50 else abstract
+
+
+def keyword_score(abstract: str) -> float:
+    """Score an abstract in [0, 1) by its weighted prompt-engineering keywords.
+
+    Args:
+        abstract (str): Paper abstract
+
+    Returns:
+        float: Relevance score
+    """
+    lowered = abstract.lower()
+    total = sum(
+        weight * min(len(KEYWORD_RES[term].findall(lowered)), 3)
+        for term, weight in KEYWORD_WEIGHTS.items()
+    )
+    return 1 - math.exp(-total / KEYWORD_SCALE)
+
+
+class RelevanceFilter:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, model: Any = None,
+                 embedding_weight: float = 0.5, embedding_floor: float = 0.7):
+        """Score papers locally and decide which ones are worth an LLM call.
+
+        Args:
+            threshold (float): Minimum score of papers forwarded to the LLM
+            model (Any): Optional sentence-transformer, e.g. the one of ``rag_agent``;
+                keyword scoring alone is used without one
+            embedding_weight (float): Weight of the embedding similarity in the score
+            embedding_floor (float): Cosine similarity that maps to an embedding score
+                of 0; e5 models rarely go below 0.7 even for unrelated text
+        """
+        self.threshold = threshold
+        self.model = model
+        self.embedding_weight = embedding_weight
+        self.embedding_floor = embedding_floor
+        self._topics: Optional[np.ndarray] = None
+
+    def _embedding_scores(self, abstracts: List[str]) -> np.ndarray:
+        if self._topics is None:
+            self._topics = self.model.encode(TOPIC_DESCRIPTIONS, normalize_embeddings=True)
+        embeddings = self.model.encode(abstracts, normalize_embeddings=True)
+        similarity = (embeddings @ self._topics.T).max(axis=1)
+        return np.clip((similarity - self.embedding_floor) / (1 - self.embedding_floor), 0.0, 1.0)
+
+    def score_many(self, texts: List[str]) -> List[float]:
+        """Score papers in one batch.
+
+        Args:
+            texts (List[str]): Paper texts, or at least their first pages
+
+        Returns:
+            List[float]: Relevance score in [0, 1] for each paper
+        """
+        abstracts = [extract_abstract(text) for text in texts]
+        scores = np.array([keyword_score(abstract) for abstract in abstracts])
+        if self.model is not None and abstracts:
+            scores = (1 - self.embedding_weight) * scores + self.embedding_weight * self._embedding_scores(abstracts)
+        return [float(score) for score in scores]
+
+    def score(self, text: str) -> float:
+        """Score one paper, see ``score_many``."""
+        return self.score_many([text])[0]
+
+    def accepts(self, score: float) -> bool:
+        return score >= self.threshold
+
+
+def label_sample(sources: Iterable[str], out_path: str) -> None:
+    """Record the LLM's relevance decision for each PDF, for ``report``.
+
+    Args:
+        sources (Iterable[str]): PDF URLs
+        out_path (str): JSONL file of {pdf_url, text, relevant}
+    """
+    from agent_pdf_extractor_vibe import ANALYZE_MAX_CHARS, analyze_paper_fn, extract_pdf_text_fn
+
+    with open(out_path, 'a', encoding="utf-8") as f:
+        for pdf_url in sources:
+            text = extract_pdf_text_fn(pdf_url)[:ANALYZE_MAX_CHARS]
+            relevant = bool(analyze_paper_fn(text))
+            f.write(json.dumps({'pdf_url': pdf_url, 'text': text, 'relevant': relevant}) + "\n")
+
+
+def report(samples: List[Dict[str, Any]], relevance_filter: RelevanceFilter,
+           thresholds: Iterable[float]) -> List[Dict[str, float]]:
+    """Precision and recall of the filter against LLM labels at several thresholds.
+
+    Args:
+        samples (List[Dict[str, Any]]): Labelled samples with ``text`` and ``relevant``
+        relevance_filter (RelevanceFilter): Filter to evaluate
+        thresholds (Iterable[float]): Thresholds to evaluate
+
+    Returns:
+        List[Dict[str, float]]: One row per threshold with precision, recall and the
+            fraction of papers forwarded to the LLM
+    """
+    scores = np.array(relevance_filter.score_many([sample['text'] for sample in samples]))
+    labels = np.array([bool(sample['relevant']) for sample in samples])
+    rows = []
+    for threshold in thresholds:
+        forwarded = scores >= threshold
+        true_positives = int((forwarded & labels).sum())
+        rows.append({
+            'threshold': threshold,
+            'precision': true_positives / int(forwarded.sum()) if forwarded.any() else 1.0,
+            'recall': true_positives / int(labels.sum()) if labels.any() else 1.0,
+            'forwarded': float(forwarded.mean()) if len(samples) else 0.0,
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    label = commands.add_parser("label", help="Label PDFs with the LLM's relevance decision")
+    label.add_argument("--sources", required=True, help="File with one PDF URL per line")
+    label.add_argument("--out", default="labelled.jsonl")
+    evaluate = commands.add_parser("report", help="Precision/recall of the filter against the labels")
+    evaluate.add_argument("--labels", default="labelled.jsonl")
+    evaluate.add_argument("--thresholds", default="0.1,0.15,0.2,0.25,0.3,0.4,0.5")
+    evaluate.add_argument("--model", help="Sentence-transformer to blend into the score, e.g. "
+                                          "intfloat/multilingual-e5-large-instruct")
+    args = parser.parse_args()
+
+    if args.command == "label":
+        with open(args.sources, 'r') as f:
+            label_sample((line.strip() for line in f if line.strip()), args.out)
+        return
+
+    with open(args.labels, 'r', encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    model = None
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+    rows = report(samples, RelevanceFilter(model=model), [float(t) for t in args.thresholds.split(",")])
+    print(f"{sum(s['relevant'] for s in samples)} relevant of {len(samples)} labelled papers")
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'forwarded':>9}")
+    for row in rows:
+        print(f"{row['threshold']:>9.2f} {row['precision']:>9.3f} {row['recall']:>7.3f} {row['forwarded']:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
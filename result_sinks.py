@@ -0,0 +1,134 @@
+"""Append-only result sinks for the paper finder.
+
+Every processed PDF is appended to a JSONL file as soon as its fate is known,
+and relevant papers are also appended to a Markdown report. Each record is
+flushed and fsynced before the next one, so a crash loses at most the paper
+being written, and consumers can tail either file while a crawl runs. The
+JSONL file doubles as the resume log: URLs the LLM judged relevant or not are
+skipped by the next run, while filtered ones are scored again, since the
+filter or its threshold may have changed.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+JSONL_FILE = "papers_output.jsonl"
+MARKDOWN_FILE = "papers_output.md"
+
+RELEVANT = "relevant"
+NOT_RELEVANT = "not_relevant"
+FILTERED = "filtered"
+
+
+def format_paper_markdown(idx: int, paper: Dict[str, Any]) -> List[str]:
+    """Markdown lines of one paper in the papers_output.md format.
+
+    Args:
+        idx (int): Position of the paper in the report
+        paper (Dict[str, Any]): Paper info from ``analyze_paper_fn``
+
+    Returns:
+        List[str]: Markdown lines
+    """
+    return [
+        f"## {idx}. {paper.get('title', 'Untitled')}",
+        f"- **Authors:** {', '.join(paper.get('authors', []))}",
+        f"- **Year:** {paper.get('year', '')}",
+        f"- **Month:** {paper.get('month', '')}",
+        f"- **Technique Type:** {paper.get('technique_type', '')}",
+        f"- **Technique Description:** {paper.get('technique_description', '')}",
+        f"- **Summary:** {paper.get('summary', '')}\n",
+    ]
+
+
+class ResultSink:
+    def __init__(self, sink_dir: str, resume: bool = True):
+        """Open the JSONL and Markdown sinks in a directory.
+
+        Args:
+            sink_dir (str): Directory of papers_output.jsonl and papers_output.md
+            resume (bool): Keep the records of earlier runs; start both files
+                afresh otherwise
+        """
+        self.sink_dir = Path(sink_dir)
+        self.sink_dir.mkdir(parents=True, exist_ok=True)
+        self.jsonl_path = self.sink_dir / JSONL_FILE
+        self.markdown_path = self.sink_dir / MARKDOWN_FILE
+        self._lock = threading.Lock()
+        self.records: List[Dict[str, Any]] = self._load() if resume else []
+        self._relevant = len(self.papers())
+
+        self._jsonl = open(self.jsonl_path, 'a' if resume else 'w', encoding="utf-8")
+        # The report is derived from the log, so it is rebuilt from it once and appended to after that
+        self._markdown = open(self.markdown_path, 'w', encoding="utf-8")
+        self._markdown.write("# Top Papers\n\n")
+        for idx, paper in enumerate(self.papers(), 1):
+            self._markdown.write("\n".join(format_paper_markdown(idx, paper)) + "\n")
+        self._write(self._markdown, "")
+
+    def _load(self) -> List[Dict[str, Any]]:
+        if not self.jsonl_path.exists():
+            return []
+        records = []
+        good_bytes = 0
+        with open(self.jsonl_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                good_bytes += len(line)
+        # A crash mid-write leaves a partial last line; drop it so appends stay parseable
+        if good_bytes < self.jsonl_path.stat().st_size:
+            with open(self.jsonl_path, 'r+b') as f:
+                f.truncate(good_bytes)
+        return records
+
+    @staticmethod
+    def _write(f, text: str) -> None:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def recorded_urls(self) -> Set[str]:
+        """PDF URLs recorded with any status."""
+        with self._lock:
+            return {record['pdf_url'] for record in self.records}
+
+    def analyzed_urls(self) -> Set[str]:
+        """PDF URLs with an LLM verdict, which a resumed run skips."""
+        with self._lock:
+            return {record['pdf_url'] for record in self.records if record['status'] != FILTERED}
+
+    def papers(self) -> List[Dict[str, Any]]:
+        """Relevant papers recorded so far, in the order they were found."""
+        return [record['paper'] for record in self.records if record['status'] == RELEVANT]
+
+    def record(self, pdf_url: str, status: str, paper: Optional[Dict[str, Any]] = None) -> None:
+        """Append the outcome of one PDF to the sinks.
+
+        Args:
+            pdf_url (str): PDF URL
+            status (str): RELEVANT, NOT_RELEVANT or FILTERED
+            paper (Optional[Dict[str, Any]]): Paper info of a relevant paper
+        """
+        record = {'pdf_url': pdf_url, 'status': status, 'paper': paper, 'recorded_at': time.time()}
+        with self._lock:
+            if self._jsonl.closed:
+                # Stragglers finishing after the run ended are not recorded
+                return
+            self._write(self._jsonl, json.dumps(record, ensure_ascii=False) + "\n")
+            self.records.append(record)
+            if status == RELEVANT:
+                self._relevant += 1
+                self._write(self._markdown, "\n".join(format_paper_markdown(self._relevant, paper)) + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._jsonl.close()
+            self._markdown.close()
@@ -1,22 +1,19 @@
-import requests
-from pypdf import PdfReader
 from openai import OpenAI
 from pydantic import BaseModel
+from http_fetch import get_fetcher, PDF_MAX_AGE
+from pdf_text import get_extractor
+from instrumentation import span
 
-# Download PDF from a link
-def download_pdf(url, filename="temp.pdf"):
-    response = requests.get(url)
-    with open(filename, "wb") as f:
-        f.write(response.content)
-    return filename
+# Download PDF from a link, through the shared session pool and PDF cache
+def download_pdf(url):
+    return get_fetcher().fetch(url, max_age=PDF_MAX_AGE)
 
-# Extract text from PDF
-def extract_text_from_pdf(pdf_path):
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
+# Extract text from PDF bytes (or a path to a PDF file)
+def extract_text_from_pdf(pdf):
+    if not isinstance(pdf, bytes):
+        with open(pdf, "rb") as f:
+            pdf = f.read()
+    return get_extractor().extract(pdf)
 
 # Define your structured data model
 class CalendarEvent(BaseModel):
@@ -26,17 +23,18 @@ class CalendarEvent(BaseModel):
 
 # Main function to extract structured data from a PDF link
 def extract_event_from_pdf(pdf_url):
-    pdf_path = download_pdf(pdf_url)
-    pdf_text = extract_text_from_pdf(pdf_path)
+    pdf_text = extract_text_from_pdf(download_pdf(pdf_url))
     client = OpenAI()
-    response = client.responses.parse(
-        model="gpt-4o-2024-08-06",
-        input=[
-            {"role": "system", "content": "Extract the event information."},
-            {"role": "user", "content": pdf_text},
-        ],
-        text_format=CalendarEvent,
-    )
+    model = "gpt-4o-2024-08-06"
+    with span("llm.parse", model=model):
+        response = client.responses.parse(
+            model=model,
+            input=[
+                {"role": "system", "content": "Extract the event information."},
+                {"role": "user", "content": pdf_text},
+            ],
+            text_format=CalendarEvent,
+        )
     return response.output_parsed
 
 # Example usage:
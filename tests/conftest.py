@@ -0,0 +1,63 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# Top-level scripts and the RAG agent both use flat imports
+sys.path[:0] = [str(ROOT), str(ROOT / "rag_agent")]
+
+from stubs import StubEmbeddingModel, make_corpus
+
+
+@pytest.fixture
+def stub_model():
+    return StubEmbeddingModel(dim=64)
+
+
+@pytest.fixture
+def write_corpus(tmp_path):
+    def write(papers, name="papers.json"):
+        path = tmp_path / name
+        path.write_text(json.dumps({'top_papers': papers}))
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def corpus():
+    return make_corpus(200)
+
+
+@pytest.fixture
+def make_indexer(stub_model):
+    """Factory of DocumentIndexers embedding with the stub model."""
+    from document_indexer import DocumentIndexer
+
+    def make(**kwargs):
+        indexer = DocumentIndexer(show_progress_bar=False, **kwargs)
+        indexer.model = stub_model
+        return indexer
+    return make
+
+
+@pytest.fixture
+def build_index(make_indexer):
+    """Build or incrementally update an index directory from a corpus file."""
+    def build(papers_path, index_dir, incremental=False, **kwargs):
+        return make_indexer(**kwargs).process_and_index_documents(papers_path, str(index_dir), incremental=incremental)
+    return build
+
+
+@pytest.fixture
+def load_agent(stub_model):
+    """Factory of VectorSearchAgents over a saved index, embedding queries with the stub model."""
+    from vector_search_agent import VectorSearchAgent
+
+    def load(index_dir, **kwargs):
+        agent = VectorSearchAgent(**kwargs)
+        agent.model = stub_model
+        agent.load_index(str(index_dir))
+        return agent
+    return load
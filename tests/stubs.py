@@ -0,0 +1,76 @@
+"""Offline stand-ins for the embedding model and the paper corpus."""
+import zlib
+from typing import Any, Dict, List
+
+import numpy as np
+
+TECHNIQUE_TYPES = ["Prompt Engineering Technique", "Fine-tuning Method", "Retrieval Augmentation", "Agent Framework"]
+TECHNIQUES = [
+    "chain-of-thought", "self-consistency", "tree-of-thought", "few-shot prompting", "in-context learning",
+    "instruction tuning", "retrieval augmentation", "self-refinement", "tool use", "reflection", "planning",
+]
+TASKS = ["mathematical reasoning", "code generation", "question answering", "summarization", "translation",
+         "fact verification", "dialogue"]
+DOMAINS = ["large language models", "clinical text", "legal documents", "scientific literature", "finance"]
+NAMES = ["Chen", "Wang", "Smith", "Kumar", "Garcia", "Müller", "Kim", "Nguyen", "Rossi", "Okafor"]
+
+
+class StubEmbeddingModel:
+    def __init__(self, dim: int = 64, buckets: int = 1 << 12, seed: int = 0):
+        """Deterministic stand-in for a sentence-transformer.
+
+        A text embeds to the normalized sum of fixed random directions of its
+        hashed tokens, so texts sharing words land close together.
+
+        Args:
+            dim (int): Embedding dimension
+            buckets (int): Hash buckets for tokens
+            seed (int): Seed of the bucket directions
+        """
+        self.dim = dim
+        self.buckets = buckets
+        self.directions = np.random.default_rng(seed).standard_normal((buckets, dim)).astype(np.float32)
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        embeddings = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            tokens = sentence.lower().split()
+            if tokens:
+                buckets = [zlib.crc32(token.encode("utf-8")) % self.buckets for token in tokens]
+                embeddings[row] = self.directions[buckets].sum(axis=0)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+
+def make_corpus(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic papers in the research_papers.json schema; the same seed gives the same papers."""
+    rng = np.random.default_rng(seed)
+    papers = []
+    for i in range(size):
+        technique, other = (TECHNIQUES[j] for j in rng.integers(0, len(TECHNIQUES), 2))
+        task = TASKS[rng.integers(len(TASKS))]
+        domain = DOMAINS[rng.integers(len(DOMAINS))]
+        papers.append({
+            'id': f"paper-{seed}-{i}",
+            'title': f"{technique.title()} for {task.title()} in {domain.title()} ({i})",
+            'authors': [f"{chr(65 + (i + j) % 26)}. {NAMES[(i * 7 + j * 3) % len(NAMES)]}"
+                        for j in range(1 + i % 3)],
+            'year': str(2019 + int(rng.integers(0, 7))),
+            'month': str(1 + int(rng.integers(0, 12))),
+            'technique_type': TECHNIQUE_TYPES[rng.integers(len(TECHNIQUE_TYPES))],
+            'technique_description': f"Combines {technique} with {other} to improve {task}.",
+            'summary': f"We study {technique} for {task} with {domain} and report gains over strong baselines.",
+        })
+    return papers
+
+
+def make_queries(count: int, seed: int = 1) -> List[str]:
+    """Queries over the vocabulary of ``make_corpus``."""
+    rng = np.random.default_rng(seed)
+    return [
+        f"{TECHNIQUES[rng.integers(len(TECHNIQUES))]} for {TASKS[rng.integers(len(TASKS))]} "
+        f"in {DOMAINS[rng.integers(len(DOMAINS))]}"
+        for _ in range(count)
+    ]
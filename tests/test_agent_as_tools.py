@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+import agent_as_tools
+from agent_as_tools import translate_all, translate_batch
+
+
+class FakeRunner:
+    """Translates by tagging the text with the agent's language, after a per-text delay."""
+
+    def __init__(self, delays=None, failures=None):
+        self.delays = delays or {}
+        # Number of attempts that fail for each text before it succeeds
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def run(self, agent, text):
+        self.calls.append((agent.name, text, time.monotonic()))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(text, 0.0))
+            if self.failures.get(text, 0) > 0:
+                self.failures[text] -= 1
+                raise RuntimeError("rate limited by the API")
+            return type("Result", (), {'final_output': f"{agent.name.split()[0]}({text})"})()
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    def install(**kwargs):
+        fake = FakeRunner(**kwargs)
+        monkeypatch.setattr(agent_as_tools, "Runner", fake)
+        return fake
+    return install
+
+
+def collect(texts, languages, **kwargs):
+    async def run():
+        return [item async for item in translate_batch(texts, languages, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_identical_texts_are_translated_once(runner):
+    fake = runner()
+    texts = ["Checkout", "Add to cart", "Checkout"]
+    translations = asyncio.run(translate_all(texts, ["spanish", "french", "spanish"], rate=0))
+    assert len(fake.calls) == 4
+    assert translations == {
+        'spanish': ["Spanish(Checkout)", "Spanish(Add to cart)", "Spanish(Checkout)"],
+        'french': ["French(Checkout)", "French(Add to cart)", "French(Checkout)"],
+    }
+
+
+def test_results_stream_as_they_complete_under_the_concurrency_limit(runner):
+    fake = runner(delays={"slow": 0.2, "fast": 0.0, "medium": 0.1})
+    items = collect(["slow", "fast", "medium"], ["spanish"], max_concurrency=3, rate=0)
+    assert [item['text'] for item in items] == ["fast", "medium", "slow"]
+    assert items[0] == {'text': "fast", 'language': "spanish", 'translation': "Spanish(fast)",
+                        'error': None, 'indexes': [1]}
+
+    fake = runner(delays={text: 0.02 for text in "abcdef"})
+    assert len(collect(list("abcdef"), ["spanish", "french"], max_concurrency=2, rate=0)) == 12
+    assert fake.peak == 2
+
+
+def test_translations_are_started_at_the_rate_limit(runner):
+    fake = runner()
+    collect(list("abcde"), ["spanish"], max_concurrency=5, rate=20)
+    starts = [started for _, _, started in fake.calls]
+    # Five starts at 20 per second span at least four intervals, however late any one wakes up
+    assert len(starts) == 5 and starts[-1] - starts[0] >= 4 / 20 - 0.01
+
+
+def test_failures_are_retried_and_reported(runner, monkeypatch):
+    backoffs = []
+    sleep = asyncio.sleep
+
+    async def no_backoff(delay):
+        backoffs.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(agent_as_tools.asyncio, "sleep", no_backoff)
+    runner(failures={"flaky": 1, "broken": 5})
+    items = {item['text']: item for item in collect(["flaky", "broken"], ["french"], rate=0, retries=2)}
+    assert items["flaky"]['translation'] == "French(flaky)" and items["flaky"]['error'] is None
+    assert items["broken"]['translation'] is None and items["broken"]['error'] == "rate limited by the API"
+    # Backoff doubles between attempts; the fake runner's own zero-second sleeps are not backoffs
+    assert sorted(delay for delay in backoffs if delay) == [1, 1, 2]
+
+
+def test_unknown_languages_are_rejected(runner):
+    with pytest.raises(ValueError, match="No translation agent for \\['klingon'\\]"):
+        collect(["hello"], ["spanish", "klingon"])
+
+
+def test_stopping_early_cancels_the_remaining_translations(runner):
+    fake = runner(delays={text: 0.05 for text in "abcdefgh"})
+
+    async def first_then_stop():
+        stream = translate_batch(list("abcdefgh"), ["spanish"], max_concurrency=2, rate=0)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.2)
+        return first
+
+    assert asyncio.run(first_then_stop())['translation'].startswith("Spanish(")
+    assert len(fake.calls) < 8 and fake.active == 0
@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pytest
+
+from benchmark import COMPARED_METRICS, StubEmbeddingModel, compare, generate_corpus, generate_queries, run_benchmark
+
+
+def test_synthetic_corpus_follows_the_paper_schema():
+    corpus = generate_corpus(50, seed=3)
+    assert corpus == generate_corpus(50, seed=3) and corpus != generate_corpus(50, seed=4)
+    keys = {'id', 'title', 'authors', 'year', 'month', 'technique_type', 'technique_description', 'summary'}
+    assert all(set(paper) == keys for paper in corpus['top_papers'])
+    assert len({paper['id'] for paper in corpus['top_papers']}) == 50
+    assert generate_queries(5) == generate_queries(5)
+
+
+def test_stub_model_is_deterministic_and_unit_length():
+    texts = ["chain-of-thought for dialogue", "chain-of-thought for translation", ""]
+    embeddings = StubEmbeddingModel(dim=32).encode(texts, normalize_embeddings=True)
+    assert np.array_equal(embeddings, StubEmbeddingModel(dim=32).encode(texts))
+    assert np.allclose(np.linalg.norm(embeddings[:2], axis=1), 1.0) and not embeddings[2].any()
+    # Texts sharing words land closer together than unrelated ones
+    assert embeddings[0] @ embeddings[1] > embeddings[0] @ StubEmbeddingModel(dim=32).encode("ceramics")[0]
+
+
+def test_benchmark_measures_every_configuration(tmp_path):
+    rows = run_benchmark([300], ["flat", "hnsw"], num_queries=20, top_k=5, batch_size=8, stub_dim=32,
+                         work_dir=str(tmp_path))
+    assert [(row['corpus_size'], row['index_type']) for row in rows] == [(300, "flat"), (300, "hnsw")]
+    for row in rows:
+        assert all(row[metric] > 0 for metric in COMPARED_METRICS)
+        assert row['p99_ms'] >= row['p50_ms']
+        assert row['disk_mb'] == pytest.approx(sum(row['disk_breakdown_mb'].values()))
+    # Rows are written to the result file as they are
+    assert json.loads(json.dumps(rows)) == rows
+    assert (tmp_path / "index_300_flat").is_dir()
+
+
+def test_compare_flags_only_worsening_beyond_the_tolerance():
+    baseline = {'rows': [{'corpus_size': 1000, 'index_type': "flat", 'build_s': 2.0, 'single_qps': 100.0}]}
+    current = {'rows': [
+        {'corpus_size': 1000, 'index_type': "flat", 'build_s': 2.1, 'single_qps': 50.0},
+        {'corpus_size': 1000, 'index_type': "hnsw", 'build_s': 9.0, 'single_qps': 10.0},
+    ]}
+    changes = {change['metric']: change for change in compare(baseline, current, tolerance=0.1)}
+    assert set(changes) == {'build_s', 'single_qps'}
+    assert changes['build_s']['change'] == pytest.approx(0.05) and not changes['build_s']['regression']
+    assert changes['single_qps']['change'] == pytest.approx(-0.5) and changes['single_qps']['regression']
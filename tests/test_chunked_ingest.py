@@ -0,0 +1,72 @@
+import pytest
+
+from chunked_ingest import ChunkIngestor
+from document_store import STORE_DIR, DocumentStore, DocumentStoreWriter
+from index_factory import read_index
+from vector_search_agent import VectorSearchAgent
+
+TEXTS = {f"https://example.org/{n}.pdf": " ".join(f"paper{n} word{i}" for i in range(300)) for n in range(3)}
+
+
+def make_ingestor(model, index_dir):
+    ingestor = ChunkIngestor(str(index_dir), chunk_tokens=64, overlap=8, batch_size=8, extract_text=TEXTS.__getitem__)
+    ingestor.indexer.model = model
+    return ingestor
+
+
+def test_rerun_reports_existing_rows(tmp_path, stub_model):
+    first = make_ingestor(stub_model, tmp_path).run(list(TEXTS)[:2])
+    assert first['papers'] == 2 and first['rows'] == first['chunks'] > 0
+
+    again = make_ingestor(stub_model, tmp_path).run(list(TEXTS)[:2])
+    assert again == {'papers': 0, 'chunks': 0, 'rows': first['rows']}
+
+
+def test_resume_appends_new_papers(tmp_path, stub_model):
+    first = make_ingestor(stub_model, tmp_path).run(list(TEXTS)[:2])
+    more = make_ingestor(stub_model, tmp_path).run(list(TEXTS))
+    assert more['papers'] == 1
+    assert more['rows'] == first['rows'] + more['chunks']
+
+
+def test_resume_appends_to_the_store_in_place(tmp_path, stub_model):
+    make_ingestor(stub_model, tmp_path).run(list(TEXTS)[:2])
+    blob = tmp_path / STORE_DIR / "documents.blob"
+    inode, size = blob.stat().st_ino, blob.stat().st_size
+
+    make_ingestor(stub_model, tmp_path).run(list(TEXTS))
+    assert blob.stat().st_ino == inode and blob.stat().st_size > size
+    store = DocumentStore(tmp_path / STORE_DIR)
+    assert store.get_metadata(0)['parent_id'] == list(TEXTS)[0]
+    assert store.get_metadata(len(store) - 1)['parent_id'] == list(TEXTS)[2]
+
+
+def test_failed_store_append_keeps_index_and_store_aligned(tmp_path, stub_model, monkeypatch):
+    first = make_ingestor(stub_model, tmp_path).run(list(TEXTS)[:1])
+    append = DocumentStoreWriter.append
+    calls = []
+
+    def failing_append(self, document, metadata):
+        calls.append(metadata['parent_id'])
+        if len(calls) == 12:
+            raise OSError("No space left on device")
+        return append(self, document, metadata)
+
+    monkeypatch.setattr(DocumentStoreWriter, "append", failing_append)
+    with pytest.raises(OSError):
+        make_ingestor(stub_model, tmp_path).run(list(TEXTS))
+    monkeypatch.setattr(DocumentStoreWriter, "append", append)
+
+    store = DocumentStore(tmp_path / STORE_DIR)
+    assert len(store) == read_index(str(tmp_path / "papers.index")).ntotal > first['rows']
+    # The paper cut short is ingested again and every row still describes its own vector
+    final = make_ingestor(stub_model, tmp_path).run(list(TEXTS))
+    agent = VectorSearchAgent(search_mode="vector")
+    agent.model = stub_model
+    agent.load_index(str(tmp_path))
+    assert agent.index.ntotal == len(agent.documents) == final['rows']
+    for row in range(0, final['rows'], 7):
+        if row in agent.tombstones:
+            continue
+        hit = agent.search_embeddings(agent.index.reconstruct_n(row, 1), 1)[0][0]
+        assert hit['document'] == agent.documents[row]
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from document_store import (
+    STORE_DIR, DocumentStore, DocumentStoreWriter, convert_metadata_json,
+    load_documents_and_metadata, write_document_store,
+)
+
+DOCUMENTS = ["Über retrieval", "", "Dense passage retrieval"]
+METADATA = [
+    {'title': "Über retrieval", 'year': "2021", 'authors': ["A. Chen", "B. Okafor"]},
+    {'title': "Untitled", 'year': None},
+    {'title': "Dense passage retrieval", 'year': "2020", 'technique_type': "Retrieval", 'pdf_url': "http://x/1.pdf"},
+]
+
+
+def test_documents_and_metadata_round_trip(tmp_path):
+    write_document_store(tmp_path / "store", DOCUMENTS, METADATA)
+    store = DocumentStore(tmp_path / "store")
+
+    assert len(store) == 3 and list(store.documents) == DOCUMENTS
+    assert list(store.metadata) == METADATA
+    assert store.metadata[-1] == METADATA[2] and store.documents[1:] == DOCUMENTS[1:]
+    with pytest.raises(IndexError):
+        store.documents[3]
+
+
+def test_columns_are_typed_and_backfilled(tmp_path):
+    write_document_store(tmp_path / "store", DOCUMENTS, METADATA)
+    header = json.loads((tmp_path / "store" / "docstore.json").read_text())
+    kinds = {field['name']: field['kind'] for field in header['fields']}
+    assert kinds == {'title': "json", 'year': "categorical", 'authors': "json",
+                     'technique_type': "categorical", 'pdf_url': "json"}
+    year = next(field for field in header['fields'] if field['name'] == "year")
+    assert year['values'] == ["2021", None, "2020"]
+
+    # Fields first seen on a later row are absent, not empty, on the rows before it
+    store = DocumentStore(tmp_path / "store")
+    assert "technique_type" not in store.get_metadata(0) and "pdf_url" not in store.get_metadata(1)
+    assert "authors" not in store.get_metadata(2)
+
+
+def test_writer_replaces_the_store_only_when_closed(tmp_path):
+    write_document_store(tmp_path / "store", DOCUMENTS, METADATA)
+    with pytest.raises(RuntimeError):
+        with DocumentStoreWriter(tmp_path / "store") as writer:
+            writer.append("replacement", {'title': "replacement"})
+            raise RuntimeError("interrupted")
+
+    assert list(DocumentStore(tmp_path / "store").documents) == DOCUMENTS
+    assert not (tmp_path / "store.tmp").exists()
+
+
+def test_append_adds_rows_in_place(tmp_path):
+    write_document_store(tmp_path / "store", DOCUMENTS, METADATA)
+    with DocumentStoreWriter(tmp_path / "store", append=True) as writer:
+        assert writer.append("fourth", {'title': "fourth", 'year': "2022", 'venue': "ACL"}) == 3
+
+    store = DocumentStore(tmp_path / "store")
+    assert list(store.documents) == DOCUMENTS + ["fourth"]
+    assert store.get_metadata(3) == {'title': "fourth", 'year': "2022", 'venue': "ACL"}
+    assert list(store.metadata)[:3] == METADATA
+
+
+def test_truncate_and_abort_keep_the_last_closed_rows(tmp_path):
+    write_document_store(tmp_path / "store", DOCUMENTS, METADATA)
+    with DocumentStoreWriter(tmp_path / "store", append=True) as writer:
+        writer.append("dropped", {'title': "dropped"})
+        writer.truncate(2)
+        writer.append("kept", {'title': "kept"})
+    assert list(DocumentStore(tmp_path / "store").documents) == DOCUMENTS[:2] + ["kept"]
+
+    writer = DocumentStoreWriter(tmp_path / "store", append=True)
+    writer.append("aborted", {'title': "aborted"})
+    writer.abort()
+    # The bytes the aborted writer left behind are overwritten by the next one
+    with DocumentStoreWriter(tmp_path / "store", append=True) as writer:
+        writer.append("last", {'title': "last", 'year': "2019"})
+    store = DocumentStore(tmp_path / "store")
+    assert list(store.documents) == DOCUMENTS[:2] + ["kept", "last"]
+    assert store.get_metadata(3) == {'title': "last", 'year': "2019"}
+
+
+def test_metadata_json_indexes_are_converted(tmp_path):
+    (tmp_path / "metadata.json").write_text(json.dumps({'documents': DOCUMENTS, 'metadata': METADATA}))
+    documents, metadata = load_documents_and_metadata(tmp_path)
+    assert documents == DOCUMENTS and metadata == METADATA
+
+    assert convert_metadata_json(tmp_path) == 3
+    assert (tmp_path / STORE_DIR / "docstore.json").exists()
+    documents, metadata = load_documents_and_metadata(tmp_path)
+    assert not isinstance(documents, list)
+    assert list(documents) == DOCUMENTS and list(metadata) == METADATA
@@ -0,0 +1,90 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self, model):
+        self.model = model
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return self.model.encode(texts)
+
+
+def test_hits_skip_the_model_and_repeats_are_encoded_once(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub")
+    encode = CountingEncoder(stub_model)
+    first = cache.encode(["a", "b", "a"], encode)
+    second = cache.encode(["b", "c"], encode)
+    assert encode.texts == ["a", "b", "c"]
+    np.testing.assert_allclose(first[1], second[0])
+    np.testing.assert_allclose(first[0], first[2])
+    assert cache.stats()['hits'] == 1
+
+
+def test_misses_are_flushed_in_batches(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub", flush_entries=3, flush_interval=3600)
+    for text in ["a", "b"]:
+        cache.encode([text], stub_model.encode)
+    assert cache.stats()['flushes'] == 0 and cache.stats()['pending'] == 2
+    assert not (cache.cache_dir / "keys.npz").exists()
+    cache.encode(["c"], stub_model.encode)
+    assert cache.stats()['flushes'] == 1 and cache.stats()['pending'] == 0
+
+
+def test_misses_are_flushed_after_the_interval(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub", flush_entries=1000, flush_interval=0)
+    cache.encode(["a"], stub_model.encode)
+    assert cache.stats()['flushes'] == 1
+
+
+def test_close_persists_pending_entries(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub", flush_entries=1000, flush_interval=3600)
+    expected = cache.encode(["a", "b"], stub_model.encode)
+    cache.close()
+    cache.close()
+    assert cache.stats()['flushes'] == 1
+
+    reopened = EmbeddingCache(str(tmp_path), "stub")
+    np.testing.assert_allclose(reopened.encode(["b", "a"], CountingEncoder(None)), expected[::-1])
+    assert reopened.stats()['hits'] == 2
+
+
+def test_full_cache_evicts_least_recently_used(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub", max_entries=2)
+    cache.encode(["a", "b"], stub_model.encode)
+    cache.encode(["a"], stub_model.encode)
+    cache.encode(["c"], stub_model.encode)
+    encode = CountingEncoder(stub_model)
+    cache.encode(["a", "c", "b"], encode)
+    assert encode.texts == ["b"]
+
+
+def test_evicted_keys_never_return_a_reused_slot_after_a_crash(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub", max_entries=2, flush_entries=1000, flush_interval=3600)
+    cache.encode(["a", "b"], stub_model.encode)
+    cache.close()
+    # "c" takes the slot of "a"; the process dies before the next flush
+    cache.encode(["c"], stub_model.encode)
+
+    reopened = EmbeddingCache(str(tmp_path), "stub", max_entries=2)
+    encode = CountingEncoder(stub_model)
+    np.testing.assert_allclose(reopened.encode(["a"], encode)[0], stub_model.encode(["a"])[0])
+    assert encode.texts == ["a"]
+
+
+def test_recency_of_hits_survives_a_restart(tmp_path, stub_model):
+    cache = EmbeddingCache(str(tmp_path), "stub", max_entries=2, flush_entries=1000, flush_interval=3600)
+    cache.encode(["a", "b"], stub_model.encode)
+    cache.close()
+    cache.encode(["a"], stub_model.encode)
+    cache.close()
+    assert cache.stats()['flushes'] == 2
+
+    reopened = EmbeddingCache(str(tmp_path), "stub", max_entries=2)
+    reopened.encode(["c"], stub_model.encode)
+    encode = CountingEncoder(stub_model)
+    reopened.encode(["a", "b"], encode)
+    assert encode.texts == ["b"]
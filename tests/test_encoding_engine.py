@@ -0,0 +1,57 @@
+import functools
+
+import numpy as np
+import pytest
+
+from encoding_engine import EncodingEngine, length_batches, padding_efficiency, text_lengths
+from stubs import StubEmbeddingModel
+
+TEXTS = [" ".join(["word"] * (n % 17 + 1)) + f" text{n}" for n in range(60)]
+
+
+class WhitespaceTokenizer:
+    def __call__(self, texts, add_special_tokens=False):
+        # Two tokens per word, so token and word counts differ
+        return {'input_ids': [text.split() * 2 for text in texts]}
+
+
+def test_batches_group_similar_lengths_longest_first():
+    lengths = text_lengths(TEXTS)
+    batches = length_batches(lengths, 8)
+    assert sorted(np.concatenate(batches).tolist()) == list(range(len(TEXTS)))
+    assert lengths[batches[0]].min() >= lengths[batches[-1]].max()
+    unsorted = [np.arange(i, min(i + 8, len(TEXTS))) for i in range(0, len(TEXTS), 8)]
+    assert padding_efficiency(lengths, batches) > padding_efficiency(lengths, unsorted)
+
+
+def test_lengths_are_counted_in_tokenizer_tokens():
+    np.testing.assert_array_equal(text_lengths(TEXTS[:3], WhitespaceTokenizer()), 2 * text_lengths(TEXTS[:3]))
+
+
+@pytest.fixture
+def engine():
+    engine = EncodingEngine(workers=2, batch_size=8, model_factory=functools.partial(StubEmbeddingModel, 32),
+                            report=False, min_parallel_texts=10)
+    yield engine
+    engine.close()
+
+
+def test_pool_is_kept_between_calls(engine):
+    expected = StubEmbeddingModel(32).encode(TEXTS)
+    np.testing.assert_allclose(engine.encode(TEXTS), expected, rtol=1e-6)
+    pool = engine._pool
+    np.testing.assert_allclose(engine.encode(TEXTS[::-1]), expected[::-1], rtol=1e-6)
+    assert engine._pool is pool and engine.last_report['workers'] == 2
+
+
+def test_small_calls_are_encoded_in_process(engine):
+    vectors = engine.encode(TEXTS[:3])
+    np.testing.assert_allclose(vectors, StubEmbeddingModel(32).encode(TEXTS[:3]), rtol=1e-6)
+    assert engine._pool is None and engine.last_report['workers'] == 1
+
+
+def test_close_shuts_down_the_pool(engine):
+    engine.encode(TEXTS)
+    engine.close()
+    assert engine._pool is None
+    np.testing.assert_allclose(engine.encode(TEXTS), StubEmbeddingModel(32).encode(TEXTS), rtol=1e-6)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from attribute_index import AttributeIndex
+from stubs import make_queries
+
+METADATA = [
+    {'year': "2021", 'technique_type': "Prompt Engineering Technique", 'authors': ["A. Chen", "B. Kim"]},
+    {'year': "2023", 'technique_type': "prompt  engineering technique", 'authors': ["B. Kim"]},
+    {'year': "2024", 'technique_type': "Fine-tuning Method", 'authors': []},
+    {'year': "", 'technique_type': "Agent Framework", 'authors': ["A. Chen"]},
+]
+
+
+@pytest.fixture
+def attributes():
+    return AttributeIndex.build(METADATA)
+
+
+def rows(selected):
+    return selected.tolist()
+
+
+def test_values_lists_and_ranges(attributes):
+    # Lookups ignore case and spacing
+    assert rows(attributes.select({'technique_type': "PROMPT ENGINEERING TECHNIQUE"})) == [0, 1]
+    assert rows(attributes.select({'authors': "a. chen"})) == [0, 3]
+    assert rows(attributes.select({'year': ["2021", "2024", "1999"]})) == [0, 2]
+    assert rows(attributes.select({'year': {"gte": 2022}})) == [1, 2]
+    assert rows(attributes.select({'year': {"gt": 2021, "lt": "2024"}})) == [1]
+    assert rows(attributes.select({'year': "1999"})) == []
+
+
+def test_filters_on_several_fields_must_all_match(attributes):
+    assert rows(attributes.select({'authors': "B. Kim", 'year': {"lte": 2021}})) == [0]
+    assert rows(attributes.select({'authors': "A. Chen", 'technique_type': "Fine-tuning Method"})) == []
+
+
+def test_invalid_filters_are_rejected(attributes):
+    with pytest.raises(ValueError, match="No attribute index for 'venue'"):
+        attributes.select({'venue': "ACL"})
+    with pytest.raises(ValueError, match="Unknown range operators"):
+        attributes.select({'year': {"after": 2020}})
+
+
+def test_repeated_filters_reuse_the_cached_selection(attributes):
+    attributes.max_cached_selections = 2
+    # List filters build a new array on every uncached lookup
+    first = attributes.select({'year': ["2021", "2023"]})
+    assert attributes.select({'year': ["2021", "2023"]}) is first
+    attributes.select({'year': ["2023", "2024"]})
+    attributes.select({'year': ["2021", "2024"]})
+    # The oldest selection was evicted
+    again = attributes.select({'year': ["2021", "2023"]})
+    assert again is not first and rows(again) == rows(first)
+
+
+def test_saved_index_round_trips(tmp_path, attributes):
+    attributes.save(tmp_path)
+    loaded = AttributeIndex.load(tmp_path)
+    for filters in ({'year': {"gte": 2021}}, {'authors': "B. Kim"}, {'technique_type': "agent framework"}):
+        assert rows(loaded.select(filters)) == rows(attributes.select(filters))
+
+
+@pytest.fixture
+def index_dir(tmp_path, corpus, write_corpus, build_index):
+    build_index(write_corpus(corpus), tmp_path / "index")
+    return tmp_path / "index"
+
+
+@pytest.mark.parametrize("exact_filter_limit", [0, 4096])
+def test_filtered_search_only_returns_matching_papers(index_dir, load_agent, corpus, exact_filter_limit):
+    agent = load_agent(index_dir, exact_filter_limit=exact_filter_limit)
+    filters = {'year': ["2020", "2021"], 'technique_type': "Agent Framework"}
+    expected = {paper['title'] for paper in corpus
+                if paper['year'] in ("2020", "2021") and paper['technique_type'] == "Agent Framework"}
+    for query in make_queries(5):
+        hits = agent.search(query, 5, filters=filters)
+        assert len(hits) == min(5, len(expected))
+        assert {hit['metadata']['title'] for hit in hits} <= expected
+
+
+def test_exact_and_faiss_filtering_agree(index_dir, load_agent):
+    exact = load_agent(index_dir, exact_filter_limit=4096)
+    traversal = load_agent(index_dir, exact_filter_limit=0)
+    filters = {'year': {"gte": 2023}}
+    for query in make_queries(5):
+        exact_hits, traversal_hits = exact.search(query, 4, filters=filters), traversal.search(query, 4, filters=filters)
+        assert [hit['metadata']['title'] for hit in exact_hits] == [hit['metadata']['title'] for hit in traversal_hits]
+        assert np.allclose([hit['score'] for hit in exact_hits], [hit['score'] for hit in traversal_hits], atol=1e-5)
+
+
+def test_filters_matching_nothing_return_no_hits(index_dir, load_agent):
+    agent = load_agent(index_dir)
+    assert agent.search(make_queries(1)[0], 3, filters={'year': "1990"}) == []
@@ -0,0 +1,87 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_fetch import FetchCancelled, HttpFetcher
+
+BODY = b"%PDF-1.4 stand-in body"
+ETAG = '"v1"'
+PAGE = "Café Zürich – naïve".encode("cp1252")
+
+
+@pytest.fixture
+def server():
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/page.html":
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=windows-1252")
+                self.send_header("Content-Length", str(len(PAGE)))
+                self.end_headers()
+                self.wfile.write(PAGE)
+                return
+            seen.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/paper.pdf", seen
+    httpd.shutdown()
+
+
+def test_fresh_hits_and_revalidation(tmp_path, server):
+    url, seen = server
+    fetcher = HttpFetcher(str(tmp_path))
+    assert fetcher.fetch(url) == BODY
+    assert fetcher.fetch(url) == BODY
+    assert fetcher.fetch(url, max_age=0) == BODY
+    assert fetcher.stats() == {'fresh_hits': 1, 'revalidated': 1, 'downloads': 1, 'bytes_downloaded': len(BODY)}
+    assert seen == [None, ETAG]
+
+
+def test_cache_is_shared_across_fetchers(tmp_path, server):
+    url, seen = server
+    HttpFetcher(str(tmp_path)).fetch(url)
+    assert HttpFetcher(str(tmp_path)).fetch(url) == BODY
+    assert len(seen) == 1
+
+
+def test_uncached_fetcher_always_downloads(server):
+    url, seen = server
+    fetcher = HttpFetcher(None)
+    fetcher.fetch(url)
+    fetcher.fetch(url)
+    assert seen == [None, None]
+
+
+def test_stop_event_cancels_fetch(tmp_path, server):
+    url, seen = server
+    stop = threading.Event()
+    stop.set()
+    with pytest.raises(FetchCancelled):
+        HttpFetcher(str(tmp_path)).fetch(url, stop=stop)
+
+
+def test_fetch_text_decodes_with_the_response_charset(tmp_path, server):
+    url, _ = server
+    url = url.replace("/paper.pdf", "/page.html")
+    assert HttpFetcher(None).fetch_text(url) == "Café Zürich – naïve"
+    HttpFetcher(str(tmp_path)).fetch_text(url)
+    # The charset is kept in the ref, so cache hits and revalidations decode the same way
+    fetcher = HttpFetcher(str(tmp_path))
+    assert fetcher.fetch_text(url) == "Café Zürich – naïve"
+    assert fetcher.stats()['fresh_hits'] == 1
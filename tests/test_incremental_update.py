@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+import document_indexer
+from attribute_index import ATTRIBUTE_DIR
+from document_indexer import MANIFEST_FILE, render_paper
+from document_store import STORE_DIR, DocumentStore
+from lexical_index import LEXICAL_DIR
+from segments import segment_dirs
+
+
+def manifest(index_dir):
+    with open(f"{index_dir}/{MANIFEST_FILE}") as f:
+        return json.load(f)
+
+
+def fail_encode(texts):
+    raise AssertionError(f"{len(texts)} texts re-embedded")
+
+
+def changed_corpus(corpus):
+    papers = [dict(paper) for paper in corpus[2:]]
+    papers[0]['summary'] = "A rewritten summary about retrieval augmented generation."
+    papers.append(dict(corpus[0], id="new-paper", title="A brand new paper"))
+    return papers
+
+
+def test_update_embeds_only_new_and_changed_papers(tmp_path, stub_model, corpus, write_corpus,
+                                                    make_indexer, build_index, load_agent):
+    index_dir = str(tmp_path / "index")
+    build_index(write_corpus(corpus), index_dir)
+
+    encoded = []
+    indexer = make_indexer(compact_ratio=0.5)
+    indexer._encode = lambda texts: encoded.extend(texts) or stub_model.encode(texts)
+    papers = changed_corpus(corpus)
+    stats = indexer.process_and_index_documents(write_corpus(papers, "changed.json"), index_dir, incremental=True)
+    assert stats == {'added': 1, 'updated': 1, 'removed': 2, 'unchanged': len(corpus) - 3}
+    assert len(encoded) == 2
+    assert len(manifest(index_dir)['tombstones']) == 3
+
+    agent = load_agent(index_dir)
+    assert agent.index.ntotal == len(corpus) + 2
+    for removed in corpus[:2]:
+        hits = agent.search(render_paper(removed), 5, mode="vector")
+        assert removed['title'] not in [hit['metadata'].get('title') for hit in hits]
+    hit = agent.search(render_paper(papers[0]), 1, mode="vector")[0]
+    assert hit['metadata']['summary'] == papers[0]['summary']
+
+
+def test_update_compacts_once_tombstones_pass_the_ratio(tmp_path, corpus, write_corpus, build_index, load_agent):
+    index_dir = str(tmp_path / "index")
+    build_index(write_corpus(corpus), index_dir)
+
+    kept = corpus[:100]
+    stats = build_index(write_corpus(kept, "kept.json"), index_dir, incremental=True, compact_ratio=0.25)
+    assert stats['removed'] == 100
+    assert manifest(index_dir)['tombstones'] == []
+
+    agent = load_agent(index_dir)
+    assert agent.index.ntotal == len(kept)
+    assert sorted(entry['row'] for entry in manifest(index_dir)['papers'].values()) == list(range(len(kept)))
+    query = kept[42]
+    assert agent.search(render_paper(query), 1, mode="vector")[0]['metadata']['title'] == query['title']
+
+
+def test_unchanged_update_embeds_nothing(tmp_path, corpus, write_corpus, make_indexer, build_index):
+    index_dir = str(tmp_path / "index")
+    path = write_corpus(corpus)
+    build_index(path, index_dir)
+
+    indexer = make_indexer()
+    indexer._encode = fail_encode
+    stats = indexer.process_and_index_documents(path, index_dir, incremental=True)
+    assert stats == {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': len(corpus)}
+
+
+def test_update_appends_only_the_changed_rows(tmp_path, corpus, write_corpus, build_index, load_agent):
+    index_dir = tmp_path / "index"
+    build_index(write_corpus(corpus), index_dir)
+    blob = index_dir / STORE_DIR / "documents.blob"
+    inode = blob.stat().st_ino
+
+    papers = changed_corpus(corpus)
+    build_index(write_corpus(papers, "changed.json"), index_dir, incremental=True, compact_ratio=0.5)
+    # The store grew in place and the side indexes got one segment holding the two new rows
+    assert blob.stat().st_ino == inode
+    assert len(DocumentStore(index_dir / STORE_DIR)) == manifest(index_dir)['rows'] == len(corpus) + 2
+    assert [first for first, _ in segment_dirs(index_dir / LEXICAL_DIR)] == [len(corpus)]
+    assert [first for first, _ in segment_dirs(index_dir / ATTRIBUTE_DIR)] == [len(corpus)]
+
+    agent = load_agent(index_dir, search_mode="lexical")
+    assert agent.search('"brand new paper"', 1)[0]['metadata']['title'] == "A brand new paper"
+    filtered = agent.select({'year': papers[-1]['year']})
+    assert len(corpus) + 1 in filtered and not set(filtered.tolist()) & agent.tombstones
+    removed = {paper['title'] for paper in corpus[:2]}
+    for paper in corpus[:2]:
+        hits = agent.search(paper['title'], 5, mode="lexical") + agent.search(paper['title'], 5, mode="vector")
+        assert not removed & {hit['metadata']['title'] for hit in hits}
+
+    build_index(write_corpus(papers, "changed.json"), index_dir, incremental=True, compact_ratio=0.5)
+    assert len(segment_dirs(index_dir / LEXICAL_DIR)) == 1
+
+
+def test_update_recovers_from_an_unfinished_save(tmp_path, corpus, write_corpus, build_index, load_agent, monkeypatch):
+    index_dir = tmp_path / "index"
+    build_index(write_corpus(corpus), index_dir)
+    saved_manifest = (index_dir / MANIFEST_FILE).read_text()
+    papers = changed_corpus(corpus)
+
+    # Killed after the index was written but before the manifest: its new vectors belong to no paper
+    build_index(write_corpus(papers, "changed.json"), index_dir, incremental=True, compact_ratio=0.5)
+    (index_dir / MANIFEST_FILE).write_text(saved_manifest)
+    # Killed before the index was written: the store and side indexes hold rows the index lacks
+    def fail(*args):
+        raise OSError("killed")
+    monkeypatch.setattr(document_indexer, "write_index", fail)
+    with pytest.raises(OSError):
+        build_index(write_corpus(papers, "changed.json"), index_dir, incremental=True, compact_ratio=0.5)
+    monkeypatch.undo()
+
+    build_index(write_corpus(papers, "changed.json"), index_dir, incremental=True, compact_ratio=0.5)
+    agent = load_agent(index_dir)
+    assert agent.index.ntotal == len(agent.documents) == len(corpus) + 4
+    assert {len(corpus), len(corpus) + 1} <= agent.tombstones
+    for paper in (papers[0], papers[-1], papers[50]):
+        hit = agent.search(render_paper(paper), 1, mode="vector")[0]
+        assert hit['document'] == render_paper(paper)
+
+
+def test_heavily_tombstoned_index_still_fills_top_k(tmp_path, corpus, write_corpus, build_index, load_agent):
+    index_dir = tmp_path / "index"
+    build_index(write_corpus(corpus), index_dir)
+    kept = corpus[180:]
+    build_index(write_corpus(kept, "kept.json"), index_dir, incremental=True, compact_ratio=1.0)
+
+    agent = load_agent(index_dir)
+    assert len(agent.tombstones) == 180
+    hits = agent.search(render_paper(corpus[0]), 10, mode="vector")
+    assert len(hits) == 10
+    assert {hit['metadata']['title'] for hit in hits} <= {paper['title'] for paper in kept}
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from index_factory import BinaryRerankIndex, read_index, write_index
+
+
+def titles(results):
+    return [result['metadata']['title'] for result in results]
+
+
+@pytest.mark.parametrize("storage", ["float32", "float16", "int8", "binary"])
+def test_save_load_round_trip(tmp_path, corpus, write_corpus, build_index, load_agent, storage):
+    index_dir = str(tmp_path / "index")
+    build_index(write_corpus(corpus), index_dir, storage=storage)
+
+    agent = load_agent(index_dir)
+    assert agent.storage == storage
+    assert agent.index.ntotal == len(corpus)
+    query = corpus[7]['title']
+    assert titles(agent.search(query, 1, mode="vector")) == [query]
+
+
+def test_binary_rewrite_of_loaded_index_keeps_vectors(tmp_path, stub_model, corpus):
+    embeddings = stub_model.encode([paper['summary'] + paper['title'] for paper in corpus])
+    index = BinaryRerankIndex(embeddings.shape[1])
+    index.train(embeddings)
+    index.add(embeddings)
+    path = str(tmp_path / "papers.index")
+    write_index(index, path)
+
+    # Saving an index over the files it was memory-mapped from
+    loaded = read_index(path)
+    write_index(loaded, path)
+    reloaded = read_index(path)
+    np.testing.assert_array_equal(reloaded.reconstruct_n(0, len(corpus)), embeddings.astype(np.float16))
+
+
+def test_binary_index_survives_delete_only_update(tmp_path, corpus, write_corpus, build_index, load_agent):
+    index_dir = str(tmp_path / "index")
+    build_index(write_corpus(corpus), index_dir, storage="binary")
+    query = corpus[3]['title']
+    before = load_agent(index_dir).search(query, 1, mode="vector")
+
+    # Few enough deletions that the update tombstones rows instead of compacting
+    kept = corpus[:-5]
+    stats = build_index(write_corpus(kept, "kept.json"), index_dir, incremental=True)
+    assert stats == {'added': 0, 'updated': 0, 'removed': 5, 'unchanged': len(kept)}
+
+    agent = load_agent(index_dir)
+    assert agent.storage == "binary"
+    results = agent.search(query, 1, mode="vector")
+    assert titles(results) == [query]
+    assert results[0]['score'] == pytest.approx(before[0]['score'])
+
+
+def test_binary_adds_to_loaded_index_leave_the_memory_map(tmp_path, stub_model, corpus):
+    embeddings = stub_model.encode([paper['summary'] + paper['title'] for paper in corpus])
+    index = BinaryRerankIndex(embeddings.shape[1])
+    index.train(embeddings)
+    index.add(embeddings[:100])
+    path = str(tmp_path / "papers.index")
+    write_index(index, path)
+
+    loaded = read_index(path)
+    for row in range(100, len(corpus), 3):
+        loaded.add(embeddings[row:row + 3])
+    # Saved rows stay memory-mapped, added ones share a buffer grown by doubling
+    assert isinstance(loaded.vectors, np.memmap) and len(loaded.vectors) == 100
+    assert 100 <= len(loaded._added) < 200
+    expected = embeddings.astype(np.float16).astype(np.float32)
+    np.testing.assert_array_equal(loaded.reconstruct_n(0, len(corpus)), expected)
+    np.testing.assert_array_equal(loaded.reconstruct_batch(np.array([150, 3, 199])), expected[[150, 3, 199]])
+    _, ids = loaded.search(embeddings[[5, 180]], 1)
+    assert ids[:, 0].tolist() == [5, 180]
+
+    write_index(loaded, path)
+    np.testing.assert_array_equal(read_index(path).reconstruct_n(0, len(corpus)), expected)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from document_indexer import render_paper
+from index_factory import INDEX_TYPES, build_index, set_search_params
+from index_report import evaluate, recall_at_k
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((600, 32)).astype(np.float32), rng.standard_normal((20, 32)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_every_index_type_builds_saves_and_finds_papers(tmp_path, corpus, write_corpus, build_index, load_agent, index_type):
+    index_dir = tmp_path / "index"
+    build_index(write_corpus(corpus), index_dir, index_type=index_type)
+
+    agent = load_agent(index_dir)
+    agent.set_search_params(nprobe=64, ef_search=256)
+    assert agent.index_type == index_type and agent.index.ntotal == len(corpus)
+    for paper in corpus[::40]:
+        found = [hit['metadata']['title'] for hit in agent.search(render_paper(paper), 3, mode="vector")]
+        assert paper['title'] in found
+
+
+def test_search_params_apply_only_to_their_index_type(vectors):
+    embeddings, _ = vectors
+    flat = build_index(embeddings, "flat")
+    assert set_search_params(flat, nprobe=8, ef_search=32) == {}
+
+    ivf = build_index(embeddings, "ivf_flat", nlist=8)
+    assert set_search_params(ivf) == {'nprobe': 8}
+    assert set_search_params(ivf, nprobe=4) == {'nprobe': 4} and ivf.nprobe == 4
+
+    hnsw = build_index(embeddings, "hnsw")
+    assert set_search_params(hnsw, nprobe=8) == {'ef_search': 64}
+    assert set_search_params(hnsw, ef_search=128) == {'ef_search': 128} and hnsw.hnsw.efSearch == 128
+
+
+def test_small_corpora_scale_ivf_parameters_down(vectors):
+    embeddings, _ = vectors
+    ivf = build_index(embeddings[:100], "ivf_pq", nlist=1000, pq_m=7, pq_bits=12)
+    assert ivf.is_trained and ivf.nlist == 100 // 39
+    # 7 sub-quantizers do not divide 32 dimensions, so the closest divisor below is used
+    assert ivf.pq.M == 4 and ivf.pq.nbits <= 6
+
+
+def test_invalid_combinations_are_rejected(vectors):
+    embeddings, _ = vectors
+    with pytest.raises(ValueError, match="Unknown index type"):
+        build_index(embeddings, "annoy")
+    with pytest.raises(ValueError, match="already quantized"):
+        build_index(embeddings, "ivf_pq", storage="float16")
+    with pytest.raises(ValueError, match="flat indexes"):
+        build_index(embeddings, "hnsw", storage="binary")
+
+
+def test_recall_at_k_ignores_missing_results():
+    truth = np.array([[1, 2, 3], [4, 5, 6]])
+    found = np.array([[3, 2, 9], [4, -1, -1]])
+    assert recall_at_k(found, truth, 3) == pytest.approx(3 / 6)
+    assert recall_at_k(truth, truth, 2) == 1.0
+
+
+def test_report_sweeps_search_settings(vectors):
+    embeddings, queries = vectors
+    rows = evaluate(embeddings, queries, k=5, index_types=["flat", "ivf_flat", "hnsw"],
+                    nprobes=[1, 64], ef_searches=[256], index_params={'nlist': 8})
+    by_setting = {(row['index_type'], tuple(row['params'].items())): row for row in rows}
+    assert by_setting[('flat', ())]['recall'] == 1.0
+    # Visiting every partition is exhaustive, one partition is not
+    assert by_setting[('ivf_flat', (('nprobe', 8),))]['recall'] == 1.0
+    assert by_setting[('ivf_flat', (('nprobe', 1),))]['recall'] < 1.0
+    assert by_setting[('hnsw', (('ef_search', 256),))]['recall'] > 0.9
+    assert all(row['qps'] > 0 and row['size_mb'] > 0 for row in rows)
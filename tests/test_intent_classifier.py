@@ -0,0 +1,46 @@
+import pytest
+
+from intent_classifier import classify_message
+
+
+def labels(message):
+    intents, confident = classify_message(message)
+    return {item['intent']: item['entities'] for item in intents}, confident
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("refund customer 12345", {"refund": {"customer_id": "12345"}}),
+    ("Please refund customer #12345 $20.00", {"refund": {"customer_id": "12345", "amount": "20.00"}}),
+    ("Show me invoice 98765", {"invoice": {"invoice_id": "98765"}}),
+    ("refund cust 9911 and invoice 8822", {"refund": {"customer_id": "9911"}, "invoice": {"invoice_id": "8822"}}),
+    ("Bill and refund customer 555", {"billing": {"customer_id": "555"}, "refund": {"customer_id": "555"}}),
+    ("Refund customer 12345 the $20.00 we billed them", {"refund": {"customer_id": "12345", "amount": "20.00"}}),
+])
+def test_confident_labels(message, expected):
+    assert labels(message) == (expected, True)
+
+
+@pytest.mark.parametrize("message", [
+    "Call me at 5551234 about my refund",
+    "refund order 12345",
+    "What is my invoice total for 2024?",
+    "refund 40021 please",
+])
+def test_bare_numbers_are_not_ids(message):
+    intents, confident = labels(message)
+    assert not confident
+    assert all(field not in entities for entities in intents.values() for field in ("customer_id", "invoice_id"))
+
+
+def test_past_tense_billing_is_not_a_billing_request():
+    intents, _ = labels("Refund customer 12345 the $20.00 we billed them")
+    assert "billing" not in intents
+
+
+@pytest.mark.parametrize("message", [
+    "Don't refund customer 12345, just bill them",
+    "Customer 12345 and 67890 both need refunds",
+    "Hello, how are you today?",
+])
+def test_escalates_to_llm(message):
+    assert labels(message)[1] is False
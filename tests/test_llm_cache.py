@@ -0,0 +1,67 @@
+import time
+from types import SimpleNamespace
+
+from llm_cache import LLMCache, cached_chat_completion
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **params):
+        self.calls += 1
+        content = f"answer {self.calls} to {messages[-1]['content']}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+MESSAGES = [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "hello"}]
+
+
+def test_deterministic_requests_are_answered_from_the_cache(tmp_path):
+    cache, client = LLMCache(str(tmp_path / "llm.sqlite")), FakeClient()
+    first = cached_chat_completion("gpt-test", MESSAGES, client=client, cache=cache, temperature=0)
+    assert cached_chat_completion("gpt-test", MESSAGES, client=client, cache=cache, temperature=0) == first
+    assert client.calls == 1
+    # Another model or other parameters are other requests
+    cached_chat_completion("gpt-other", MESSAGES, client=client, cache=cache, temperature=0)
+    cached_chat_completion("gpt-test", MESSAGES, client=client, cache=cache, temperature=0, max_tokens=5)
+    assert client.calls == 3
+    assert cache.stats()['hits'] == 1
+
+
+def test_sampled_requests_are_not_cached(tmp_path):
+    cache, client = LLMCache(str(tmp_path / "llm.sqlite")), FakeClient()
+    for _ in range(2):
+        cached_chat_completion("gpt-test", MESSAGES, client=client, cache=cache, temperature=0.7)
+    assert client.calls == 2 and cache.stats()['entries'] == 0
+
+
+def test_cache_persists_across_connections(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    cache, client = LLMCache(path), FakeClient()
+    first = cached_chat_completion("gpt-test", MESSAGES, client=client, cache=cache, temperature=0)
+    cache.close()
+    assert cached_chat_completion("gpt-test", MESSAGES, client=client, cache=LLMCache(path), temperature=0) == first
+    assert client.calls == 1
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"), ttl=0.01)
+    cache.put("key", "gpt-test", "content")
+    time.sleep(0.02)
+    assert cache.get("key") is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"), max_entries=2, prune_interval=1)
+    cache.put("a", "gpt-test", "A")
+    time.sleep(0.01)
+    cache.put("b", "gpt-test", "B")
+    time.sleep(0.01)
+    assert cache.get("a") == "A"
+    time.sleep(0.01)
+    cache.put("c", "gpt-test", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
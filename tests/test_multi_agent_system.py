@@ -0,0 +1,89 @@
+import asyncio
+import importlib
+import sys
+import time
+
+import pytest
+
+import agent_tools
+
+
+class FakeRunner:
+    """Answers each agent after its delay, or fails it, while counting concurrent runs."""
+
+    delays = {}
+    failures = {}
+    active = 0
+    peak = 0
+
+    @classmethod
+    async def run(cls, agent, prompt):
+        cls.active += 1
+        cls.peak = max(cls.peak, cls.active)
+        try:
+            await asyncio.sleep(cls.delays.get(agent.name, 0.0))
+            if agent.name in cls.failures:
+                raise cls.failures[agent.name]
+            return type("Result", (), {'final_output': f"{agent.name}: {prompt}"})()
+        finally:
+            cls.active -= 1
+
+
+@pytest.fixture
+def system(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    # The module imports its tools from the package layout it was written in
+    monkeypatch.setitem(sys.modules, "meeting_rescheduler", type(sys)("meeting_rescheduler"))
+    monkeypatch.setitem(sys.modules, "meeting_rescheduler.agent_tools", agent_tools)
+    module = importlib.import_module("multi_agent_system")
+    monkeypatch.setattr(module, "Runner", FakeRunner)
+    monkeypatch.setattr(FakeRunner, "delays", {})
+    monkeypatch.setattr(FakeRunner, "failures", {})
+    monkeypatch.setattr(FakeRunner, "peak", 0)
+    return module
+
+
+def test_intents_run_concurrently_and_answer_in_order(system):
+    FakeRunner.delays.update({"Refund Agent": 0.3, "Invoice Agent": 0.1, "Billing Agent": 0.2})
+    message = "refund my invoice and bill me"
+    started = time.perf_counter()
+    answer = asyncio.run(system.multi_intent_orchestrator_async(message))
+    assert time.perf_counter() - started < 0.5
+    assert answer.split("\n\n") == [f"{name}: {message}" for name in ("Refund Agent", "Invoice Agent", "Billing Agent")]
+    assert FakeRunner.peak == 3
+
+
+def test_concurrency_is_limited(system):
+    answer = asyncio.run(system.multi_intent_orchestrator_async("refund my invoice and bill me", max_concurrency=1))
+    assert len(answer.split("\n\n")) == 3 and FakeRunner.peak == 1
+
+
+def test_slow_and_failing_agents_keep_the_other_answers(system):
+    FakeRunner.delays["Invoice Agent"] = 1.0
+    FakeRunner.failures["Billing Agent"] = RuntimeError("card declined")
+    answer = asyncio.run(system.multi_intent_orchestrator_async("refund my invoice and bill me", timeout=0.1))
+    assert answer.split("\n\n") == [
+        "Refund Agent: refund my invoice and bill me",
+        "Invoice Agent did not answer within 0.1s.",
+        "Billing Agent failed: card declined",
+    ]
+
+
+def test_messages_without_ids_keep_their_place(system, monkeypatch):
+    intents = [
+        {'intent': "invoice", 'entities': {'invoice_id': "55555"}},
+        {'intent': "refund", 'entities': {}},
+        {'intent': "billing", 'entities': {'customer_id': "12345"}},
+    ]
+    monkeypatch.setattr(system, "classify_message", lambda message: (intents, True))
+    answer = asyncio.run(system.multi_intent_orchestrator_llm_async("invoice, refund and bill"))
+    assert answer.split("\n\n") == [
+        "Invoice Agent: Get the invoice details for invoice 55555",
+        "Refund intent detected, but no customer ID found.",
+        "Billing Agent: Bill customer 12345",
+    ]
+
+
+def test_sync_entry_points_wrap_the_async_ones(system):
+    assert system.multi_intent_orchestrator("please refund me") == "Refund Agent: please refund me"
+    assert system.multi_intent_orchestrator("hello") == "Sorry, I couldn't identify any actionable request."
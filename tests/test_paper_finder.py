@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+import agent_pdf_extractor_vibe as finder
+from relevance_filter import RelevanceFilter
+from result_sinks import FILTERED, JSONL_FILE, ResultSink
+
+RELEVANT_TEXT = "Abstract. We study prompt engineering and chain-of-thought prompting for large language models."
+OFF_TOPIC_TEXT = "Abstract. We measure the thermal conductivity of layered ceramics at high pressure."
+
+
+class FakeSite:
+    """Serves a listing of PDFs whose text says whether they are on topic."""
+
+    def __init__(self, count, on_topic=lambda n: n % 2 == 0, download_delay=0.0):
+        self.urls = [f"https://example.org/{n}.pdf" for n in range(count)]
+        self.on_topic = on_topic
+        self.download_delay = download_delay
+        self.downloads = []
+        self.analyzed = []
+        self.lock = threading.Lock()
+
+    def fetch_links(self, url):
+        return list(self.urls)
+
+    def download(self, pdf_url, stop=None):
+        time.sleep(self.download_delay)
+        if stop is not None and stop.is_set():
+            raise finder.FetchCancelled(pdf_url)
+        with self.lock:
+            self.downloads.append(pdf_url)
+        return pdf_url.encode()
+
+    def to_text(self, data, max_chars=None):
+        number = int(data.decode().rsplit("/", 1)[1].split(".")[0])
+        return f"Paper {number}. " + (RELEVANT_TEXT if self.on_topic(number) else OFF_TOPIC_TEXT)
+
+    def analyze(self, text):
+        with self.lock:
+            self.analyzed.append(text)
+        if RELEVANT_TEXT not in text:
+            return None
+        return {'title': text.split(".")[0], 'authors': [], 'year': "2024"}
+
+
+@pytest.fixture
+def site(monkeypatch):
+    def serve(*args, **kwargs):
+        fake = FakeSite(*args, **kwargs)
+        monkeypatch.setattr(finder, "fetch_pdf_links_fn", fake.fetch_links)
+        monkeypatch.setattr(finder, "download_pdf_fn", fake.download)
+        monkeypatch.setattr(finder, "pdf_bytes_to_text_fn", fake.to_text)
+        monkeypatch.setattr(finder, "analyze_paper_fn", fake.analyze)
+        monkeypatch.setattr(finder, "save_results_to_markdown_fn", lambda papers: None)
+        return fake
+    return serve
+
+
+def test_without_a_filter_every_paper_is_analyzed(site):
+    fake = site(6)
+    papers = finder.orchestrate("https://example.org/list", max_papers=10)
+    assert len(fake.analyzed) == 6
+    assert [paper['title'] for paper in papers] == ["Paper 0", "Paper 2", "Paper 4"]
+
+
+def test_filter_skips_off_topic_papers_and_resume_scores_them_again(site, tmp_path):
+    fake = site(6)
+    papers = finder.orchestrate("https://example.org/list", max_papers=10, relevance_filter=RelevanceFilter(),
+                                sink_dir=str(tmp_path), resume=True)
+    assert len(papers) == 3 and len(fake.analyzed) == 3
+    sink = ResultSink(str(tmp_path))
+    assert {record['status'] for record in sink.records if "1.pdf" in record['pdf_url']} == {FILTERED}
+    sink.close()
+
+    # Without the filter, the resumed run analyzes only the papers filtered before
+    fake = site(6)
+    papers = finder.orchestrate("https://example.org/list", max_papers=10, sink_dir=str(tmp_path), resume=True)
+    assert sorted(fake.downloads) == [f"https://example.org/{n}.pdf" for n in (1, 3, 5)]
+    assert len(papers) == 3
+    assert (tmp_path / JSONL_FILE).read_text().count("not_relevant") == 3
+
+
+def test_stages_overlap_instead_of_running_in_sequence(site):
+    fake = site(16, download_delay=0.2)
+    started = time.perf_counter()
+    papers = finder.orchestrate("https://example.org/list", max_papers=16, download_workers=8)
+    # Sixteen 0.2s downloads in sequence would take over three seconds
+    assert time.perf_counter() - started < 1.5
+    assert len(fake.downloads) == 16
+    assert [paper['title'] for paper in papers] == [f"Paper {n}" for n in range(0, 16, 2)]
+
+
+def test_pipeline_stops_once_enough_papers_are_found(site):
+    fake = site(60, on_topic=lambda n: True, download_delay=0.02)
+    papers = finder.orchestrate("https://example.org/list", max_papers=3, download_workers=2, queue_size=2)
+    assert len(papers) == 3
+    # Backpressure keeps downloads close to the papers needed, and nothing starts after the stop
+    time.sleep(0.2)
+    assert len(fake.downloads) < 20
+
+
+def test_a_failing_item_does_not_stop_the_pipeline(site, monkeypatch):
+    fake = site(6)
+
+    def download(pdf_url, stop=None):
+        if pdf_url.endswith("/2.pdf"):
+            raise ConnectionError("reset by peer")
+        return fake.download(pdf_url, stop)
+
+    monkeypatch.setattr(finder, "download_pdf_fn", download)
+    papers = finder.orchestrate("https://example.org/list", max_papers=10)
+    assert [paper['title'] for paper in papers] == ["Paper 0", "Paper 4"]
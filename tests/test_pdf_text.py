@@ -0,0 +1,61 @@
+import pytest
+from io import BytesIO
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from pdf_text import PdfTextExtractor
+
+
+def make_pdf(pages, line="Lorem ipsum dolor sit amet consectetur"):
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for number in range(pages):
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+        })
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 72 720 Td (Page {number:03d} {line}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pdf():
+    return make_pdf(24)
+
+
+@pytest.fixture
+def parallel(tmp_path):
+    extractor = PdfTextExtractor(workers=2, pages_per_task=2, min_parallel_pages=4, cache_dir=str(tmp_path / "cache"))
+    yield extractor
+    extractor.close()
+
+
+def test_parallel_text_matches_serial(pdf, parallel):
+    serial = PdfTextExtractor(workers=1, cache_dir=None)
+    text = parallel.extract(pdf)
+    assert text == serial.extract(pdf)
+    assert "Page 000" in text and "Page 023" in text
+    assert parallel.stats()['pages'] == 24
+
+
+def test_max_chars_stops_submitting_ranges(pdf, parallel):
+    page_chars = len(PdfTextExtractor(workers=1, cache_dir=None).extract(pdf, max_pages=1))
+    text = parallel.extract(pdf, max_chars=page_chars * 5)
+    assert text.startswith("Page 000") and len(text) == page_chars * 5
+    # The first wave fills both workers; once it shows the density only one more range is started
+    assert parallel.stats()['pages'] == 6
+
+
+def test_cached_text_answers_character_limits(pdf, parallel):
+    full = parallel.extract(pdf)
+    assert parallel.extract(pdf, max_chars=100) == full[:100]
+    assert parallel.stats()['cache_hits'] == 1
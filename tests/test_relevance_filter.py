@@ -0,0 +1,63 @@
+import pytest
+
+from agent_pdf_extractor_vibe import _STAGE_DONE, _RelevanceQueue
+from relevance_filter import DEFAULT_THRESHOLD, RelevanceFilter, extract_abstract, keyword_score, report
+from stubs import StubEmbeddingModel
+
+RELEVANT = ("Chain-of-Thought Prompting Revisited\nAbstract. We show that chain-of-thought prompting "
+            "improves large language models on reasoning benchmarks.\n1. Introduction\nprompt prompt prompt")
+BORDERLINE = "Abstract: We fine-tune a language model for translation.\nIntroduction"
+OFF_TOPIC = "Abstract. We measure the thermal conductivity of layered ceramics at high pressure.\nKeywords: ceramics"
+
+
+def test_abstract_is_cut_between_its_heading_and_the_introduction():
+    assert extract_abstract(RELEVANT).startswith("We show that chain-of-thought")
+    assert "Introduction" not in extract_abstract(RELEVANT)
+    # Abstracts too short to trust the end marker are kept whole
+    assert "Introduction" in extract_abstract(BORDERLINE)
+    assert extract_abstract("No heading here") == "No heading here"
+
+
+def test_keywords_rank_papers_by_topic():
+    relevant, borderline, off_topic = (keyword_score(extract_abstract(text)) for text in (RELEVANT, BORDERLINE, OFF_TOPIC))
+    assert relevant > DEFAULT_THRESHOLD > off_topic == 0.0
+    assert relevant > borderline > off_topic
+    assert keyword_score("prompt " * 3) == keyword_score("prompt " * 30) < 1
+
+
+def test_threshold_decides_what_reaches_the_llm():
+    relevance_filter = RelevanceFilter()
+    scores = relevance_filter.score_many([RELEVANT, OFF_TOPIC])
+    assert relevance_filter.accepts(scores[0]) and not relevance_filter.accepts(scores[1])
+    assert not RelevanceFilter(threshold=0.99).accepts(relevance_filter.score(RELEVANT))
+
+
+def test_embedding_similarity_is_blended_in():
+    keywords_only = RelevanceFilter()
+    blended = RelevanceFilter(model=StubEmbeddingModel(), embedding_weight=0.5, embedding_floor=0.0)
+    text = "Abstract. new techniques for training, adapting or using large language models"
+    assert blended.score(text) != keywords_only.score(text)
+    assert 0 <= blended.score(OFF_TOPIC) < blended.score(text) <= 1
+
+
+def test_report_measures_precision_and_recall_against_labels():
+    samples = [
+        {'text': RELEVANT, 'relevant': True},
+        {'text': BORDERLINE, 'relevant': True},
+        {'text': OFF_TOPIC, 'relevant': False},
+        {'text': RELEVANT.replace("Chain", "Tree"), 'relevant': False},
+    ]
+    low, high = report(samples, RelevanceFilter(), [0.0, 0.5])
+    assert low == {'threshold': 0.0, 'precision': 0.5, 'recall': 1.0, 'forwarded': 1.0}
+    assert high['recall'] == 0.5 and high['precision'] == 0.5 and high['forwarded'] == 0.5
+
+
+def test_candidates_leave_the_queue_best_score_first():
+    candidates = _RelevanceQueue()
+    for index, score in enumerate([0.3, 0.9, 0.3, 0.6]):
+        candidates.put((index, f"{index}.pdf", (score, "text")))
+    candidates.put(_STAGE_DONE)
+    candidates.put((4, "4.pdf", (0.1, "text")))
+    order = [candidates.get() for _ in range(6)]
+    assert [item[0] for item in order[:5]] == [1, 3, 0, 2, 4]
+    assert order[5] is _STAGE_DONE
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from result_sinks import FILTERED, JSONL_FILE, MARKDOWN_FILE, NOT_RELEVANT, RELEVANT, ResultSink
+
+
+@pytest.fixture
+def sink_dir(tmp_path):
+    sink = ResultSink(str(tmp_path))
+    sink.record("https://example.org/0.pdf", RELEVANT, {'title': "Paper 0", 'authors': ["A. Chen"], 'year': "2024"})
+    sink.record("https://example.org/1.pdf", NOT_RELEVANT)
+    sink.record("https://example.org/2.pdf", FILTERED)
+    sink.close()
+    return tmp_path
+
+
+def test_every_record_is_on_disk_before_close(tmp_path):
+    sink = ResultSink(str(tmp_path))
+    sink.record("https://example.org/0.pdf", RELEVANT, {'title': "Paper 0"})
+    # Both files can be tailed while the run is still going
+    lines = (tmp_path / JSONL_FILE).read_text().splitlines()
+    assert [json.loads(line)['status'] for line in lines] == [RELEVANT]
+    assert "## 1. Paper 0" in (tmp_path / MARKDOWN_FILE).read_text()
+    sink.close()
+    sink.record("https://example.org/1.pdf", RELEVANT, {'title': "Straggler"})
+    assert len((tmp_path / JSONL_FILE).read_text().splitlines()) == 1
+
+
+def test_resume_skips_only_urls_with_an_llm_verdict(sink_dir):
+    sink = ResultSink(str(sink_dir))
+    assert sink.analyzed_urls() == {"https://example.org/0.pdf", "https://example.org/1.pdf"}
+    assert sink.recorded_urls() == sink.analyzed_urls() | {"https://example.org/2.pdf"}
+    assert [paper['title'] for paper in sink.papers()] == ["Paper 0"]
+    sink.record("https://example.org/3.pdf", RELEVANT, {'title': "Paper 3"})
+    sink.close()
+
+    # The report is rebuilt from the log and keeps numbering across runs
+    markdown = (sink_dir / MARKDOWN_FILE).read_text()
+    assert markdown.count("# Top Papers") == 1
+    assert "## 1. Paper 0" in markdown and "## 2. Paper 3" in markdown
+
+
+def test_resume_drops_a_partially_written_last_line(sink_dir):
+    with open(sink_dir / JSONL_FILE, 'a', encoding="utf-8") as f:
+        f.write('{"pdf_url": "https://example.org/3.pdf", "sta')
+
+    sink = ResultSink(str(sink_dir))
+    assert len(sink.records) == 3
+    sink.record("https://example.org/3.pdf", NOT_RELEVANT)
+    sink.close()
+    records = [json.loads(line) for line in (sink_dir / JSONL_FILE).read_text().splitlines()]
+    assert [record['pdf_url'][-5:] for record in records] == ["0.pdf", "1.pdf", "2.pdf", "3.pdf"]
+
+
+def test_without_resume_the_sinks_start_afresh(sink_dir):
+    sink = ResultSink(str(sink_dir), resume=False)
+    assert sink.records == [] and sink.analyzed_urls() == set()
+    sink.close()
+    assert (sink_dir / JSONL_FILE).read_text() == ""
+    assert "Paper 0" not in (sink_dir / MARKDOWN_FILE).read_text()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from stubs import make_queries
+
+
+@pytest.fixture
+def agent(tmp_path, corpus, write_corpus, build_index, load_agent):
+    build_index(write_corpus(corpus), tmp_path / "index")
+    return load_agent(tmp_path / "index", search_mode="vector")
+
+
+def titles(hits):
+    return [hit['metadata']['title'] for hit in hits]
+
+
+def test_search_many_matches_single_searches(agent):
+    queries = make_queries(25)
+    batched = list(agent.search_many(queries, 4, batch_size=8))
+    assert [titles(hits) for hits in batched] == [titles(agent.search(query, 4)) for query in queries]
+    for hits in batched:
+        scores = [hit['score'] for hit in hits]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_queries_are_encoded_one_batch_at_a_time(agent, monkeypatch):
+    batches = []
+    encode = agent.model.encode
+
+    def counting_encode(queries, **kwargs):
+        batches.append(len(queries))
+        return encode(queries, **kwargs)
+
+    monkeypatch.setattr(agent.model, "encode", counting_encode)
+    consumed = []
+
+    def queries():
+        for query in make_queries(10):
+            consumed.append(query)
+            yield query
+
+    results = agent.search_many(queries(), 3, batch_size=4)
+    assert consumed == []
+    first = next(results)
+    # Only the first batch is read before its results come back
+    assert len(consumed) == 4 and batches == [4] and len(first) == 3
+    rest = list(results)
+    assert len(rest) == 9 and batches == [4, 4, 2]
+
+
+def test_search_embeddings_is_one_faiss_call(agent):
+    queries = make_queries(6)
+    embeddings = agent.encode_queries(queries)
+    assert embeddings.dtype == np.float32 and embeddings.shape == (6, agent.index.d)
+    results = agent.search_embeddings(embeddings, 2)
+    assert [titles(hits) for hits in results] == [titles(agent.search(query, 2)) for query in queries]
@@ -0,0 +1,82 @@
+import shutil
+
+import pytest
+
+from lexical_index import LEXICAL_DIR, LexicalIndex, tokenize
+from stubs import make_queries
+
+
+@pytest.fixture
+def index_dir(tmp_path, corpus, write_corpus, build_index):
+    build_index(write_corpus(corpus), tmp_path / "index")
+    return tmp_path / "index"
+
+
+@pytest.fixture
+def agent(index_dir, load_agent):
+    return load_agent(index_dir, search_mode="hybrid")
+
+
+def titles(hits):
+    return [hit['metadata']['title'] for hit in hits]
+
+
+def test_compound_terms_are_indexed_whole_and_in_parts():
+    assert tokenize("Chain-of-Thought on GPT-3.5, arXiv 2401.12345") == [
+        "chain-of-thought", "chain", "of", "thought", "on", "gpt-3.5", "gpt", "3", "5",
+        "arxiv", "2401.12345", "2401", "12345",
+    ]
+
+
+def test_bm25_ranks_rare_terms_first():
+    index = LexicalIndex.build([
+        "retrieval for question answering",
+        "retrieval retrieval retrieval",
+        "self-consistency for question answering",
+    ])
+    hits = index.search("self-consistency retrieval", 3)
+    assert [doc for doc, _ in hits][0] == 2
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    assert [doc for doc, _ in index.search("retrieval", 3, exclude=[1])] == [0]
+    assert index.search("retrieval", 3, allowed=[2]) == []
+    assert index.search("unseen", 3) == []
+
+
+def test_auto_mode_sends_exact_queries_to_bm25(agent):
+    assert agent.resolve_mode('"tree-of-thought for dialogue"', "auto") == "lexical"
+    assert agent.resolve_mode("follow-up to 2401.12345v2", "auto") == "lexical"
+    assert agent.resolve_mode("tree-of-thought for dialogue", "auto") == "hybrid"
+    assert agent.resolve_mode("anything") == "hybrid"
+    with pytest.raises(ValueError, match="Unknown search mode"):
+        agent.resolve_mode("anything", "fuzzy")
+
+
+def test_exact_title_is_found_by_every_mode(agent, corpus):
+    paper = corpus[37]
+    # The paper number is the only term that singles out this title
+    query = f'"{paper["title"]}"'
+    assert titles(agent.search(query, 1, mode="lexical")) == [paper['title']]
+    assert titles(agent.search(query, 1, mode="auto")) == [paper['title']]
+    assert paper['title'] in titles(agent.search(paper['title'], 5, mode="hybrid"))
+
+
+def test_hybrid_blends_both_retrievers(agent):
+    pool = agent.hybrid_candidates
+    for query in make_queries(10):
+        candidates = set(titles(agent.search(query, pool, mode="vector"))) | set(titles(agent.search(query, pool, mode="lexical")))
+        hybrid = agent.search(query, 5, mode="hybrid")
+        assert len(hybrid) == 5 and set(titles(hybrid)) <= candidates
+        assert all(0 <= hit['score'] <= 1 for hit in hybrid)
+
+    # With all the weight on one retriever, hybrid ranks like it
+    query = make_queries(1)[0]
+    agent.hybrid_alpha = 1.0
+    assert titles(agent.search(query, 5, mode="hybrid")) == titles(agent.search(query, 5, mode="vector"))
+
+
+def test_indexes_without_bm25_fall_back_to_vector_search(index_dir, load_agent):
+    shutil.rmtree(index_dir / LEXICAL_DIR)
+    agent = load_agent(index_dir, search_mode="hybrid")
+    query = make_queries(1)[0]
+    assert agent.resolve_mode(query, "lexical") == "vector"
+    assert titles(agent.search(query, 3)) == titles(agent.search(query, 3, mode="vector"))
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from search_server import MicroBatcher
+from stubs import make_queries
+
+
+@pytest.fixture
+def agent(tmp_path, corpus, write_corpus, build_index, load_agent):
+    build_index(write_corpus(corpus), tmp_path / "index")
+    return load_agent(tmp_path / "index", search_mode="vector")
+
+
+def titles(hits):
+    return [hit['metadata']['title'] for hit in hits]
+
+
+def run_batched(agent, requests, **kwargs):
+    async def run():
+        batcher = MicroBatcher(agent, **kwargs)
+        batcher.start()
+        try:
+            results = await asyncio.gather(
+                *(batcher.search(query, top_k, filters) for query, top_k, filters in requests),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.stop()
+        return results, batcher.stats()
+    return asyncio.run(run())
+
+
+def test_concurrent_requests_are_batched(agent):
+    queries = make_queries(20)
+    results, stats = run_batched(agent, [(query, 3, None) for query in queries], max_batch_size=8, max_wait_ms=50)
+
+    assert [titles(hits) for hits in results] == [titles(agent.search(query, 3)) for query in queries]
+    assert stats['requests'] == 20 and stats['queue_depth'] == 0 and stats['batches_in_flight'] == 0
+    assert stats['batches'] < 20 and stats['max_batch_size'] <= 8
+    assert sum(size * count for size, count in stats['batch_size_histogram'].items()) == 20
+    assert stats['search_seconds'] > 0
+
+
+def test_requests_keep_their_own_top_k_and_filters(agent):
+    query = make_queries(1)[0]
+    requests = [(query, 1, None), (query, 5, None), (query, 5, {"year": "2021"})]
+    results, stats = run_batched(agent, requests, max_wait_ms=50)
+
+    assert titles(results[0]) == titles(agent.search(query, 1))
+    assert titles(results[1]) == titles(agent.search(query, 5))
+    assert titles(results[2]) == titles(agent.search(query, 5, filters={"year": "2021"}))
+    assert all(hit['metadata']['year'] == "2021" for hit in results[2])
+    assert stats['batches'] == 1
+
+
+def test_failing_filter_only_fails_its_own_requests(agent):
+    queries = make_queries(4)
+    requests = [(query, 3, {"venue": "NeurIPS"} if i % 2 else None) for i, query in enumerate(queries)]
+    results, _ = run_batched(agent, requests, max_wait_ms=50)
+
+    assert isinstance(results[1], ValueError) and isinstance(results[3], ValueError)
+    assert titles(results[0]) == titles(agent.search(queries[0], 3))
+    assert titles(results[2]) == titles(agent.search(queries[2], 3))
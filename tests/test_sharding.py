@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from document_indexer import render_paper
+from index_factory import ShardedIndex, build_sharded_index, read_index, write_index
+from lazy_imports import faiss
+from stubs import make_queries
+
+
+def results(agent, queries, **kwargs):
+    return [
+        [(result['metadata']['title'], result['score']) for result in hits]
+        for hits in agent.search_many(queries, 10, mode="vector", **kwargs)
+    ]
+
+
+@pytest.mark.parametrize("filters", [None, {"year": "2021"}, {"year": "2021", "month": "3"}])
+def test_sharded_flat_search_matches_unsharded(tmp_path, corpus, write_corpus, build_index, load_agent, filters):
+    papers_path = write_corpus(corpus)
+    build_index(papers_path, tmp_path / "single")
+    build_index(papers_path, tmp_path / "sharded", shards=4)
+    single = load_agent(tmp_path / "single", exact_filter_limit=10)
+    sharded = load_agent(tmp_path / "sharded", exact_filter_limit=10)
+
+    assert isinstance(sharded.index, ShardedIndex)
+    assert [shard.ntotal for shard in sharded.index.shards] == [50, 50, 50, 50]
+    queries = make_queries(20)
+    assert results(sharded, queries, filters=filters) == results(single, queries, filters=filters)
+
+
+def test_sharded_binary_index_incremental_update(tmp_path, corpus, write_corpus, build_index, load_agent):
+    index_dir = str(tmp_path / "index")
+    build_index(write_corpus(corpus), index_dir, storage="binary", shards=3)
+
+    # Deletions spread over every shard and an addition to the smallest one, then a second save
+    changed = corpus[1:60] + corpus[61:199] + [dict(corpus[199], id="new-paper", title="A new paper")]
+    stats = build_index(write_corpus(changed, "changed.json"), index_dir, incremental=True)
+    assert stats == {'added': 1, 'updated': 0, 'removed': 3, 'unchanged': 197}
+    assert [shard.ntotal for shard in load_agent(index_dir).index.shards] == [67, 67, 67]
+    build_index(write_corpus(changed, "changed.json"), index_dir, incremental=True)
+
+    agent = load_agent(index_dir)
+    assert agent.storage == "binary" and len(agent.index.shards) == 3
+    for paper in (changed[0], changed[100], changed[-1]):
+        assert agent.search(render_paper(paper), 1, mode="vector")[0]['metadata']['title'] == paper['title']
+    vectors = agent.index.reconstruct_n(0, agent.index.ntotal)
+    assert np.all(np.abs(vectors).sum(axis=1) > 0)
+
+
+def test_unsharded_rebuild_removes_shard_files(tmp_path, corpus, write_corpus, build_index, load_agent):
+    index_dir = tmp_path / "index"
+    build_index(write_corpus(corpus), index_dir, storage="binary", shards=3)
+    build_index(write_corpus(corpus), index_dir)
+
+    assert not list(index_dir.glob("papers.index.shard*"))
+    assert load_agent(index_dir).storage == "float32"
+
+
+def test_added_rows_balance_the_shards(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((260, 16)).astype(np.float32)
+    index = build_sharded_index(vectors[:100], 3)
+    flat = faiss.IndexFlatL2(16)
+    flat.add(vectors[:100])
+    for lo, hi in ((100, 101), (101, 160), (160, 260)):
+        index.add(vectors[lo:hi])
+        flat.add(vectors[lo:hi])
+        sizes = [shard.ntotal for shard in index.shards]
+        assert sum(sizes) == hi and max(sizes) - min(sizes) <= 1
+    assert np.array_equal(np.sort(np.concatenate(index.ids)), np.arange(260))
+
+    write_index(index, str(tmp_path / "papers.index"))
+    loaded = read_index(str(tmp_path / "papers.index"))
+    queries = vectors[::13] + 0.01
+    allowed = np.arange(0, 260, 3)
+    for candidate in (index, loaded):
+        assert np.array_equal(candidate.search(queries, 5)[1], flat.search(queries, 5)[1])
+        assert np.array_equal(candidate.reconstruct_n(0, 260), vectors)
+        _, ids = candidate.search(queries, 5, allowed=allowed)
+        assert np.isin(ids, allowed).all()
+        candidate.close()
+
+
+def test_closed_index_still_searches():
+    vectors = np.random.default_rng(1).standard_normal((40, 8)).astype(np.float32)
+    index = build_sharded_index(vectors, 4)
+    index.workers = 2
+    before = index.search(vectors[:3], 4)[1]
+    index.close()
+    assert index._pool is None
+    assert np.array_equal(index.search(vectors[:3], 4)[1], before)
+    index.close()
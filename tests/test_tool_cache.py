@@ -0,0 +1,95 @@
+import asyncio
+
+from tool_cache import cacheable, idempotency_scope, side_effecting, tool_stats
+
+
+def counting(fn_name="refund"):
+    calls = []
+
+    def refund(customer_id: str, amount: float = 10.0) -> str:
+        calls.append((customer_id, amount))
+        return f"refunded {customer_id} {amount} (#{len(calls)})"
+    refund.__name__ = refund.__qualname__ = fn_name
+    return refund, calls
+
+
+def test_cacheable_reuses_results():
+    lookups = []
+
+    @cacheable(ttl=60)
+    def get_invoice(invoice_id: str) -> str:
+        lookups.append(invoice_id)
+        return f"invoice {invoice_id}"
+
+    assert get_invoice("1") == get_invoice("1") == "invoice 1"
+    get_invoice("2")
+    assert lookups == ["1", "2"]
+    assert get_invoice.tool_cache.stats()['hits'] == 1
+
+
+def test_side_effecting_outside_a_scope_runs_without_deduplication(caplog):
+    fn, calls = counting("refund_without_scope")
+    refund = side_effecting()(fn)
+    with caplog.at_level("WARNING", logger="tool_cache"):
+        assert refund("123") != refund("123")
+    assert len(calls) == 2
+    assert len([record for record in caplog.records if "idempotency_scope" in record.getMessage()]) == 1
+    assert refund.tool_cache.stats()['unkeyed'] == 2
+
+
+def test_retries_within_a_run_replay_and_later_runs_execute():
+    fn, calls = counting("refund_per_run")
+    refund = side_effecting()(fn)
+    with idempotency_scope():
+        first = refund("123", 20.0)
+        assert refund("123", 20.0) == first
+        refund("123", 30.0)
+    with idempotency_scope():
+        # The same refund requested again in a new run is a new refund
+        assert refund("123", 20.0) != first
+    assert calls == [("123", 20.0), ("123", 30.0), ("123", 20.0)]
+
+
+def test_caller_supplied_idempotency_key():
+    calls = []
+
+    @side_effecting(key_fn=lambda customer_id, idempotency_key: idempotency_key)
+    def bill(customer_id: str, idempotency_key: str) -> str:
+        calls.append(idempotency_key)
+        return f"billed {customer_id}"
+
+    bill("123", "req-1")
+    bill("123", "req-1")
+    bill("123", "req-2")
+    assert calls == ["req-1", "req-2"]
+
+
+def test_concurrent_calls_in_a_run_are_coalesced():
+    calls = []
+
+    @side_effecting()
+    async def refund_async(customer_id: str) -> str:
+        calls.append(customer_id)
+        await asyncio.sleep(0.01)
+        return f"refunded {customer_id}"
+
+    async def run():
+        with idempotency_scope():
+            return await asyncio.gather(*(refund_async("123") for _ in range(5)))
+
+    assert asyncio.run(run()) == ["refunded 123"] * 5
+    assert calls == ["123"]
+
+
+def test_tools_sharing_a_name_keep_separate_caches():
+    def make(prefix):
+        @cacheable()
+        def lookup(key: str) -> str:
+            return prefix + key
+        return lookup
+
+    first, second = make("a"), make("b")
+    assert first.tool_cache is not second.tool_cache
+    assert (first("1"), second("1")) == ("a1", "b1")
+    assert first.tool_cache.name != second.tool_cache.name
+    assert {first.tool_cache.name, second.tool_cache.name} <= set(tool_stats())
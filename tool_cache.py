@@ -0,0 +1,275 @@
+"""Caching and idempotency for agent function tools.
+
+Agents often call the same read-only tool with the same arguments several
+times in one run, and retry tools whose answer was lost. Decorate the plain
+function before handing it to ``function_tool``:
+
+    get_invoice_details = function_tool(cacheable(ttl=60)(get_invoice_details_fn))
+    refund_customer = function_tool(side_effecting()(refund_customer_fn))
+
+``cacheable`` keeps results in an LRU cache with a TTL. ``side_effecting``
+gives each call an idempotency key and replays the first result for repeats
+within the window instead of executing again. The key is the call's arguments
+within the current ``idempotency_scope()``, opened once per agent run, so a
+retry inside a run is replayed while the same refund requested by a later run
+executes. A ``key_fn`` can build the key from a caller-supplied idempotency
+key instead; with neither, a side-effecting tool runs without deduplication
+and logs a warning once:
+
+    with idempotency_scope():
+        result = Runner.run_sync(refund_agent, "Refund customer 12345")
+
+Both decorators coalesce identical concurrent calls into one execution. The
+wrappers keep the function's name, docstring and signature, so the tool schema
+is unchanged. ``tool_stats()`` reports per-tool hit rates.
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+CACHEABLE = "cacheable"
+SIDE_EFFECTING = "side_effecting"
+
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+# Idempotency scope of the current agent run, see ``idempotency_scope``
+_scope: ContextVar[Optional[str]] = ContextVar("idempotency_scope", default=None)
+
+
+class ToolCache:
+    def __init__(self, name: str, kind: str, ttl: float, maxsize: int):
+        """Results of one tool, keyed by call.
+
+        Args:
+            name (str): Tool name
+            kind (str): CACHEABLE or SIDE_EFFECTING
+            ttl (float): Seconds a result is reused for
+            maxsize (int): Results kept before the least recently used are evicted
+        """
+        self.name = name
+        self.kind = kind
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'hits': 0, 'coalesced': 0, 'executions': 0, 'evictions': 0, 'unkeyed': 0}
+
+    def begin(self, key: str):
+        """Look up a call.
+
+        Args:
+            key (str): Call key
+
+        Returns:
+            tuple: (value, None) on a hit, (_MISSING, future) to wait on when the same
+                call is already running, or (_MISSING, None) when the caller must execute it
+                and then call ``finish``
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.counters['calls'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return entry[1], None
+                del self._entries[key]
+                self.counters['evictions'] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters['coalesced'] += 1
+                return _MISSING, future
+            self._inflight[key] = Future()
+            self.counters['executions'] += 1
+            return _MISSING, None
+
+    def finish(self, key: str, value: Any = None, error: Optional[BaseException] = None) -> None:
+        """Store the result of an executed call and release its waiters; errors are not cached."""
+        with self._lock:
+            future = self._inflight.pop(key)
+            if error is None:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.counters['evictions'] += 1
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def unkeyed_call(self) -> bool:
+        """Count a side-effecting call made without an idempotency key.
+
+        Returns:
+            bool: Whether it is the first such call, which is worth a warning
+        """
+        with self._lock:
+            self.counters['calls'] += 1
+            self.counters['executions'] += 1
+            self.counters['unkeyed'] += 1
+            return self.counters['unkeyed'] == 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counts, hit rate (hits and coalesced calls over all calls) and entries held."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self._entries)
+        stats['kind'] = self.kind
+        stats['hit_rate'] = (stats['hits'] + stats['coalesced']) / stats['calls'] if stats['calls'] else 0.0
+        return stats
+
+
+_caches: Dict[str, ToolCache] = {}
+
+
+@contextmanager
+def idempotency_scope(scope_id: Optional[str] = None) -> Iterator[str]:
+    """Scope the idempotency keys of side-effecting tools to one agent run.
+
+    Tasks and threads started inside the scope inherit it through ``contextvars``.
+
+    Args:
+        scope_id (Optional[str]): Run or request ID; a fresh random one by default
+
+    Yields:
+        str: The scope ID
+    """
+    scope_id = scope_id or uuid.uuid4().hex
+    token = _scope.set(scope_id)
+    try:
+        yield scope_id
+    finally:
+        _scope.reset(token)
+
+
+def _call_key(name: str, signature: inspect.Signature, args: tuple, kwargs: dict, scope: Optional[str] = None) -> str:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    payload = json.dumps([scope, name, bound.arguments], sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _memoize(kind: str, ttl: float, maxsize: int, key_fn: Optional[Callable[..., str]]):
+    def decorator(fn: Callable) -> Callable:
+        # Qualified and numbered, so tools that share a function name keep separate caches
+        name = base = f"{fn.__module__}.{fn.__qualname__}"
+        while name in _caches:
+            name = f"{base}#{len([key for key in _caches if key.split('#')[0] == base]) + 1}"
+        cache = ToolCache(name, kind, ttl, maxsize)
+        _caches[name] = cache
+        signature = inspect.signature(fn)
+
+        def key_of(args: tuple, kwargs: dict) -> Optional[str]:
+            if key_fn is not None:
+                return name + ":" + key_fn(*args, **kwargs)
+            if kind == CACHEABLE:
+                return _call_key(name, signature, args, kwargs)
+            scope = _scope.get()
+            if scope is None:
+                # Sharing keys across runs would swallow a later run's legitimate repeat
+                if cache.unkeyed_call():
+                    logger.warning("%s called outside tool_cache.idempotency_scope() without a key_fn; "
+                                   "its calls are not deduplicated", name)
+                return None
+            return _call_key(name, signature, args, kwargs, scope)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                key = key_of(args, kwargs)
+                if key is None:
+                    return await fn(*args, **kwargs)
+                value, pending = cache.begin(key)
+                if pending is not None:
+                    return await asyncio.wrap_future(pending)
+                if value is not _MISSING:
+                    return value
+                try:
+                    value = await fn(*args, **kwargs)
+                except BaseException as exc:
+                    cache.finish(key, error=exc)
+                    raise
+                cache.finish(key, value)
+                return value
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                key = key_of(args, kwargs)
+                if key is None:
+                    return fn(*args, **kwargs)
+                value, pending = cache.begin(key)
+                if pending is not None:
+                    return pending.result()
+                if value is not _MISSING:
+                    return value
+                try:
+                    value = fn(*args, **kwargs)
+                except BaseException as exc:
+                    cache.finish(key, error=exc)
+                    raise
+                cache.finish(key, value)
+                return value
+
+        wrapper.tool_cache = cache
+        return wrapper
+    return decorator
+
+
+def cacheable(ttl: float = 300.0, maxsize: int = 256):
+    """Mark a read-only tool as cacheable.
+
+    Args:
+        ttl (float): Seconds a result is reused for
+        maxsize (int): Results kept before the least recently used are evicted
+
+    Returns:
+        Callable: Decorator for the tool function, sync or async
+    """
+    return _memoize(CACHEABLE, ttl, maxsize, None)
+
+
+def side_effecting(window: float = 600.0, maxsize: int = 10_000, key_fn: Optional[Callable[..., str]] = None):
+    """Mark a tool with side effects as idempotent within a window.
+
+    A repeated call with the same idempotency key gets the first call's result
+    instead of executing again, so an agent retrying a refund cannot refund
+    twice. By default the key is the call's arguments within the current
+    ``idempotency_scope``; calls outside any scope execute every time, with a
+    warning, rather than share keys across runs. Keys live in process memory.
+
+    Args:
+        window (float): Seconds an idempotency key is remembered
+        maxsize (int): Keys kept before the oldest are forgotten
+        key_fn (Optional[Callable[..., str]]): Builds the idempotency key from the
+            call's arguments, e.g. from a caller-supplied ``idempotency_key`` argument;
+            used instead of the scope
+
+    Returns:
+        Callable: Decorator for the tool function, sync or async
+    """
+    return _memoize(SIDE_EFFECTING, window, maxsize, key_fn)
+
+
+def tool_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every decorated tool, by qualified function name."""
+    return {name: cache.stats() for name, cache in _caches.items()}